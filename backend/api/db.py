@@ -1,9 +1,14 @@
+import json
 import os
-from datetime import datetime
-from pymongo import MongoClient, ASCENDING, DESCENDING
+import zlib
+from datetime import datetime, timedelta
+from pymongo import MongoClient, ASCENDING, DESCENDING, DeleteOne, InsertOne, ReturnDocument, UpdateOne
 from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError, OperationFailure
 from dotenv import load_dotenv
 
+from .report_analytics import DETAIL_FIELDS, flag_details
+
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
@@ -13,10 +18,44 @@ db = client["AuditHawk"]
 
 audit_reports_col = db["audit_reports"]
 transactions_col = db["transactions"]
+transaction_buckets_col = db["transaction_buckets"]
 transaction_batch_col = db["transaction_batch"]
 flagged_transactions_col = db["flagged_transactions"]
 users_col = db["users"]
 trusted_vendors_col = db["trusted_vendors"]
+report_scores_col = db["report_scores"]
+model_baselines_col = db["model_baselines"]
+model_baseline_chunks_col = db["model_baseline_chunks"]
+analysis_jobs_col = db["analysis_jobs"]
+analysis_job_payloads_col = db["analysis_job_payloads"]
+dashboard_summaries_col = db["dashboard_summaries"]
+report_analytics_col = db["report_analytics"]
+
+# Rows per cached-score chunk document (keeps each well under the 16 MB BSON cap)
+SCORE_CHUNK_ROWS = 5000
+
+# Bytes per analysis-job payload chunk (the compressed upload) and per
+# frozen-baseline state chunk, likewise
+JOB_PAYLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+BASELINE_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Raw-upload snapshot (transaction_batch): columnar segments of
+# BATCH_SEGMENT_ROWS parsed rows, zlib-compressed JSON unless
+# AUDITHAWK_BATCH_COMPRESSION=none.  Columns are the parser's output fields.
+BATCH_SEGMENT_ROWS = int(os.getenv("AUDITHAWK_BATCH_SEGMENT_ROWS", "20000"))
+BATCH_COMPRESSION = os.getenv("AUDITHAWK_BATCH_COMPRESSION", "zlib").lower()
+BATCH_COLUMNS = ["id", "transaction_id", "date", "amount", "merchant", "category", "account_id"]
+
+# How an upload stores its rows (AUDITHAWK_TRANSACTION_STORAGE, recorded
+# on the report as "storage"):
+#   documents – one transactions document per row, flag fields on the row
+#   buckets   – transaction_buckets documents of TRANSACTION_BUCKET_ROWS
+#               rows as BATCH_COLUMNS arrays; flag / decision state lives
+#               only in flagged_transactions (the overlay), and the buckets
+#               double as the re-analysis snapshot
+TRANSACTION_STORAGE_MODES = ("documents", "buckets")
+TRANSACTION_STORAGE = os.getenv("AUDITHAWK_TRANSACTION_STORAGE", "documents").lower()
+TRANSACTION_BUCKET_ROWS = int(os.getenv("AUDITHAWK_TRANSACTION_BUCKET_ROWS", "1000"))
 
 
 def ensure_indexes() -> None:
@@ -44,10 +83,26 @@ def ensure_indexes() -> None:
         name="idx_txn_ttl_90_days"
     )
 
+    transaction_buckets_col.create_index(
+        [("report_id", ASCENDING), ("user_id", ASCENDING), ("seq", ASCENDING)],
+        unique=True,
+        name="idx_buckets_report_user_seq_unique",
+    )
+    transaction_buckets_col.create_index(
+        [("uploaded_at", ASCENDING)],
+        expireAfterSeconds=7776000,
+        name="idx_buckets_ttl_90_days"
+    )
+
+    # one document per report before batches were segmented
+    try:
+        transaction_batch_col.drop_index("idx_batch_report_user_unique")
+    except OperationFailure:
+        pass
     transaction_batch_col.create_index(
-        [("report_id", ASCENDING), ("user_id", ASCENDING)],
+        [("report_id", ASCENDING), ("user_id", ASCENDING), ("seq", ASCENDING)],
         unique=True,
-        name="idx_batch_report_user_unique",
+        name="idx_batch_report_user_seq_unique",
     )
 
     # 🚨 ADD THIS NEW BLOCK: Enterprise TTL Index
@@ -74,6 +129,51 @@ def ensure_indexes() -> None:
         name="idx_trusted_vendor_user_name_unique",
     )
 
+    report_scores_col.create_index(
+        [("report_id", ASCENDING), ("user_id", ASCENDING), ("seq", ASCENDING)],
+        unique=True,
+        name="idx_scores_report_user_seq_unique",
+    )
+    report_scores_col.create_index(
+        [("uploaded_at", ASCENDING)],
+        expireAfterSeconds=7776000,
+        name="idx_scores_ttl_90_days"
+    )
+
+    model_baselines_col.create_index(
+        [("user_id", ASCENDING)],
+        unique=True,
+        name="idx_baselines_user_unique",
+    )
+    model_baseline_chunks_col.create_index(
+        [("user_id", ASCENDING), ("fitted_at", ASCENDING), ("seq", ASCENDING)],
+        unique=True,
+        name="idx_baseline_chunks_user_fitted_seq_unique",
+    )
+
+    analysis_jobs_col.create_index(
+        [("user_id", ASCENDING), ("created_at", DESCENDING)],
+        name="idx_jobs_user_created_at",
+    )
+    analysis_jobs_col.create_index(
+        [("status", ASCENDING), ("available_at", ASCENDING), ("created_at", ASCENDING)],
+        name="idx_jobs_status_available",
+    )
+    analysis_jobs_col.create_index(
+        [("status", ASCENDING), ("lease_expires_at", ASCENDING)],
+        name="idx_jobs_status_lease",
+    )
+    analysis_job_payloads_col.create_index(
+        [("job_id", ASCENDING), ("seq", ASCENDING)],
+        unique=True,
+        name="idx_job_payloads_job_seq_unique",
+    )
+    analysis_job_payloads_col.create_index(
+        [("created_at", ASCENDING)],
+        expireAfterSeconds=7776000,
+        name="idx_job_payloads_ttl_90_days",
+    )
+
 
 # ── Trusted-vendor helpers (HITL Active Learning / Masking) ──
 
@@ -102,6 +202,747 @@ def remove_trusted_vendor(user_id: str, name: str) -> bool:
     return result.deleted_count > 0
 
 
+# ── Per-report engine score cache (instant HITL re-scoring) ──
+
+def save_report_scores(user_id: str, report_id: str, columns: dict[str, list], session=None) -> int:
+    """
+    Replace the cached per-row features + engine scores of a report.
+    Stored columnar, SCORE_CHUNK_ROWS rows per document.
+    """
+    report_scores_col.delete_many({"report_id": report_id, "user_id": user_id}, session=session)
+    row_count = len(next(iter(columns.values()), []))
+    uploaded_at = datetime.utcnow()
+    docs = [
+        {
+            "report_id": report_id,
+            "user_id": user_id,
+            "seq": seq,
+            "uploaded_at": uploaded_at,
+            "columns": {name: values[start:start + SCORE_CHUNK_ROWS] for name, values in columns.items()},
+        }
+        for seq, start in enumerate(range(0, row_count, SCORE_CHUNK_ROWS))
+    ]
+    if docs:
+        report_scores_col.insert_many(docs, session=session)
+    return row_count
+
+
+def load_report_scores(user_id: str, report_id: str, session=None) -> dict[str, list] | None:
+    """Return the cached score columns of a report, or None if nothing is cached."""
+    chunks = report_scores_col.find(
+        {"report_id": report_id, "user_id": user_id},
+        {"columns": 1, "_id": 0},
+        session=session,
+    ).sort("seq", ASCENDING)
+
+    merged: dict[str, list] = {}
+    for chunk in chunks:
+        for name, values in chunk.get("columns", {}).items():
+            merged.setdefault(name, []).extend(values)
+    return merged or None
+
+
+# ── Report lifecycle ──
+#
+#   queued → processing → committing → completed      (or failed / cancelled)
+#
+# An upload's rows are written outside any transaction while the report is
+# "committing", so they are only shown once the report is "completed".
+
+REPORT_VISIBLE_STATES = ("completed",)
+
+
+def get_visible_report(user_id: str, report_id: str) -> dict | None:
+    """The report's status / storage / size if its rows may be shown (its commit finished)."""
+    try:
+        report_oid = ObjectId(report_id)
+    except Exception:
+        return None
+    report = audit_reports_col.find_one({"_id": report_oid, "user_id": user_id}, {"status": 1, "storage": 1, "total_transactions": 1})
+    if report is None or report.get("status") not in REPORT_VISIBLE_STATES:
+        return None
+    return report
+
+
+def report_rows_visible(user_id: str, report_id: str) -> bool:
+    """May the report's transactions / flags be shown (is its commit finished)?"""
+    return get_visible_report(user_id, report_id) is not None
+
+
+def discard_report_rows(user_id: str, report_id: str) -> None:
+    """Delete every row written for a report (leftovers of an interrupted commit)."""
+    query = {"report_id": report_id, "user_id": user_id}
+    transactions_col.delete_many(query)
+    transaction_buckets_col.delete_many(query)
+    transaction_batch_col.delete_many(query)
+    flagged_transactions_col.delete_many(query)
+    report_scores_col.delete_many(query)
+    report_analytics_col.delete_one({"_id": report_id, "user_id": user_id})
+
+
+# ── Dashboard summary (one document per user, _id = user id) ──
+#
+#   {total_reports, total_transactions, total_flagged, status_counts: {status: n}}
+#
+# Reports are created and changed through ``insert_report`` / ``update_report``,
+# which apply the report's exact contribution change to its user's summary
+# with one ``$inc`` – the previous state comes from the same atomic
+# find-and-modify.  The report write and the ``$inc`` share one transaction
+# (the caller's session, or one of their own), so the summary never misses
+# or double-counts a write.  A missing summary is rebuilt with a ``$group``
+# over the user's reports (``rebuild_dashboard_summary``) in the transaction
+# that finds it missing, as are summaries after bulk writes that bypass
+# these helpers (``score_batch``) and summaries found inconsistent on read.
+
+REPORT_SUMMARY_PROJECTION = {"user_id": 1, "status": 1, "total_transactions": 1, "flagged_count": 1}
+
+
+def _summary_counters(report: dict | None) -> dict[str, int]:
+    """What one report adds to its user's summary."""
+    if report is None:
+        return {}
+    return {
+        "total_reports": 1,
+        "total_transactions": int(report.get("total_transactions") or 0),
+        "total_flagged": int(report.get("flagged_count") or 0),
+        f"status_counts.{report.get('status')}": 1,
+    }
+
+
+def in_transaction(write, session=None):
+    """``write(session)`` in the caller's ``session``, or else in a transaction of its own."""
+    if session is not None:
+        return write(session)
+    with client.start_session() as own:
+        return own.with_transaction(write)
+
+
+def _apply_summary_delta(user_id: str, before: dict | None, after: dict | None, session=None) -> None:
+    old, new = _summary_counters(before), _summary_counters(after)
+    delta = {name: new.get(name, 0) - old.get(name, 0) for name in {*old, *new}}
+    delta = {name: value for name, value in delta.items() if value}
+    if not delta:
+        return
+    result = dashboard_summaries_col.update_one(
+        {"_id": user_id},
+        {"$inc": delta, "$set": {"updated_at": datetime.utcnow()}},
+        session=session,
+    )
+    if result.matched_count == 0:
+        # no summary yet: count every report, the one just written included
+        rebuild_dashboard_summary(user_id, session=session)
+
+
+def insert_report(report: dict, session=None) -> str:
+    """Insert an audit report (counted in its user's summary); returns its id."""
+    def _insert(session):
+        result = audit_reports_col.insert_one(report, session=session)
+        _apply_summary_delta(report["user_id"], None, report, session=session)
+        return str(result.inserted_id)
+
+    return in_transaction(_insert, session)
+
+
+def update_report(report_filter: dict, fields: dict, session=None) -> dict | None:
+    """
+    ``$set`` ``fields`` on the report matching ``report_filter`` and update
+    its user's summary.  Returns the report's summary fields as they were
+    before, or None when no report matched.
+    """
+    def _update(session):
+        before = audit_reports_col.find_one_and_update(
+            report_filter, {"$set": fields},
+            projection=REPORT_SUMMARY_PROJECTION, return_document=ReturnDocument.BEFORE, session=session,
+        )
+        if before is not None:
+            after = {**before, **{name: value for name, value in fields.items() if name in REPORT_SUMMARY_PROJECTION}}
+            _apply_summary_delta(before["user_id"], before, after, session=session)
+        return before
+
+    return in_transaction(_update, session)
+
+
+def rebuild_dashboard_summary(user_id: str, session=None) -> dict:
+    """
+    Recount a user's summary from their reports with one ``$group`` and
+    replace it.  A report write committed meanwhile conflicts with the
+    replace, and the transaction starts over.
+    """
+    def _rebuild(session):
+        summary = {
+            "total_reports": 0, "total_transactions": 0, "total_flagged": 0, "status_counts": {},
+            "updated_at": datetime.utcnow(),
+        }
+        for group in audit_reports_col.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$group": {
+                "_id": "$status",
+                "reports": {"$sum": 1},
+                "transactions": {"$sum": {"$ifNull": ["$total_transactions", 0]}},
+                "flagged": {"$sum": {"$ifNull": ["$flagged_count", 0]}},
+            }},
+        ], session=session):
+            summary["total_reports"] += group["reports"]
+            summary["total_transactions"] += int(group["transactions"])
+            summary["total_flagged"] += int(group["flagged"])
+            summary["status_counts"][str(group["_id"])] = group["reports"]
+
+        dashboard_summaries_col.replace_one({"_id": user_id}, summary, upsert=True, session=session)
+        return {"_id": user_id, **summary}
+
+    return in_transaction(_rebuild, session)
+
+
+def summary_drifted(summary: dict) -> bool:
+    """Counters no series of report writes could produce (a write bypassed the helpers)."""
+    status_counts = summary.get("status_counts") or {}
+    counters = [summary.get(name, 0) for name in ("total_reports", "total_transactions", "total_flagged")]
+    return (
+        min([*counters, *status_counts.values()], default=0) < 0
+        or sum(status_counts.values()) != summary.get("total_reports", 0)
+    )
+
+
+def get_dashboard_summary(user_id: str) -> dict:
+    """The user's summary: one document read (a rebuild when missing or drifted)."""
+    summary = dashboard_summaries_col.find_one({"_id": user_id})
+    if summary is None or summary_drifted(summary):
+        summary = rebuild_dashboard_summary(user_id)
+    return summary
+
+
+# ── Raw upload snapshot (re-analysis input) ──
+
+def save_transaction_batch(user_id: str, report_id: str, file_name: str, uploaded_at: datetime,
+                           transactions: list[dict], session=None) -> int:
+    """
+    Replace the report's snapshot of its parsed rows with columnar
+    segments of BATCH_SEGMENT_ROWS rows.  Returns the number of segments.
+    """
+    transaction_batch_col.delete_many({"report_id": report_id, "user_id": user_id}, session=session)
+    docs = []
+    for seq, start in enumerate(range(0, len(transactions), BATCH_SEGMENT_ROWS)):
+        rows = transactions[start:start + BATCH_SEGMENT_ROWS]
+        columns = {name: [row.get(name) for row in rows] for name in BATCH_COLUMNS}
+        doc = {
+            "report_id": report_id,
+            "user_id": user_id,
+            "seq": seq,
+            "file_name": file_name,
+            "uploaded_at": uploaded_at, # Native Datetime required for TTL!
+            "total_transactions": len(transactions),
+            "rows": len(rows),
+        }
+        if BATCH_COMPRESSION == "zlib":
+            doc["encoding"] = "zlib-json"
+            doc["payload"] = zlib.compress(json.dumps(columns, default=str).encode())
+        else:
+            doc["encoding"] = "columns"
+            doc["columns"] = columns
+        docs.append(doc)
+    if docs:
+        transaction_batch_col.insert_many(docs, session=session)
+    return len(docs)
+
+
+def load_transaction_batch(user_id: str, report_id: str, session=None) -> list[dict] | None:
+    """The report's parsed rows in upload order, or None without a snapshot."""
+    segments = transaction_batch_col.find(
+        {"report_id": report_id, "user_id": user_id}, {"_id": 0}, session=session,
+    ).sort("seq", ASCENDING)
+
+    rows: list[dict] = []
+    found = False
+    for segment in segments:
+        found = True
+        if "transactions" in segment:  # legacy single-document batch
+            rows.extend(segment["transactions"])
+            continue
+        if segment.get("encoding") == "zlib-json":
+            columns = json.loads(zlib.decompress(segment["payload"]))
+        else:
+            columns = segment["columns"]
+        names = list(columns)
+        rows.extend(dict(zip(names, values)) for values in zip(*(columns[name] for name in names)))
+    return rows if found else None
+
+
+# ── Bucketed transaction storage ──
+
+def save_transaction_buckets(user_id: str, report_id: str, uploaded_at: datetime,
+                             transactions: list[dict], session=None) -> int:
+    """
+    Replace the report's rows with buckets of TRANSACTION_BUCKET_ROWS rows,
+    one array per BATCH_COLUMNS field.  Returns the number of buckets.
+    """
+    transaction_buckets_col.delete_many({"report_id": report_id, "user_id": user_id}, session=session)
+    docs = []
+    for seq, start in enumerate(range(0, len(transactions), TRANSACTION_BUCKET_ROWS)):
+        rows = transactions[start:start + TRANSACTION_BUCKET_ROWS]
+        docs.append({
+            "report_id": report_id,
+            "user_id": user_id,
+            "seq": seq,
+            "uploaded_at": uploaded_at,  # TTL, like the row documents
+            "rows": len(rows),
+            "columns": {name: [row.get(name) for row in rows] for name in BATCH_COLUMNS},
+        })
+    if docs:
+        transaction_buckets_col.insert_many(docs, session=session)
+    return len(docs)
+
+
+def load_transaction_buckets(user_id: str, report_id: str, start: int = 0, stop: int | None = None,
+                             columns: list[str] | None = None, session=None) -> list[dict] | None:
+    """
+    The report's bucketed rows in upload order, or None when it has no
+    buckets.  Each row carries ``_id`` = "<bucket id>:<offset>" and its
+    position ``_row``; ``start`` / ``stop`` read only the buckets holding
+    rows [start, stop), ``columns`` only those columns.
+    """
+    query = {"report_id": report_id, "user_id": user_id}
+    if start or stop is not None:
+        # bucket sizes are fixed at write time: find the seq range from them
+        seqs, first_row = [], 0
+        for meta in transaction_buckets_col.find(query, {"seq": 1, "rows": 1}, session=session).sort("seq", ASCENDING):
+            last_row = first_row + meta["rows"]
+            if last_row > start and (stop is None or first_row < stop):
+                seqs.append((meta["seq"], first_row))
+            first_row = last_row
+        if not seqs:
+            return [] if first_row else None
+        query["seq"] = {"$gte": seqs[0][0], "$lte": seqs[-1][0]}
+        position = seqs[0][1]
+    else:
+        position = 0
+
+    projection = {"rows": 1, **({f"columns.{name}": 1 for name in columns} if columns is not None else {"columns": 1})}
+    buckets = transaction_buckets_col.find(query, projection, session=session).sort("seq", ASCENDING)
+    rows: list[dict] = []
+    found = False
+    for bucket in buckets:
+        found = True
+        stored = bucket.get("columns", {})
+        names = list(stored)
+        values_by_row = zip(*(stored[name] for name in names)) if names else ([()] * bucket["rows"])
+        for offset, values in enumerate(values_by_row):
+            if (stop is None or position < stop) and position >= start:
+                row = dict(zip(names, values))
+                row["_id"] = f"{bucket['_id']}:{offset}"
+                row["_row"] = position
+                rows.append(row)
+            position += 1
+    return rows if found else None
+
+
+def load_flag_overlay(user_id: str, report_id: str, session=None) -> dict[str, dict]:
+    """transaction_id → flag / decision state of a report's flagged rows."""
+    docs = flagged_transactions_col.find(
+        {"report_id": report_id, "user_id": user_id},
+        {"transaction_id": 1, "explanation": 1, "risk_score": 1, "decision": 1, "_id": 0},
+        session=session,
+    )
+    return {doc.get("transaction_id", ""): doc for doc in docs}
+
+
+# ── Report analytics (one document per report, _id = report id; see report_analytics.py) ──
+
+def load_report_flags(user_id: str, report_id: str, session=None) -> list[dict]:
+    """The report's flags with the fields the analytics read."""
+    return list(flagged_transactions_col.find(
+        {"report_id": report_id, "user_id": user_id},
+        {"transaction_id": 1, "amount": 1, "risk_score": 1, "decision": 1, "signals": 1},
+        session=session,
+    ))
+
+
+def load_flag_details(user_id: str, report_id: str, transaction_ids: list[str], bucketed: bool,
+                      session=None) -> dict[str, dict]:
+    """Merchant / account of the flagged rows, read from the report's stored rows."""
+    if bucketed:
+        rows = load_transaction_buckets(
+            user_id, report_id, columns=["transaction_id", *DETAIL_FIELDS], session=session,
+        ) or []
+    else:
+        rows = transactions_col.find(
+            {"report_id": report_id, "user_id": user_id, "transaction_id": {"$in": list(transaction_ids)}},
+            {"_id": 0, "transaction_id": 1, **{name: 1 for name in DETAIL_FIELDS}},
+            session=session,
+        )
+    return flag_details(rows, transaction_ids)
+
+
+def save_report_analytics(user_id: str, report_id: str, analytics: dict, session=None) -> None:
+    report_analytics_col.replace_one(
+        {"_id": report_id},
+        {**analytics, "user_id": user_id, "report_id": report_id, "updated_at": datetime.utcnow()},
+        upsert=True,
+        session=session,
+    )
+
+
+def get_report_analytics(user_id: str, report_id: str) -> dict | None:
+    return report_analytics_col.find_one({"_id": report_id, "user_id": user_id})
+
+
+# ── Frozen model baseline (micro-batch scoring) ──
+#
+# The state (graph statistics for every account and merchant …) grows with
+# the report, so it is stored as BASELINE_CHUNK_BYTES chunks keyed by the
+# baseline's ``fitted_at``.  A refresh writes its chunks first, then swaps
+# the user's baseline document to them – unless a newer baseline got
+# there first – and then drops the chunks of older baselines.
+
+def save_model_baseline(user_id: str, report_id: str, payload: bytes, fitted_at: str) -> bool:
+    """
+    Replace the user's baseline with one fitted on ``report_id``.  Returns
+    False (storing nothing) when a baseline fitted later is already stored.
+    """
+    chunks = [
+        {"user_id": user_id, "fitted_at": fitted_at, "seq": seq, "data": payload[start:start + BASELINE_CHUNK_BYTES]}
+        for seq, start in enumerate(range(0, len(payload), BASELINE_CHUNK_BYTES))
+    ]
+    if chunks:
+        model_baseline_chunks_col.insert_many(chunks)
+    try:
+        model_baselines_col.replace_one(
+            {"user_id": user_id, "fitted_at": {"$lt": fitted_at}},
+            {
+                "user_id": user_id,
+                "report_id": report_id,
+                "fitted_at": fitted_at,
+                "updated_at": datetime.utcnow(),
+                "chunks": len(chunks),
+            },
+            upsert=True,
+        )
+    except DuplicateKeyError:  # a newer baseline is stored
+        model_baseline_chunks_col.delete_many({"user_id": user_id, "fitted_at": fitted_at})
+        return False
+    model_baseline_chunks_col.delete_many({"user_id": user_id, "fitted_at": {"$lt": fitted_at}})
+    return True
+
+
+def load_model_baseline_state(doc: dict) -> bytes | None:
+    """
+    The state of a ``get_model_baseline`` document; None when a refresh
+    has replaced it since the document was read.
+    """
+    if "state" in doc:  # stored before baselines were chunked
+        return doc["state"]
+    chunks = list(
+        model_baseline_chunks_col.find({"user_id": doc["user_id"], "fitted_at": doc["fitted_at"]}).sort("seq", ASCENDING)
+    )
+    if len(chunks) != doc["chunks"]:
+        return None
+    return b"".join(chunk["data"] for chunk in chunks)
+
+
+def get_model_baseline(user_id: str, fitted_at: str | None = None) -> dict | None:
+    """
+    The user's baseline document, without its state (see
+    ``load_model_baseline_state``).  A baseline stored with an inline state
+    is read whole unless ``fitted_at`` matches it (a cached copy).
+    """
+    doc = model_baselines_col.find_one(
+        {"user_id": user_id}, {"user_id": 1, "fitted_at": 1, "report_id": 1, "chunks": 1, "_id": 0},
+    )
+    if doc is None or doc.get("fitted_at") == fitted_at or "chunks" in doc:
+        return doc
+    return model_baselines_col.find_one({"user_id": user_id}, {"_id": 0})
+
+
+# ── Analysis job queue (one job per report, _id = report id) ──
+#
+#   queued ──claim──▶ running ──release──▶ completed | failed | cancelled
+#     ▲                  │
+#     └──── retry ───────┘   (error with attempts left, or lease expired)
+#
+# A claim leases the job to one worker for ``lease_seconds``; the worker
+# renews the lease while it runs.  A job whose lease expired (crashed or
+# partitioned worker) can be claimed again until ``max_attempts`` claims
+# were made, after which ``fail_expired_jobs`` fails it.
+#
+# A job's payload (the compressed upload) can be larger than one document
+# may be, so it lives in ``analysis_job_payloads`` as JOB_PAYLOAD_CHUNK_BYTES
+# chunks, written before the job.  They are dropped once the job completes;
+# a failed or cancelled job keeps them (90 days) so ``requeue_analysis_job``
+# can run it again.
+
+def enqueue_analysis_job(
+    user_id: str,
+    report_id: str,
+    kind: str,
+    params: dict,
+    payload: bytes | None,
+    stages_total: int,
+    max_attempts: int,
+) -> dict:
+    now = datetime.utcnow()
+    analysis_job_payloads_col.delete_many({"job_id": report_id})
+    payload = payload or b""
+    chunks = [
+        {"job_id": report_id, "seq": seq, "data": payload[start:start + JOB_PAYLOAD_CHUNK_BYTES], "created_at": now}
+        for seq, start in enumerate(range(0, len(payload), JOB_PAYLOAD_CHUNK_BYTES))
+    ]
+    if chunks:
+        analysis_job_payloads_col.insert_many(chunks)
+    job = {
+        "_id": report_id,
+        "user_id": user_id,
+        "kind": kind,
+        "params": params,
+        "payload_chunks": len(chunks),
+        "status": "queued",
+        "stage": None,
+        "stages_done": 0,
+        "stages_total": stages_total,
+        "progress": 0.0,
+        "cancel_requested": False,
+        "error": None,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "available_at": now,
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "created_at": now,
+        "updated_at": now,
+        "started_at": None,
+        "finished_at": None,
+    }
+    analysis_jobs_col.replace_one({"_id": report_id}, job, upsert=True)
+    return job
+
+
+def load_job_payload(job: dict) -> bytes | None:
+    """The payload stored with ``job`` by ``enqueue_analysis_job`` (None without one)."""
+    if "payload" in job:  # queued before payloads were chunked
+        return job["payload"]
+    if not job.get("payload_chunks"):
+        return None
+    chunks = list(analysis_job_payloads_col.find({"job_id": job["_id"]}).sort("seq", ASCENDING))
+    if len(chunks) != job["payload_chunks"]:
+        raise ValueError(f"Payload of job {job['_id']} is incomplete ({len(chunks)}/{job['payload_chunks']} chunks)")
+    return b"".join(chunk["data"] for chunk in chunks)
+
+
+def _saturated_tenants(now: datetime, tenant_limit: int) -> list[str]:
+    """Users that already have ``tenant_limit`` live (leased) running jobs."""
+    return [
+        doc["_id"]
+        for doc in analysis_jobs_col.aggregate([
+            {"$match": {"status": "running", "lease_expires_at": {"$gt": now}}},
+            {"$group": {"_id": "$user_id", "running": {"$sum": 1}}},
+            {"$match": {"running": {"$gte": tenant_limit}}},
+        ])
+    ]
+
+
+def claim_analysis_job(worker_id: str, lease_seconds: float, tenant_limit: int) -> dict | None:
+    """
+    Atomically lease the oldest claimable job to ``worker_id``: a queued
+    job that is due, or a running one whose lease expired.  Users at their
+    ``tenant_limit`` of running jobs are skipped (a soft limit: two workers
+    claiming at the same instant can overshoot it by one each).
+    """
+    now = datetime.utcnow()
+    query = {
+        "$or": [
+            {"status": "queued", "available_at": {"$lte": now}},
+            {"status": "running", "lease_expires_at": {"$lte": now}},
+        ],
+        "$expr": {"$lt": ["$attempts", "$max_attempts"]},
+    }
+    if tenant_limit > 0:
+        query["user_id"] = {"$nin": _saturated_tenants(now, tenant_limit)}
+    return analysis_jobs_col.find_one_and_update(
+        query,
+        {
+            "$set": {
+                "status": "running",
+                "lease_owner": worker_id,
+                "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                "started_at": now,
+                "updated_at": now,
+                "error": None,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("created_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def renew_job_lease(report_id: str, worker_id: str, lease_seconds: float) -> bool:
+    """Heartbeat; False once the job is no longer leased to ``worker_id``."""
+    now = datetime.utcnow()
+    result = analysis_jobs_col.update_one(
+        {"_id": report_id, "status": "running", "lease_owner": worker_id},
+        {"$set": {"lease_expires_at": now + timedelta(seconds=lease_seconds), "updated_at": now}},
+    )
+    return result.matched_count == 1
+
+
+def update_analysis_job(report_id: str, fields: dict, worker_id: str | None = None) -> dict | None:
+    """
+    Set ``fields`` on the job and return it.  With ``worker_id`` only while
+    the job is still leased to that worker (None otherwise).
+    """
+    query = {"_id": report_id}
+    if worker_id is not None:
+        query.update(status="running", lease_owner=worker_id)
+    return analysis_jobs_col.find_one_and_update(
+        query,
+        {"$set": {**fields, "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def release_analysis_job(report_id: str, worker_id: str, status: str, fields: dict,
+                         retry_after: float | None = None) -> bool:
+    """
+    Hand the job back: to a final ``status`` (dropping the payload of a
+    completed one), or –
+    for ``status="queued"`` – back to the queue after ``retry_after`` s.
+    False when the lease had already been lost.
+    """
+    now = datetime.utcnow()
+    update = {"$set": {**fields, "status": status, "lease_owner": None, "lease_expires_at": None, "updated_at": now}}
+    if status == "queued":
+        update["$set"]["available_at"] = now + timedelta(seconds=retry_after or 0)
+    else:
+        update["$set"]["finished_at"] = now
+        update["$unset"] = {"payload": ""}
+    result = analysis_jobs_col.update_one(
+        {"_id": report_id, "status": "running", "lease_owner": worker_id}, update,
+    )
+    if result.matched_count != 1:
+        return False
+    if status == "completed":
+        analysis_job_payloads_col.delete_many({"job_id": report_id})
+    return True
+
+
+def fail_expired_jobs() -> list[dict]:
+    """Fail running jobs whose lease expired with no attempts left; returns them."""
+    now = datetime.utcnow()
+    query = {
+        "status": "running",
+        "lease_expires_at": {"$lte": now},
+        "$expr": {"$gte": ["$attempts", "$max_attempts"]},
+    }
+    failed = []
+    for job in analysis_jobs_col.find(query, {"_id": 1, "user_id": 1}):
+        done = analysis_jobs_col.find_one_and_update(
+            {"_id": job["_id"], **query},
+            {
+                "$set": {
+                    "status": "failed",
+                    "error": "Worker lease expired on the last attempt",
+                    "lease_owner": None,
+                    "finished_at": now,
+                    "updated_at": now,
+                },
+                "$unset": {"payload": ""},
+            },
+        )
+        if done is not None:
+            failed.append(job)
+    return failed
+
+
+def next_job_wakeup() -> datetime | None:
+    """
+    When the queue next changes without anyone enqueuing: the soonest
+    retry (``available_at`` of a queued job) or lease expiry of a running
+    one.  None when no job is queued or running.
+    """
+    soonest = None
+    for status, field in (("queued", "available_at"), ("running", "lease_expires_at")):
+        doc = analysis_jobs_col.find_one(
+            {"status": status, field: {"$ne": None}}, {field: 1}, sort=[(field, ASCENDING)],
+        )
+        if doc is not None and (soonest is None or doc[field] < soonest):
+            soonest = doc[field]
+    return soonest
+
+
+def requeue_analysis_job(user_id: str, report_id: str, params: dict, stages_total: int,
+                         max_attempts: int) -> dict | None:
+    """
+    Queue a failed or cancelled job again on the payload it kept, with
+    ``params`` set over its params.  None when there is no such job or its
+    payload is gone.
+    """
+    job = analysis_jobs_col.find_one(
+        {"_id": report_id, "user_id": user_id, "status": {"$in": ["failed", "cancelled"]}},
+        {"payload_chunks": 1},
+    )
+    if not job or not job.get("payload_chunks"):
+        return None
+    if analysis_job_payloads_col.count_documents({"job_id": report_id}) != job["payload_chunks"]:
+        return None
+    now = datetime.utcnow()
+    return analysis_jobs_col.find_one_and_update(
+        {"_id": report_id, "status": {"$in": ["failed", "cancelled"]}},
+        {
+            "$set": {
+                **{f"params.{name}": value for name, value in params.items()},
+                "status": "queued",
+                "stage": None,
+                "stages_done": 0,
+                "stages_total": stages_total,
+                "progress": 0.0,
+                "cancel_requested": False,
+                "error": None,
+                "attempts": 0,
+                "max_attempts": max_attempts,
+                "available_at": now,
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "updated_at": now,
+                "started_at": None,
+                "finished_at": None,
+            },
+            "$unset": {"flagged_count": "", "degraded_signals": "", "baseline_error": ""},
+        },
+        projection={"payload": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def get_analysis_job(user_id: str, report_id: str) -> dict | None:
+    return analysis_jobs_col.find_one({"_id": report_id, "user_id": user_id}, {"payload": 0})
+
+
+def request_job_cancel(user_id: str, report_id: str) -> tuple[dict | None, bool]:
+    """
+    Cancel a queued job outright, or flag a running one (its worker stops
+    at the next stage boundary).  Returns (job after the update, whether
+    anything changed); an already finished job comes back unchanged.
+    """
+    now = datetime.utcnow()
+    job = analysis_jobs_col.find_one_and_update(
+        {"_id": report_id, "user_id": user_id, "status": "queued"},
+        {
+            "$set": {"status": "cancelled", "cancel_requested": True, "finished_at": now, "updated_at": now},
+            "$unset": {"payload": ""},
+        },
+        projection={"payload": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    if job is None:
+        job = analysis_jobs_col.find_one_and_update(
+            {"_id": report_id, "user_id": user_id, "status": "running"},
+            {"$set": {"cancel_requested": True, "updated_at": now}},
+            projection={"payload": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+    if job is not None:
+        return job, True
+    return get_analysis_job(user_id, report_id), False
+
+
 # ── ML Pipeline & UI State DB Operations ──────────────────────────────
 
 def save_flagged_transactions(user_id: str, report_id: str, anomalies: list[dict]) -> int:
@@ -121,38 +962,128 @@ def save_flagged_transactions(user_id: str, report_id: str, anomalies: list[dict
         print(f"🚨 DB Bulk Insert Warning: {e}")
         return 0
 
+# Result fields of a flag that a re-analysis may change; decision / reviewed_at
+# belong to the auditor and are never rewritten for a row that stays flagged
+FLAG_RESULT_FIELDS = ("amount", "risk_score", "explanation", "signals")
+
+# Flag fields of a transactions row that is not flagged
+ROW_UNFLAGGED = {"flagged": False, "explanation": "", "risk_score": 0.0, "decision": "monitor"}
+
+
+def write_flag_diff(user_id: str, report_id: str, flagged_docs: list[dict], update_rows: bool = True,
+                    session=None) -> dict[str, int]:
+    """
+    Bring the report's flags (and, with ``update_rows``, the flag fields of
+    its transactions rows) from the stored set to ``flagged_docs``, keyed
+    by transaction_id: new flags are inserted, vanished ones deleted and
+    kept ones only get their changed FLAG_RESULT_FIELDS – one ordered bulk
+    per collection, sized by what changed.  Returns the counts.
+    """
+    query = {"report_id": report_id, "user_id": user_id}
+    previous = {
+        doc.get("transaction_id", ""): doc
+        for doc in flagged_transactions_col.find(
+            query, {"transaction_id": 1, **{name: 1 for name in FLAG_RESULT_FIELDS}}, session=session,
+        )
+    }
+    current = {doc.get("transaction_id", ""): doc for doc in flagged_docs}
+
+    flag_ops, row_ops = [], []
+    counts = {"inserted": 0, "deleted": 0, "changed": 0, "unchanged": 0}
+
+    def _row(transaction_id: str, fields: dict) -> None:
+        if update_rows:
+            row_ops.append(UpdateOne({**query, "transaction_id": transaction_id}, {"$set": fields}))
+
+    for transaction_id in sorted(previous.keys() - current.keys()):
+        flag_ops.append(DeleteOne({"_id": previous[transaction_id]["_id"]}))
+        _row(transaction_id, ROW_UNFLAGGED)
+        counts["deleted"] += 1
+
+    for transaction_id, doc in current.items():
+        old = previous.get(transaction_id)
+        if old is None:
+            flag_ops.append(InsertOne({k: v for k, v in doc.items() if k != "_id"}))
+            _row(transaction_id, {
+                "flagged": True,
+                "explanation": doc.get("explanation", ""),
+                "risk_score": float(doc.get("risk_score", 0) or 0),
+                "decision": doc.get("decision", "review_required"),
+            })
+            counts["inserted"] += 1
+            continue
+        changed = {name: doc.get(name) for name in FLAG_RESULT_FIELDS if doc.get(name) != old.get(name)}
+        if not changed:
+            counts["unchanged"] += 1
+            continue
+        flag_ops.append(UpdateOne({"_id": old["_id"]}, {"$set": changed}))
+        row_fields = {name: value for name, value in changed.items() if name in ROW_UNFLAGGED}
+        if row_fields:
+            _row(transaction_id, row_fields)
+        counts["changed"] += 1
+
+    if flag_ops:
+        flagged_transactions_col.bulk_write(flag_ops, ordered=True, session=session)
+    if row_ops:
+        transactions_col.bulk_write(row_ops, ordered=True, session=session)
+    return counts
+
+
 def update_report_status(user_id: str, report_id: str, status: str) -> bool:
     """Update report status to tell the React frontend when math is done."""
     try:
-        result = audit_reports_col.update_one(
-            {"_id": ObjectId(report_id), "user_id": user_id},
-            {"$set": {"status": status}}
-        )
-        return result.modified_count > 0
+        before = update_report({"_id": ObjectId(report_id), "user_id": user_id}, {"status": status})
+        return before is not None and before.get("status") != status
     except Exception as e:
         print(f"🚨 Failed to update report status: {e}")
         return False
 
+def set_flag_decision(user_id: str, report_id: str, transaction_id: str, decision: str,
+                      fields: dict | None = None, session=None) -> dict | None:
+    """
+    Set a flag's decision (and ``fields``) and move it between the decision
+    counts of the report's analytics, in one transaction: a concurrent
+    decision on the same flag conflicts and starts over, so the counts
+    always move from the decision the flag really had.  Returns the
+    updated flag, or None when there is no such flag.
+    """
+    update = {"decision": decision, **(fields or {})}
+
+    def _set(session):
+        before = flagged_transactions_col.find_one_and_update(
+            {"user_id": user_id, "report_id": report_id, "transaction_id": transaction_id},
+            {"$set": update},
+            return_document=ReturnDocument.BEFORE,
+            session=session,
+        )
+        if before is None:
+            return None
+        previous = before.get("decision") or "review_required"
+        if previous != decision:
+            amount = float(before.get("amount") or 0)
+            report_analytics_col.update_one(
+                {"_id": report_id, "user_id": user_id},
+                {"$inc": {
+                    f"decisions.{previous}.count": -1, f"decisions.{previous}.amount": -amount,
+                    f"decisions.{decision}.count": 1, f"decisions.{decision}.amount": amount,
+                }},
+                session=session,
+            )
+        return {**before, **update}
+
+    return in_transaction(_set, session)
+
+
 def update_anomaly_status(user_id: str, report_id: str, transaction_id: str, decision: str) -> bool:
     """
     Triggered by Accept/Reject buttons on the frontend.
     Updates the transaction state (e.g., 'false_positive' or 'confirmed_fraud').
     """
     try:
-        result = flagged_transactions_col.update_one(
-            {
-                "user_id": user_id,
-                "report_id": report_id,
-                "transaction_id": transaction_id
-            },
-            {
-                "$set": {
-                    "decision": decision,
-                    "reviewed_at": datetime.utcnow()
-                }
-            }
+        flag = set_flag_decision(
+            user_id, report_id, transaction_id, decision, {"reviewed_at": datetime.utcnow()},
         )
-        return result.modified_count > 0
+        return flag is not None
     except Exception as e:
         print(f"🚨 Failed to update anomaly status: {e}")
         return False
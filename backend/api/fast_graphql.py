@@ -0,0 +1,169 @@
+"""
+Fast GraphQL Execution & Rendering
+──────────────────────────────────
+A 50k-row ``transactions`` query spends most of its time in graphql-core
+completing every field of every row: one resolver call, one leaf
+completion and one path object per cell.  Two shortcuts, both used by
+``FastGraphQLView`` (``audithawk_core/urls.py``):
+
+FastExecutionContext
+────────────────────
+For a list of at least ``FAST_LIST_MIN_ITEMS`` objects whose selected
+fields all use graphene's default (dict / attribute) resolvers – leaf
+fields and nested objects such as ``edges { cursor node { … } }`` – the
+selection is compiled once into a plan, and each row is serialized by
+reading its values and calling the scalar's ``serialize`` directly.
+
+Anything else falls back to the normal completion: a custom resolver,
+arguments, lists or abstract types below the list, middleware, a value
+the plan cannot serialize (including nulls in non-null fields, so errors
+keep their normal paths and messages).
+
+JSON rendering
+──────────────
+Responses are encoded with ``orjson`` when it is installed (optional;
+``json`` otherwise).
+"""
+
+from __future__ import annotations
+
+import os
+from functools import partial
+from typing import Any
+
+from graphene.types.resolver import attr_resolver, dict_or_attr_resolver, dict_resolver
+from graphene_django.views import GraphQLView
+from graphql import (
+    ExecutionContext,
+    get_nullable_type,
+    is_leaf_type,
+    is_non_null_type,
+    is_object_type,
+)
+from graphql.pyutils import Undefined
+
+try:
+    import orjson
+except ImportError:  # optional: plain json is used instead
+    orjson = None
+
+
+FAST_LIST_MIN_ITEMS = int(os.getenv("AUDITHAWK_FAST_LIST_MIN_ITEMS", "100"))
+
+_DEFAULT_RESOLVERS = (dict_or_attr_resolver, dict_resolver, attr_resolver)
+
+
+class _Fallback(Exception):
+    """The plan cannot serialize this list; complete it the normal way."""
+
+
+def _serialize_rows(plan: list[tuple], items: list, nullable_items: bool) -> list:
+    rows = []
+    append = rows.append
+    for item in items:
+        if item is None:
+            if not nullable_items:
+                raise _Fallback
+            append(None)
+            continue
+        append(_serialize(plan, item))
+    return rows
+
+
+def _serialize(plan: list[tuple], item: Any) -> dict:
+    is_dict = isinstance(item, dict)
+    if not is_dict and hasattr(item, "__await__"):
+        raise _Fallback
+    out = {}
+    for key, attname, default, non_null, serialize, subplan in plan:
+        if attname is None:  # __typename
+            out[key] = serialize
+            continue
+        value = item.get(attname, default) if is_dict else getattr(item, attname, default)
+        if value is None:
+            if non_null:
+                raise _Fallback
+            out[key] = None
+            continue
+        if subplan is None:
+            value = serialize(value)
+            if value is None or value is Undefined:
+                raise _Fallback
+        else:
+            value = _serialize(subplan, value)
+        out[key] = value
+    return out
+
+
+class FastExecutionContext(ExecutionContext):
+    """``ExecutionContext`` with the compiled-plan shortcut for large object lists."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._plans: dict[tuple, list[tuple] | None] = {}
+
+    def _plan(self, object_type, field_nodes) -> list[tuple] | None:
+        cache_key = (object_type.name, tuple(map(id, field_nodes)))
+        if cache_key not in self._plans:
+            self._plans[cache_key] = self._compile(object_type, field_nodes)
+        return self._plans[cache_key]
+
+    def _compile(self, object_type, field_nodes) -> list[tuple] | None:
+        """(response key, attribute, default, non-null, serialize | typename, sub-plan) per field."""
+        if object_type.is_type_of is not None:
+            return None
+        plan = []
+        for key, nodes in self.collect_subfields(object_type, field_nodes).items():
+            name = nodes[0].name.value
+            if name == "__typename":
+                plan.append((key, None, None, False, object_type.name, None))
+                continue
+            field_def = object_type.fields.get(name)
+            if field_def is None or field_def.args:
+                return None
+            resolve = field_def.resolve
+            if not (isinstance(resolve, partial) and resolve.func in _DEFAULT_RESOLVERS and not resolve.keywords):
+                return None
+            attname, default = resolve.args
+            field_type = get_nullable_type(field_def.type)
+            non_null = is_non_null_type(field_def.type)
+            if is_leaf_type(field_type):
+                plan.append((key, attname, default, non_null, field_type.serialize, None))
+            elif is_object_type(field_type):
+                subplan = self._compile(field_type, nodes)
+                if subplan is None:
+                    return None
+                plan.append((key, attname, default, non_null, None, subplan))
+            else:
+                return None
+        return plan
+
+    def complete_list_value(self, return_type, field_nodes, info, path, result):
+        item_type = return_type.of_type
+        object_type = get_nullable_type(item_type)
+        if self.middleware_manager is None and is_object_type(object_type) and not isinstance(result, (str, bytes)):
+            try:
+                items = list(result)
+            except TypeError:  # not iterable: let graphql-core report it
+                items = None
+            if items is not None:
+                result = items
+                if len(items) >= FAST_LIST_MIN_ITEMS:
+                    plan = self._plan(object_type, field_nodes)
+                    if plan is not None:
+                        try:
+                            return _serialize_rows(plan, items, not is_non_null_type(item_type))
+                        except Exception:  # _Fallback, or a value serialize rejects
+                            pass
+        return super().complete_list_value(return_type, field_nodes, info, path, result)
+
+
+class FastGraphQLView(GraphQLView):
+    """``GraphQLView`` with ``FastExecutionContext`` and orjson encoding."""
+
+    execution_context_class = FastExecutionContext
+
+    def json_encode(self, request, d, pretty=False):
+        if orjson is None or self.pretty or pretty or request.GET.get("pretty"):
+            return super().json_encode(request, d, pretty=pretty)
+        return orjson.dumps(d)
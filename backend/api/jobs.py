@@ -0,0 +1,382 @@
+"""
+Background Analysis Jobs
+────────────────────────
+Uploads return as soon as the CSV is parsed and the report exists; the
+inserts, the ML pipeline and the write-back run as a job from the
+``analysis_jobs`` queue (``db.py``, ``_id`` = report id).
+
+Who runs jobs
+─────────────
+  analysis workers  – ``python manage.py analysis_worker`` on any node
+                      (``start.bat`` starts one); each process runs one
+                      job at a time, so compute scales by starting more
+                      of them.  This is the supported way to run jobs:
+                      without a worker, uploads stay queued
+  Django processes  – ``AUDITHAWK_ANALYSIS_WORKERS`` threads (default 0,
+                      off) that drain the queue after each upload.  Only
+                      for single-process development setups: the ML then
+                      competes with request handling, dies with the web
+                      process, and every gunicorn worker starts its own
+                      pool.  Once idle, they arm a timer for the soonest
+                      retry or lease expiry (``next_job_wakeup``), so a
+                      job backed off or orphaned is picked up without a
+                      new upload
+
+Both claim jobs the same way: oldest first, skipping users that already
+have ``TENANT_MAX_RUNNING`` jobs running (fair share between tenants).
+
+Leases
+──────
+A claimed job is leased for ``JOB_LEASE_SECONDS`` and renewed by a
+heartbeat thread.  A worker that crashes stops renewing; once the lease
+expires another worker re-claims the job, up to ``JOB_MAX_ATTEMPTS``
+claims in total.  Jobs that fail with an error are retried after
+``JOB_RETRY_BACKOFF_SECONDS`` × attempts on the same budget.
+
+Jobs have no HTTP client waiting on them, so the ML pipeline runs without
+the request-time deadline; ``AUDITHAWK_JOB_DEADLINE_SECONDS`` gives each
+attempt a budget of its own (off when unset or 0).
+
+A run is fenced by the report's ``analysis_owner``: the commit's report
+updates only match while the worker is still the owner, so a worker that
+lost its lease cannot commit a second copy of the results.
+
+Progress and cancellation
+─────────────────────────
+The ``PipelineProfiler`` stage listener writes the current stage and
+progress (finished stages / expected stages) and reads
+``cancel_requested`` back at every stage boundary, raising
+``AnalysisCancelled`` when it is set.  Rows a cancelled or failed upload
+had already committed are discarded.  Queued jobs are cancelled outright.
+A failed or cancelled upload keeps its CSV, so ``AnalyzeReport`` can run
+it again (``requeue_upload``).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable
+
+from .db import (
+    claim_analysis_job,
+    discard_report_rows,
+    enqueue_analysis_job,
+    fail_expired_jobs,
+    load_job_payload,
+    next_job_wakeup,
+    release_analysis_job,
+    requeue_analysis_job,
+    renew_job_lease,
+    update_analysis_job,
+    update_report_status,
+)
+
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_WORKERS = int(os.getenv("AUDITHAWK_ANALYSIS_WORKERS", "0"))
+JOB_LEASE_SECONDS = float(os.getenv("AUDITHAWK_JOB_LEASE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("AUDITHAWK_JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("AUDITHAWK_JOB_RETRY_BACKOFF_SECONDS", "30"))
+TENANT_MAX_RUNNING = int(os.getenv("AUDITHAWK_TENANT_MAX_RUNNING", "2"))
+JOB_DEADLINE_SECONDS = float(os.getenv("AUDITHAWK_JOB_DEADLINE_SECONDS", "0")) or None
+
+# Shortest wake-up delay: a due job can still be unclaimable (its user is at
+# TENANT_MAX_RUNNING), so idle workers look again at this pace at most
+JOB_WAKE_MIN_SECONDS = 2.0
+
+# Stages of an upload job around the engines of its profile
+UPLOAD_COMPUTE_STAGES = ["parse", "features"]
+UPLOAD_COMMIT_STAGES = [
+    "combine",
+    "narrate",
+    "mongo_commit_begin",
+    "mongo_insert_transactions",
+    "mongo_insert_batch",
+    "mongo_write_score_cache",
+    "mongo_write_flags",
+    "mongo_write_analytics",
+]
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_draining = 0
+_rekick = False
+_wake_timer: threading.Timer | None = None
+_wake_due = 0.0  # time.monotonic() the armed timer fires at
+
+
+class AnalysisCancelled(Exception):
+    """Raised at a stage boundary once the job's cancellation was requested."""
+
+
+class LeaseLost(Exception):
+    """The job is no longer leased to this worker; another one owns it now."""
+
+
+def worker_name(label: str = "") -> str:
+    """Unique id of a worker (host, pid, and a random suffix per worker)."""
+    return f"{socket.gethostname()}:{os.getpid()}:{label or uuid.uuid4().hex[:8]}"
+
+
+def upload_job_stages(profile: str) -> list[str]:
+    from .ml_engine.ensemble import PIPELINE_PROFILES
+    return UPLOAD_COMPUTE_STAGES + list(PIPELINE_PROFILES[profile]) + UPLOAD_COMMIT_STAGES
+
+
+def enqueue_upload(user_id: str, report_id: str, csv_content: str, params: dict[str, Any]) -> dict:
+    """Queue the analysis of an uploaded CSV (kept zlib-compressed with the job)."""
+    job = enqueue_analysis_job(
+        user_id,
+        report_id,
+        kind="upload",
+        params=params,
+        payload=zlib.compress(csv_content.encode()),
+        stages_total=len(upload_job_stages(params["profile"])),
+        max_attempts=JOB_MAX_ATTEMPTS,
+    )
+    kick()
+    return job
+
+
+def requeue_upload(user_id: str, report_id: str, params: dict[str, Any]) -> dict | None:
+    """
+    Run a failed or cancelled upload's analysis again on the CSV its job
+    kept, with ``params`` (e.g. a new profile) over the original ones.
+    None when the job kept no CSV.
+    """
+    job = requeue_analysis_job(
+        user_id,
+        report_id,
+        params=params,
+        stages_total=len(upload_job_stages(params["profile"])),
+        max_attempts=JOB_MAX_ATTEMPTS,
+    )
+    if job is not None:
+        kick()
+    return job
+
+
+# ── running a claimed job ────────────────────────────────
+
+class JobLease:
+    """Renews a job's lease in the background while the block runs."""
+
+    def __init__(self, report_id: str, worker_id: str, lease_seconds: float):
+        self.report_id = report_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _beat(self) -> None:
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not renew_job_lease(self.report_id, self.worker_id, self.lease_seconds):
+                    self.lost.set()
+                    return
+            except Exception:  # transient Mongo trouble: try again next beat
+                logger.warning("Lease renewal for job %s failed", self.report_id, exc_info=True)
+
+    def __enter__(self) -> "JobLease":
+        self._thread = threading.Thread(target=self._beat, name=f"lease-{self.report_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class JobProgress:
+    """``PipelineProfiler`` listener: progress → Mongo, cancellation / lease loss ← Mongo."""
+
+    def __init__(self, report_id: str, worker_id: str, stages: list[str], lease: JobLease):
+        self.report_id = report_id
+        self.worker_id = worker_id
+        self.stages = set(stages)
+        self.total = len(stages)
+        self.lease = lease
+        self.done: set[str] = set()
+        self._lock = threading.Lock()  # engines may finish on executor threads
+
+    def __call__(self, event: str, name: str) -> None:
+        if self.lease.lost.is_set():
+            raise LeaseLost(f"Lost the lease on job {self.report_id}")
+        with self._lock:
+            if event == "start":
+                fields: dict[str, Any] = {"stage": name}
+            else:
+                if name in self.stages:
+                    self.done.add(name)
+                fields = {
+                    "stages_done": len(self.done),
+                    "progress": round(len(self.done) / self.total, 4) if self.total else 1.0,
+                }
+        job = update_analysis_job(self.report_id, fields, worker_id=self.worker_id)
+        if job is None:
+            raise LeaseLost(f"Lost the lease on job {self.report_id}")
+        if job.get("cancel_requested"):
+            raise AnalysisCancelled(f"Analysis of report {self.report_id} was cancelled")
+
+    def reset(self) -> None:
+        """Forget progress from a failed attempt (a retried transaction)."""
+        with self._lock:
+            self.done.clear()
+
+
+def _run_upload(job: dict, progress: JobProgress) -> dict[str, Any]:
+    from .csv_parser import parse_transaction_csv
+    from .ml_engine.deadline import deadline_after
+    from .ml_engine.profiling import PipelineProfiler
+    from .schema import analyze_upload
+
+    params = job["params"]
+    deadline = deadline_after(JOB_DEADLINE_SECONDS)
+    profiler = PipelineProfiler(on_stage=progress)
+    with profiler.stage("parse") as record:
+        csv_content = zlib.decompress(load_job_payload(job)).decode()
+        transactions, _summary = parse_transaction_csv(csv_content)
+        record["bytes_in"] = len(csv_content)
+        record["rows_out"] = len(transactions)
+    return analyze_upload(
+        progress, profiler, job["user_id"], job["_id"], params["file_name"], transactions,
+        params["uploaded_at"], params["threshold_limit"], params["profile"],
+        storage=params.get("storage", "documents"), deadline=deadline,
+    )
+
+
+# kind → runner(job, progress) returning the fields stored on the finished job
+JOB_RUNNERS: dict[str, Callable[[dict, JobProgress], dict[str, Any]]] = {
+    "upload": _run_upload,
+}
+
+
+def run_claimed_job(job: dict, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS) -> str:
+    """Run a job leased to ``worker_id`` and release it; returns its new status."""
+    report_id, user_id = job["_id"], job["user_id"]
+    stages = upload_job_stages(job["params"]["profile"]) if job["kind"] == "upload" else []
+    with JobLease(report_id, worker_id, lease_seconds) as lease:
+        progress = JobProgress(report_id, worker_id, stages, lease)
+        try:
+            if job.get("cancel_requested"):
+                raise AnalysisCancelled(f"Analysis of report {report_id} was cancelled")
+            result = JOB_RUNNERS[job["kind"]](job, progress) or {}
+            status, fields = "completed", {"stage": None, "progress": 1.0, "stages_done": len(stages), **result}
+        except AnalysisCancelled:
+            status, fields = "cancelled", {}
+        except LeaseLost:
+            logger.warning("Job %s: lease lost, leaving it to its new owner", report_id)
+            return "lease_lost"
+        except Exception as e:
+            logger.exception("Job %s failed (attempt %s/%s)", report_id, job["attempts"], job["max_attempts"])
+            status, fields = "failed", {"error": str(e)}
+            if job["attempts"] < job["max_attempts"]:
+                status = "queued"
+
+    retry_after = JOB_RETRY_BACKOFF_SECONDS * job["attempts"] if status == "queued" else None
+    if not release_analysis_job(report_id, worker_id, status, fields, retry_after=retry_after):
+        return "lease_lost"
+    if status != "completed":
+        if status != "queued" and job["kind"] == "upload":
+            discard_report_rows(user_id, report_id)  # a commit interrupted by the failure / cancel
+        update_report_status(user_id, report_id, status)
+    return status
+
+
+def process_next_job(worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS,
+                     tenant_limit: int = TENANT_MAX_RUNNING) -> dict | None:
+    """Claim and run one job; returns it (None when nothing was claimable)."""
+    job = claim_analysis_job(worker_id, lease_seconds, tenant_limit)
+    if job is None:
+        return None
+    job["outcome"] = run_claimed_job(job, worker_id, lease_seconds)
+    return job
+
+
+def reap_expired_jobs() -> int:
+    """Fail jobs whose last attempt's worker vanished; returns how many."""
+    failed = fail_expired_jobs()
+    for job in failed:
+        discard_report_rows(job["user_id"], job["_id"])
+        update_report_status(job["user_id"], job["_id"], "failed")
+    return len(failed)
+
+
+# ── in-process workers (Django) ──────────────────────────
+
+def _drain() -> None:
+    global _draining, _rekick
+    worker_id = worker_name(threading.current_thread().name)
+    try:
+        reap_expired_jobs()
+    except Exception:
+        logger.exception("Reaping expired analysis jobs failed")
+    while True:
+        try:
+            if process_next_job(worker_id) is not None:
+                continue
+        except Exception:
+            logger.exception("Analysis worker %s could not run a job", worker_id)
+        with _pool_lock:
+            # an upload queued while this worker was finding nothing left to claim
+            if not _rekick:
+                _draining -= 1
+                break
+            _rekick = False
+    try:
+        _schedule_wakeup()
+    except Exception:
+        logger.exception("Scheduling the next analysis job wake-up failed")
+
+
+def _schedule_wakeup() -> None:
+    """Arm (or bring forward) the timer that kicks the workers at the next retry / lease expiry."""
+    global _wake_timer, _wake_due
+    due_at = next_job_wakeup()
+    if due_at is None:
+        return
+    delay = max((due_at - datetime.utcnow()).total_seconds(), JOB_WAKE_MIN_SECONDS)
+    due = time.monotonic() + delay
+    with _pool_lock:
+        if _wake_timer is not None and _wake_due <= due + JOB_WAKE_MIN_SECONDS:
+            return  # already armed for about then, or sooner
+        if _wake_timer is not None:
+            _wake_timer.cancel()
+        _wake_timer = threading.Timer(delay, _wake)
+        _wake_timer.daemon = True
+        _wake_due = due
+        _wake_timer.start()
+
+
+def _wake() -> None:
+    global _wake_timer
+    with _pool_lock:
+        if _wake_timer is threading.current_thread():
+            _wake_timer = None
+    kick()
+
+
+def kick() -> None:
+    """Let an idle in-process worker drain the queue (no-op with 0 workers)."""
+    global _pool, _draining, _rekick
+    if ANALYSIS_WORKERS <= 0:
+        return
+    with _pool_lock:
+        _rekick = True
+        if _draining >= ANALYSIS_WORKERS:
+            return
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="analysis")
+        _draining += 1
+    _pool.submit(_drain)
@@ -0,0 +1,94 @@
+"""
+Analysis worker
+───────────────
+    python manage.py analysis_worker
+    python manage.py analysis_worker --tenant-limit 1 --lease-seconds 120
+    python manage.py analysis_worker --once
+
+Claims jobs from the ``analysis_jobs`` queue and runs them (see
+``api/jobs.py``), one at a time.  Start as many of these processes as the
+nodes have cores to spare; they coordinate only through Mongo leases.
+The web processes run no jobs unless ``AUDITHAWK_ANALYSIS_WORKERS`` is
+set, so uploads are analysed only while at least one worker is running.
+
+SIGTERM / SIGINT finish the running job and then exit.  A worker that
+dies instead stops renewing its lease, and the job is picked up again by
+another worker once the lease expires.
+"""
+
+from __future__ import annotations
+
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+
+DEFAULT_POLL_SECONDS = 2.0
+REAP_INTERVAL_SECONDS = 30.0
+
+
+class Command(BaseCommand):
+    help = "Run queued analysis jobs (upload analyses) from the Mongo job queue."
+
+    def add_arguments(self, parser):
+        from api.jobs import JOB_LEASE_SECONDS, TENANT_MAX_RUNNING
+
+        parser.add_argument("--worker-id", default=None, help="Defaults to host:pid:random")
+        parser.add_argument("--lease-seconds", type=float, default=JOB_LEASE_SECONDS)
+        parser.add_argument("--tenant-limit", type=int, default=TENANT_MAX_RUNNING,
+                            help="Max running jobs per user across all workers (0 = unlimited)")
+        parser.add_argument("--poll-seconds", type=float, default=DEFAULT_POLL_SECONDS,
+                            help="Sleep between claims while the queue is empty")
+        parser.add_argument("--max-jobs", type=int, default=0, help="Exit after this many jobs (0 = never)")
+        parser.add_argument("--once", action="store_true", help="Exit as soon as the queue is empty")
+
+    def handle(self, *args, **options):
+        from api.jobs import process_next_job, reap_expired_jobs, worker_name
+
+        worker_id = options["worker_id"] or worker_name()
+        stopping = False
+
+        def _stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+            self.stdout.write(f"{worker_id}: stopping after the current job")
+
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+
+        self.stdout.write(
+            f"{worker_id}: waiting for jobs (lease {options['lease_seconds']:.0f}s, "
+            f"tenant limit {options['tenant_limit'] or 'none'})"
+        )
+        jobs_run = 0
+        next_reap = 0.0
+        while not stopping:
+            started = time.perf_counter()
+            try:
+                if time.monotonic() >= next_reap:
+                    reaped = reap_expired_jobs()
+                    if reaped:
+                        self.stderr.write(f"{worker_id}: failed {reaped} job(s) whose last worker vanished")
+                    next_reap = time.monotonic() + REAP_INTERVAL_SECONDS
+                job = process_next_job(worker_id, options["lease_seconds"], options["tenant_limit"])
+            except Exception as e:  # Mongo unreachable etc.: back off and try again
+                self.stderr.write(f"{worker_id}: {e}")
+                time.sleep(options["poll_seconds"])
+                continue
+
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_seconds"])
+                continue
+
+            jobs_run += 1
+            self.stdout.write(
+                f"{worker_id}: job {job['_id']} (user {job['user_id']}, attempt {job['attempts']}) "
+                f"→ {job['outcome']} in {time.perf_counter() - started:.1f}s"
+            )
+            if options["max_jobs"] and jobs_run >= options["max_jobs"]:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f"{worker_id}: ran {jobs_run} job(s)"))
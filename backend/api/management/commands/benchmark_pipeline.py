@@ -0,0 +1,265 @@
+"""
+Pipeline benchmark
+──────────────────
+    python manage.py benchmark_pipeline --scales 10000,100000,1000000
+    python manage.py benchmark_pipeline --save-baseline
+    python manage.py benchmark_pipeline --cprofile pipeline.prof
+
+Generates synthetic ledgers (``ml_engine/synthetic.py``) at each scale and
+times the CSV parser and every ML stage (features, lof, ae, graph,
+combine, narrate) with the ``PipelineProfiler``.  Each scale runs in a
+fresh process, so the reported RSS peaks are comparable across scales.
+
+Baselines
+─────────
+``--save-baseline`` stores the results in ``--baseline``.  Later runs are
+compared against it: a stage that got more than ``--tolerance`` slower
+(and by at least ``--min-regression-ms``) or a run peak RSS that grew by
+more than ``--tolerance`` fails the command.  Baselines are machine
+specific – compare runs from the same host and profile only.
+
+Profiling
+─────────
+``--cprofile out.prof`` runs the largest scale in-process under cProfile
+and writes a pstats file (snakeviz, ``flameprof out.prof > flame.svg`` or
+``python -m pstats``) instead of benchmarking.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+DEFAULT_SCALES = "10000,100000"
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, "benchmarks", "pipeline_baseline.json")
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MIN_REGRESSION_MS = 50.0
+
+
+# ── worker side (module-level so spawned workers can import it) ──
+
+def _bench_scale(n_rows: int, options: dict) -> dict:
+    """Generate, parse and score one synthetic ledger; returns its timings."""
+    from api.csv_parser import parse_transaction_csv
+    from api.ml_engine.ensemble import run_pipeline
+    from api.ml_engine.profiling import PipelineProfiler
+    from api.ml_engine.synthetic import generate_ledger, to_csv, to_records
+
+    ledger = generate_ledger(
+        n_rows,
+        n_merchants=options["merchants"],
+        n_accounts=options["accounts"],
+        anomaly_rate=options["anomaly_rate"],
+        seed=options["seed"],
+    )
+    profiler = PipelineProfiler(trace_memory=options["trace_memory"])
+
+    if options["parse"]:
+        content = to_csv(ledger)
+        with profiler.stage("parse", rows_in=len(ledger)) as record:
+            records, _summary = parse_transaction_csv(content)
+            record["rows_out"] = len(records)
+        del content
+    else:
+        records = to_records(ledger)
+    del ledger
+
+    started = time.perf_counter()
+    flagged = run_pipeline(
+        records,
+        "benchmark",
+        profiler=profiler,
+        cache=None,
+        executor=options["executor"],
+        profile=options["profile"],
+    )
+    pipeline_s = time.perf_counter() - started
+
+    report = profiler.to_dict()
+    return {
+        "rows": n_rows,
+        "flagged": len(flagged),
+        "rows_per_s": round(n_rows / pipeline_s, 1) if pipeline_s else None,
+        "run_peak_rss_mb": report["run_peak_rss_mb"],
+        "stages": {
+            stage["stage"]: {
+                "wall_ms": stage["wall_ms"],
+                "cpu_ms": stage["cpu_ms"],
+                "rss_mb": stage["rss_mb"],
+                "peak_traced_mb": stage["peak_traced_mb"],
+            }
+            for stage in report["stages"]
+            if stage["wall_ms"] is not None
+        },
+    }
+
+
+# ── command ──────────────────────────────────────────────
+
+class Command(BaseCommand):
+    help = "Time the parser and every ML stage on synthetic ledgers and check for regressions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scales", default=DEFAULT_SCALES,
+                            help="Comma-separated row counts (e.g. 10000,100000,1000000,10000000)")
+        parser.add_argument("--merchants", type=int, default=500)
+        parser.add_argument("--accounts", type=int, default=2000)
+        parser.add_argument("--anomaly-rate", type=float, default=0.002)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--profile", default=None, help="Engine profile: fast | standard | deep")
+        parser.add_argument("--executor", default=None, help="sequential | thread | process")
+        parser.add_argument("--skip-parse", action="store_true", help="Feed records straight to the pipeline")
+        parser.add_argument("--trace-memory", action="store_true", help="Record tracemalloc peaks (slower)")
+        parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+        parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+        parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                            help="Allowed relative slowdown / RSS growth before failing")
+        parser.add_argument("--min-regression-ms", type=float, default=DEFAULT_MIN_REGRESSION_MS,
+                            help="Ignore slowdowns smaller than this (timer noise)")
+        parser.add_argument("--json", dest="json_out", default=None, help="Also write the results here")
+        parser.add_argument("--cprofile", default=None,
+                            help="Profile the largest scale with cProfile and write a .prof file")
+
+    def handle(self, *args, **options):
+        from api.ml_engine.ensemble import DEFAULT_PROFILE, PIPELINE_PROFILES
+
+        try:
+            scales = sorted({int(s) for s in options["scales"].split(",") if s.strip()})
+        except ValueError:
+            raise CommandError(f"--scales must be comma-separated integers, got '{options['scales']}'")
+        if not scales or scales[0] <= 0:
+            raise CommandError("--scales needs at least one positive row count")
+
+        profile = (options["profile"] or DEFAULT_PROFILE).lower()
+        if profile not in PIPELINE_PROFILES:
+            raise CommandError(f"Unknown profile '{profile}'. Expected one of: {', '.join(PIPELINE_PROFILES)}")
+
+        bench_options = {
+            "merchants": options["merchants"],
+            "accounts": options["accounts"],
+            "anomaly_rate": options["anomaly_rate"],
+            "seed": options["seed"],
+            "profile": profile,
+            "executor": options["executor"],
+            "parse": not options["skip_parse"],
+            "trace_memory": options["trace_memory"],
+        }
+
+        if options["cprofile"]:
+            self._cprofile(scales[-1], bench_options, options["cprofile"])
+            return
+
+        results = {}
+        for n_rows in scales:
+            self.stdout.write(f"── {n_rows:,} rows ──")
+            # a fresh process per scale keeps RSS numbers independent of earlier scales
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                result = pool.submit(_bench_scale, n_rows, bench_options).result()
+            results[str(n_rows)] = result
+            self._print_scale(result)
+
+        run = {
+            "meta": {
+                "generated_at": datetime.utcnow().isoformat(),
+                "host": platform.node(),
+                "python": platform.python_version(),
+                "cpu_count": os.cpu_count(),
+                "profile": profile,
+                "executor": options["executor"],
+                "parse": bench_options["parse"],
+            },
+            "scales": results,
+        }
+        if options["json_out"]:
+            self._write_json(options["json_out"], run)
+
+        baseline_path = options["baseline"]
+        if options["save_baseline"]:
+            self._write_json(baseline_path, run)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {baseline_path}"))
+            return
+
+        if not os.path.exists(baseline_path):
+            self.stdout.write(f"No baseline at {baseline_path}; run with --save-baseline to create one")
+            return
+        with open(baseline_path, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+
+        regressions = self._compare(baseline, run, options["tolerance"], options["min_regression_ms"])
+        if regressions:
+            for line in regressions:
+                self.stderr.write(line)
+            raise CommandError(f"{len(regressions)} regression(s) against {baseline_path}")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {baseline_path}"))
+
+    # ── helpers ──
+
+    def _print_scale(self, result: dict) -> None:
+        for name, stage in result["stages"].items():
+            self.stdout.write(
+                f"  {name:<10} {stage['wall_ms']:>12,.1f} ms wall {stage['cpu_ms']:>12,.1f} ms cpu "
+                f"{stage['rss_mb'] or 0:>9,.1f} MB rss"
+            )
+        self.stdout.write(
+            f"  {result['flagged']} flagged, {result['rows_per_s'] or 0:,.0f} rows/s, "
+            f"run peak RSS {result['run_peak_rss_mb'] or 0:,.1f} MB"
+        )
+
+    @staticmethod
+    def _compare(baseline: dict, run: dict, tolerance: float, min_regression_ms: float) -> list[str]:
+        """One message per stage / scale that regressed beyond the tolerance."""
+        base_meta, meta = baseline.get("meta", {}), run["meta"]
+        for key in ("profile", "executor", "parse"):
+            if base_meta.get(key) != meta[key]:
+                raise CommandError(
+                    f"Baseline was recorded with {key}={base_meta.get(key)!r}, this run uses {meta[key]!r}"
+                )
+
+        regressions = []
+        for scale, result in run["scales"].items():
+            base = baseline.get("scales", {}).get(scale)
+            if base is None:
+                continue
+            for name, stage in result["stages"].items():
+                base_stage = base["stages"].get(name)
+                if not base_stage or not base_stage.get("wall_ms"):
+                    continue
+                before, after = base_stage["wall_ms"], stage["wall_ms"]
+                if after > before * (1 + tolerance) and after - before >= min_regression_ms:
+                    regressions.append(
+                        f"{scale} rows / {name}: {before:,.1f} ms → {after:,.1f} ms (+{after / before - 1:.0%})"
+                    )
+            before, after = base.get("run_peak_rss_mb"), result["run_peak_rss_mb"]
+            if before and after and after > before * (1 + tolerance):
+                regressions.append(
+                    f"{scale} rows / peak RSS: {before:,.1f} MB → {after:,.1f} MB (+{after / before - 1:.0%})"
+                )
+        return regressions
+
+    def _cprofile(self, n_rows: int, bench_options: dict, path: str) -> None:
+        import cProfile
+        import pstats
+
+        self.stdout.write(f"Profiling {n_rows:,} rows with cProfile …")
+        profiler = cProfile.Profile()
+        result = profiler.runcall(_bench_scale, n_rows, bench_options)
+        profiler.dump_stats(path)
+        self._print_scale(result)
+        pstats.Stats(path, stream=self.stdout).sort_stats("cumulative").print_stats(20)
+        self.stdout.write(self.style.SUCCESS(f"Profile written to {path}"))
+
+    @staticmethod
+    def _write_json(path: str, payload: dict) -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(payload, fh, indent=2)
@@ -0,0 +1,292 @@
+"""
+Speed-vs-detection quality harness
+──────────────────────────────────
+    python manage.py evaluate_modes
+    python manage.py evaluate_modes --synthetic-scales 30000,100000 --tolerance 0.05
+    python manage.py evaluate_modes --synthetic-scales "" --modes thread,process
+
+Runs ``run_pipeline`` in every mode in ``QUALITY_MODES`` over the
+``TestCases/*.csv`` ledgers and over synthetic ledgers with injected
+threats (``ml_engine/synthetic.py``), and reports for each run:
+
+  latency      – pipeline wall time
+  memory       – run peak RSS above the RSS before the run
+  vs exact     – recall / precision of the flagged transaction_ids against
+                 the exact run on the same ledger, and the mean absolute
+                 risk_score difference on rows both flagged (also relative
+                 to exact's mean risk_score on those rows: the drift)
+  vs injected  – (synthetic only) recall / precision against the injected
+                 threat rows, overall and per pattern
+
+Every run re-seeds numpy, random and torch (the autoencoder also seeds
+itself), so the exact run is reproducible and differences come from the
+mode itself.  Every mode runs on the first ledger before timing starts,
+so imports and worker-pool start-up are not counted.
+
+A gated mode whose recall or precision against exact falls below
+``1 - --tolerance``, whose risk_score drift exceeds its limit in
+``QUALITY_MODES`` (or ``--max-score-drift``), or whose recall of
+injected threats drops more than ``--tolerance`` below exact's, fails
+the command.
+
+Modes
+─────
+  exact     – standard profile, exact medians (the reference)
+  sketch    – quantile-sketch robust statistics
+  thread    – engines concurrently on a thread pool (``executor.py``)
+  process   – engines concurrently in worker processes
+  sharded   – ``--shards`` shards scored in worker processes
+              (``sharding.py``); LOF and the autoencoder are fitted per
+              shard, so it is reported, not gated
+  sampled   – memory-budgeted mode under pressure: LOF / autoencoder fit on
+              samples (only engages above ``MEMORY_LOF_SAMPLE_ROWS`` /
+              ``MEMORY_AE_SAMPLE_ROWS`` rows)
+  deadline  – a deadline of ``--deadline-fraction`` × the exact run's wall
+              time: sampled LOF, budgeted Louvain, autoencoder last and
+              stopped early; a degraded run, so it is reported, not gated
+  fast      – the fast profile (sampled LOF only); reported, not gated
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+import random
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# mode → (run_pipeline kwargs, largest risk_score drift vs exact; None = reported, not gated).
+# sketch / thread / process must reproduce exact's scores.  The deadline
+# mode stops the autoencoder after fewer epochs and says so in
+# ``degraded``: on the ~200-row TestCases an epoch is four mini-batches,
+# so a 25 % cut moves a couple of borderline flags, by how much depends on
+# the machine's timing.
+# A sampled LOF is a different density estimate of the same rows: on the
+# 30,000-row ledger it keeps ~0.9 of exact's flags with a drift of ~0.28.
+QUALITY_MODES = {
+    "exact": ({"robust_stats": "exact"}, 0.0),
+    "sketch": ({"robust_stats": "sketch"}, 0.01),
+    "thread": ({"executor": "thread"}, 0.01),
+    "process": ({"executor": "process"}, 0.01),
+    "sharded": ({}, None),
+    "sampled": ({"memory_budget_mb": 1}, 0.35),
+    "deadline": ({}, None),
+    "fast": ({"profile": "fast"}, None),
+}
+
+DEFAULT_TEST_CASES = os.path.join(os.path.dirname(settings.BASE_DIR), "TestCases", "*.csv")
+DEFAULT_SYNTHETIC_SCALES = "30000"
+DEFAULT_TOLERANCE = 0.1
+DEFAULT_SHARDS = 4
+
+# Pool workers import the engines they run on first use; warm every
+# worker before timing the pool modes
+POOL_MODES = ("process", "sharded")
+POOL_WARM_UP_RUNS = 3
+DEFAULT_DEADLINE_FRACTION = 0.75
+
+
+def _seed_everything(seed: int) -> None:
+    random.seed(seed)
+    np.random.seed(seed)
+    try:
+        import torch
+        torch.manual_seed(seed)
+    except ImportError:
+        pass
+
+
+def _ratio(hits: int, total: int) -> float | None:
+    return round(hits / total, 4) if total else None
+
+
+def _agreement(flagged: dict[str, float], reference: dict[str, float]) -> dict:
+    common = flagged.keys() & reference.keys()
+    mae = drift = None
+    if common:
+        errors = np.array([abs(flagged[tid] - reference[tid]) for tid in common])
+        scale = float(np.mean([abs(reference[tid]) for tid in common]))
+        mae = round(float(errors.mean()), 4)
+        drift = round(mae / scale, 4) if scale else 0.0
+    return {
+        "recall": _ratio(len(common), len(reference)) if reference else 1.0,
+        "precision": _ratio(len(common), len(flagged)) if flagged else 1.0,
+        "risk_score_mae": mae,
+        "risk_score_drift": drift,
+    }
+
+
+def _detection(flagged: set[str], labels: dict[str, str]) -> dict:
+    injected = set(labels)
+    by_pattern: dict[str, list[str]] = {}
+    for tid, pattern in labels.items():
+        by_pattern.setdefault(pattern, []).append(tid)
+    return {
+        "recall": _ratio(len(flagged & injected), len(injected)),
+        "precision": _ratio(len(flagged & injected), len(flagged)),
+        "by_pattern": {
+            pattern: _ratio(len(flagged.intersection(tids)), len(tids))
+            for pattern, tids in sorted(by_pattern.items())
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare detection quality, latency and memory of the approximate pipeline modes against exact."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--test-cases", default=DEFAULT_TEST_CASES, help="Glob of (unlabelled) CSV ledgers")
+        parser.add_argument("--synthetic-scales", default=DEFAULT_SYNTHETIC_SCALES,
+                            help="Comma-separated synthetic ledger sizes (empty to skip)")
+        parser.add_argument("--modes", default=",".join(QUALITY_MODES),
+                            help=f"Subset of: {', '.join(QUALITY_MODES)} (exact always runs)")
+        parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+        parser.add_argument("--max-score-drift", type=float, default=None,
+                            help="Largest allowed risk_score MAE relative to exact's mean risk_score, "
+                                 "for every gated mode (default: per mode, see QUALITY_MODES)")
+        parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS, help="Shards for the sharded mode")
+        parser.add_argument("--deadline-fraction", type=float, default=DEFAULT_DEADLINE_FRACTION)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", dest="json_out", default=None, help="Write the full results here")
+
+    def handle(self, *args, **options):
+        modes = ["exact"] + [m.strip() for m in options["modes"].split(",") if m.strip() and m.strip() != "exact"]
+        unknown = [m for m in modes if m not in QUALITY_MODES]
+        if unknown:
+            raise CommandError(f"Unknown mode(s): {', '.join(unknown)}")
+
+        datasets = self._datasets(options)
+        if not datasets:
+            raise CommandError("Nothing to evaluate: no test cases matched and no synthetic scales given")
+
+        # warm-up runs: lazy engine imports (torch …) and pool start-up must not count
+        warm_exact = self._run("exact", datasets[0][1], options, None)
+        for mode in modes[1:]:
+            for _ in range(POOL_WARM_UP_RUNS if mode in POOL_MODES else 1):
+                self._run(mode, datasets[0][1], options, warm_exact)
+
+        results, failures = [], []
+        for name, records, labels in datasets:
+            self.stdout.write(f"── {name} ({len(records):,} rows) ──")
+            exact = None
+            for mode in modes:
+                run = self._run(mode, records, options, exact)
+                if exact is None:
+                    exact = run
+                run["vs_exact"] = _agreement(run["flags"], exact["flags"])
+                if labels is not None:
+                    run["vs_injected"] = _detection(set(run["flags"]), labels)
+                self._print_run(mode, run)
+                failures.extend(
+                    f"{name} / {mode}: {problem}"
+                    for problem in self._check(mode, run, exact, options["tolerance"],
+                                               options["max_score_drift"])
+                )
+                results.append({"dataset": name, "mode": mode, **{k: v for k, v in run.items() if k != "flags"}})
+
+        if options["json_out"]:
+            with open(options["json_out"], "w", encoding="utf-8") as fh:
+                json.dump(results, fh, indent=2)
+
+        if failures:
+            for line in failures:
+                self.stderr.write(line)
+            raise CommandError(f"{len(failures)} mode(s) drifted beyond the tolerance of {options['tolerance']}")
+        self.stdout.write(self.style.SUCCESS("All gated modes are within tolerance of exact"))
+
+    # ── helpers ──
+
+    def _datasets(self, options) -> list[tuple[str, list[dict], dict[str, str] | None]]:
+        from api.csv_parser import parse_transaction_csv
+        from api.ml_engine.synthetic import generate_ledger, to_records
+
+        datasets = []
+        for path in sorted(glob.glob(options["test_cases"])):
+            with open(path, encoding="utf-8-sig") as fh:
+                records, _summary = parse_transaction_csv(fh.read())
+            datasets.append((os.path.basename(path), records, None))
+
+        for scale in [s.strip() for s in options["synthetic_scales"].split(",") if s.strip()]:
+            try:
+                n_rows = int(scale)
+            except ValueError:
+                raise CommandError(f"--synthetic-scales must be integers, got '{scale}'")
+            ledger = generate_ledger(n_rows, seed=options["seed"])
+            injected = ledger[ledger["injected_pattern"] != ""]
+            labels = dict(zip(injected["transaction_id"].astype(str), injected["injected_pattern"]))
+            datasets.append((f"synthetic-{n_rows}", to_records(ledger), labels))
+        return datasets
+
+    @staticmethod
+    def _run(mode: str, records: list[dict], options, exact: dict | None) -> dict:
+        from api.ml_engine.deadline import deadline_after
+        from api.ml_engine.ensemble import run_pipeline
+        from api.ml_engine.profiling import PipelineProfiler, current_rss_mb
+
+        kwargs = dict(QUALITY_MODES[mode][0])
+        _seed_everything(options["seed"])
+        profiler = PipelineProfiler()
+        degraded: dict[str, str] = {}
+        rss_before = current_rss_mb() or 0.0
+
+        started = time.perf_counter()
+        if mode == "deadline":
+            kwargs["deadline"] = deadline_after(exact["wall_ms"] / 1000 * options["deadline_fraction"])
+        elif mode == "sharded":
+            kwargs["shards"] = options["shards"]
+        flagged = run_pipeline(
+            records, "quality", profiler=profiler, cache=None, degraded=degraded, **kwargs,
+        )
+        wall_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        return {
+            "wall_ms": wall_ms,
+            "peak_rss_delta_mb": round(max((profiler.run_peak_rss_mb or 0.0) - rss_before, 0.0), 2),
+            "flagged": len(flagged),
+            "degraded": degraded,
+            "flags": {str(doc["transaction_id"]): doc["risk_score"] for doc in flagged},
+        }
+
+    @staticmethod
+    def _check(mode: str, run: dict, exact: dict, tolerance: float,
+               max_score_drift: float | None) -> list[str]:
+        if mode == "exact" or QUALITY_MODES[mode][1] is None:
+            return []
+        if max_score_drift is None:
+            max_score_drift = QUALITY_MODES[mode][1]
+        problems = []
+        for metric in ("recall", "precision"):
+            value = run["vs_exact"][metric]
+            if value is not None and value < 1 - tolerance:
+                problems.append(f"{metric} vs exact {value:.3f} < {1 - tolerance:.3f}")
+        drift = run["vs_exact"]["risk_score_drift"]
+        if drift is not None and drift > max_score_drift:
+            problems.append(f"risk_score drift {drift:.3f} > {max_score_drift:.3f} "
+                            f"(MAE {run['vs_exact']['risk_score_mae']})")
+        if "vs_injected" in run:
+            base, value = exact["vs_injected"]["recall"], run["vs_injected"]["recall"]
+            if base is not None and value is not None and value < base - tolerance:
+                problems.append(f"injected-threat recall {value:.3f} vs exact {base:.3f}")
+        return problems
+
+    def _print_run(self, mode: str, run: dict) -> None:
+        vs_exact = run["vs_exact"]
+        line = (
+            f"  {mode:<9} {run['wall_ms']:>10,.0f} ms {run['peak_rss_delta_mb']:>8,.1f} MB "
+            f"{run['flagged']:>6} flagged | vs exact R {vs_exact['recall']} P {vs_exact['precision']} "
+            f"MAE {vs_exact['risk_score_mae']} drift {vs_exact['risk_score_drift']}"
+        )
+        if "vs_injected" in run:
+            injected = run["vs_injected"]
+            line += f" | injected R {injected['recall']} P {injected['precision']}"
+        if run["degraded"]:
+            line += f" | degraded: {', '.join(sorted(run['degraded']))}"
+        self.stdout.write(line)
+        if "vs_injected" in run:
+            per_pattern = ", ".join(f"{p} {r}" for p, r in run["vs_injected"]["by_pattern"].items())
+            self.stdout.write(f"            {per_pattern}")
@@ -0,0 +1,337 @@
+"""
+Offline batch scoring
+─────────────────────
+    python manage.py score_batch <dir|glob|file> [...] --output jsonl --out results/
+
+Parses and scores many CSV files outside the GraphQL upload path, in a pool
+of worker processes.  Each worker caps its native thread pools and imports
+the engines of the chosen profile once, then scores files one after another.
+
+Outputs
+───────
+  mongo    – one completed audit report per file plus its flagged
+             transactions and analytics, written with bulk operations every
+             ``--bulk-size`` flagged rows.  Report ids are derived from
+             (user, file path), so re-writing a file replaces it.
+  jsonl    – flagged rows in ``<out>/part-NNNNN.jsonl``
+  parquet  – flagged rows in ``<out>/part-NNNNN.parquet`` (needs pyarrow)
+
+Resuming
+────────
+Files are recorded in the ``--checkpoint`` JSON once their results have
+been flushed; a re-run skips them.  Failed files are recorded with the
+error and retried on the next run.
+"""
+
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+OUTPUT_FORMATS = ("mongo", "jsonl", "parquet")
+DEFAULT_BULK_SIZE = 5000
+
+
+# ── worker side (module-level so spawned workers can import it) ──
+
+def _init_worker(n_threads: int, profile: str) -> None:
+    """Runs once per worker process, before any engine is imported."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(n_threads)
+
+    import importlib
+    from api.ml_engine.ensemble import PIPELINE_PROFILES
+    from api.ml_engine.executor import ENGINE_SPECS
+
+    for name in PIPELINE_PROFILES[profile]:
+        importlib.import_module(f"api.ml_engine.{ENGINE_SPECS[name][0]}")
+    try:
+        import torch
+        torch.set_num_threads(n_threads)
+    except ImportError:
+        pass
+
+
+def _score_file(path: str, report_id: str, trusted: list[str], profile: str,
+                amount_threshold: float | None) -> dict:
+    from api.csv_parser import parse_transaction_csv
+    from api.ml_engine.ensemble import run_pipeline
+    from api.report_analytics import build_report_analytics, flag_details
+
+    started = time.perf_counter()
+    try:
+        with open(path, encoding="utf-8-sig") as fh:
+            transactions, summary = parse_transaction_csv(fh.read())
+        flagged = run_pipeline(
+            transactions,
+            report_id,
+            trusted_vendors=trusted,
+            amount_threshold=amount_threshold,
+            profile=profile,
+        )
+        details = flag_details(transactions, [doc["transaction_id"] for doc in flagged])
+        analytics = build_report_analytics(flagged, details, summary["total_transactions"])
+    except Exception as e:
+        return {"path": path, "report_id": report_id, "error": str(e)}
+    return {
+        "path": path,
+        "report_id": report_id,
+        "rows": summary["total_transactions"],
+        "flagged": flagged,
+        "analytics": analytics,
+        "wall_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+# ── sinks ────────────────────────────────────────────────
+
+class _PartSink:
+    """Flagged rows into numbered part files (written to a temp name, then renamed)."""
+
+    def __init__(self, directory: str, fmt: str):
+        self.directory = directory
+        self.fmt = fmt
+        os.makedirs(directory, exist_ok=True)
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise CommandError("Parquet output needs pyarrow (pip install pyarrow)")
+
+    def _next_path(self) -> str:
+        existing = glob.glob(os.path.join(self.directory, f"part-*.{self.fmt}"))
+        return os.path.join(self.directory, f"part-{len(existing):05d}.{self.fmt}")
+
+    def write(self, results: list[dict]) -> None:
+        rows = [
+            {"file": os.path.basename(result["path"]), **flagged}
+            for result in results
+            for flagged in result["flagged"]
+        ]
+        if not rows:
+            return
+        target = self._next_path()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        if self.fmt == "jsonl":
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                for row in rows:
+                    fh.write(json.dumps(row, default=str) + "\n")
+        else:
+            import pandas as pd
+            pd.DataFrame(rows).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, target)
+
+
+class _MongoSink:
+    """Audit reports + flagged transactions, replaced idempotently per file."""
+
+    def __init__(self, user_id: str, profile: str, amount_threshold: float | None):
+        from api.db import (
+            audit_reports_col, flagged_transactions_col, rebuild_dashboard_summary, report_analytics_col,
+        )
+        self.reports = audit_reports_col
+        self.analytics = report_analytics_col
+        self.rebuild_summary = rebuild_dashboard_summary
+        self.flags = flagged_transactions_col
+        self.user_id = user_id
+        self.profile = profile
+        self.amount_threshold = amount_threshold
+
+    def write(self, results: list[dict]) -> None:
+        from bson import ObjectId
+        from pymongo import ReplaceOne
+
+        now = datetime.utcnow()
+        report_ops, analytics_ops, flagged_docs = [], [], []
+        for result in results:
+            report_ops.append(ReplaceOne(
+                {"_id": ObjectId(result["report_id"])},
+                {
+                    "file_name": os.path.basename(result["path"]),
+                    "uploaded_at": now,
+                    "total_transactions": result["rows"],
+                    "flagged_count": len(result["flagged"]),
+                    "status": "completed",
+                    "user_id": self.user_id,
+                    "threshold_limit": self.amount_threshold,
+                    "profile": self.profile,
+                    "source": "score_batch",
+                },
+                upsert=True,
+            ))
+            analytics_ops.append(ReplaceOne(
+                {"_id": result["report_id"]},
+                {**result["analytics"], "user_id": self.user_id, "report_id": result["report_id"], "updated_at": now},
+                upsert=True,
+            ))
+            flagged_docs.extend({**doc, "user_id": self.user_id} for doc in result["flagged"])
+
+        report_ids = [result["report_id"] for result in results]
+        self.flags.delete_many({"report_id": {"$in": report_ids}, "user_id": self.user_id})
+        if flagged_docs:
+            self.flags.insert_many(flagged_docs, ordered=False)
+        self.analytics.bulk_write(analytics_ops, ordered=False)
+        self.reports.bulk_write(report_ops, ordered=False)
+        # the replaced reports bypass the incremental summary updates
+        self.rebuild_summary(self.user_id)
+
+
+# ── command ──────────────────────────────────────────────
+
+class Command(BaseCommand):
+    help = "Score many transaction CSV files offline with a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="CSV files, directories or glob patterns")
+        parser.add_argument("--output", choices=OUTPUT_FORMATS, default="jsonl")
+        parser.add_argument("--out", default="score_batch_output",
+                            help="Output directory for jsonl/parquet parts")
+        parser.add_argument("--user-id", help="Owner of the reports (required for --output mongo)")
+        parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+        parser.add_argument("--profile", default=None, help="Engine profile: fast | standard | deep")
+        parser.add_argument("--trusted", default="", help="Comma-separated trusted vendors")
+        parser.add_argument("--threshold", type=float, default=None, help="Amount threshold note")
+        parser.add_argument("--bulk-size", type=int, default=DEFAULT_BULK_SIZE,
+                            help="Flagged rows buffered before each bulk write")
+        parser.add_argument("--checkpoint", default="score_batch_checkpoint.json")
+
+    def handle(self, *args, **options):
+        from api.ml_engine.ensemble import DEFAULT_PROFILE, PIPELINE_PROFILES
+
+        profile = (options["profile"] or DEFAULT_PROFILE).lower()
+        if profile not in PIPELINE_PROFILES:
+            raise CommandError(f"Unknown profile '{profile}'. Expected one of: {', '.join(PIPELINE_PROFILES)}")
+        if options["output"] == "mongo" and not options["user_id"]:
+            raise CommandError("--user-id is required for --output mongo")
+
+        files = self._expand(options["paths"])
+        checkpoint_path = options["checkpoint"]
+        checkpoint = self._load_checkpoint(checkpoint_path)
+        todo = [path for path in files if path not in checkpoint["done"]]
+        self.stdout.write(f"{len(files)} files, {len(files) - len(todo)} already done, {len(todo)} to score")
+        if not todo:
+            return
+
+        if options["output"] == "mongo":
+            sink = _MongoSink(options["user_id"], profile, options["threshold"])
+        else:
+            sink = _PartSink(options["out"], options["output"])
+
+        trusted = [v.strip() for v in options["trusted"].split(",") if v.strip()]
+        workers = max(1, min(options["workers"], len(todo)))
+        n_threads = max(1, (os.cpu_count() or 1) // workers)
+        user_key = options["user_id"] or ""
+
+        started = time.perf_counter()
+        rows_done = flagged_done = failed = 0
+        buffer: list[dict] = []
+        buffered_flags = 0
+
+        def flush():
+            nonlocal buffer, buffered_flags
+            if not buffer:
+                return
+            sink.write(buffer)
+            for result in buffer:
+                checkpoint["done"][result["path"]] = {
+                    "report_id": result["report_id"],
+                    "rows": result["rows"],
+                    "flagged": len(result["flagged"]),
+                }
+                checkpoint["failed"].pop(result["path"], None)
+            self._save_checkpoint(checkpoint_path, checkpoint)
+            buffer, buffered_flags = [], 0
+
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(n_threads, profile),
+        )
+        try:
+            futures = [
+                pool.submit(_score_file, path, self._report_id(user_key, path), trusted,
+                            profile, options["threshold"])
+                for path in todo
+            ]
+            for n, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                if "error" in result:
+                    failed += 1
+                    checkpoint["failed"][result["path"]] = result["error"]
+                    self.stderr.write(f"[{n}/{len(todo)}] {result['path']}: {result['error']}")
+                    continue
+
+                buffer.append(result)
+                buffered_flags += len(result["flagged"])
+                rows_done += result["rows"]
+                flagged_done += len(result["flagged"])
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"[{n}/{len(todo)}] {result['path']}: {result['rows']} rows, "
+                    f"{len(result['flagged'])} flagged, {result['wall_ms'] / 1000:.2f}s "
+                    f"({rows_done / elapsed:,.0f} rows/s overall)"
+                )
+                if buffered_flags >= options["bulk_size"]:
+                    flush()
+            flush()
+        finally:
+            self._save_checkpoint(checkpoint_path, checkpoint)
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {len(todo) - failed} files ({failed} failed), {rows_done} rows, "
+            f"{flagged_done} flagged in {elapsed:.1f}s: "
+            f"{rows_done / elapsed:,.0f} rows/s, {(len(todo) - failed) / elapsed:.2f} files/s "
+            f"with {workers} workers"
+        ))
+
+    # ── helpers ──
+
+    @staticmethod
+    def _expand(patterns: list[str]) -> list[str]:
+        files: list[str] = []
+        for pattern in patterns:
+            if os.path.isdir(pattern):
+                matches = glob.glob(os.path.join(pattern, "**", "*.csv"), recursive=True)
+            else:
+                matches = glob.glob(pattern, recursive=True)
+            if not matches:
+                raise CommandError(f"No files match '{pattern}'")
+            files.extend(os.path.abspath(match) for match in matches)
+        return sorted(set(files))
+
+    @staticmethod
+    def _report_id(user_id: str, path: str) -> str:
+        """Stable ObjectId-shaped id, so re-scoring a file overwrites its report."""
+        return hashlib.sha1(f"{user_id}:{path}".encode()).hexdigest()[:24]
+
+    @staticmethod
+    def _load_checkpoint(path: str) -> dict:
+        if not os.path.exists(path):
+            return {"done": {}, "failed": {}}
+        with open(path, encoding="utf-8") as fh:
+            checkpoint = json.load(fh)
+        checkpoint.setdefault("done", {})
+        checkpoint.setdefault("failed", {})
+        return checkpoint
+
+    @staticmethod
+    def _save_checkpoint(path: str, checkpoint: dict) -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(checkpoint, fh, indent=2)
+        os.replace(tmp_path, path)
@@ -0,0 +1,190 @@
+"""
+Frozen Baseline (micro-batch scoring)
+─────────────────────────────────────
+Scores a handful of new transactions in milliseconds against the models
+fitted on a user's most recent report, without re-training anything.
+
+What is frozen
+──────────────
+  features   – report size, max amount, [0, 1] scaling bounds and each
+               merchant's row count / amount sum / last 7 days of activity
+               (``feature_window_state``)
+  lof        – a sample of up to ``LOF_REFERENCE_ROWS`` feature rows; new
+               rows are scored with LOF in novelty mode against it
+  ae         – the trained autoencoder weights (numpy forward pass, so
+               scoring never imports torch)
+  graph      – degree, PageRank, Louvain partition and merchant edge stats
+  combine    – per-engine score maxima, the trusted vendors and the
+               median / MAD of the total risk index
+
+New rows never move the baseline: a batch is scored as if it had been
+appended to the report, and the robust z-score uses the report's median
+and MAD.  The trusted vendors are the ones in effect when the baseline was
+fitted; re-analysing the report with a full re-run refreshes them.
+
+The state is stored as zlib-compressed JSON (``to_bytes``) because merchant
+and account names are arbitrary strings and cannot be Mongo field names.
+Its graph statistics cover every account and merchant of the report, so
+``db.save_model_baseline`` splits it over as many documents as it needs.
+"""
+
+from __future__ import annotations
+
+import json
+import zlib
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from .ensemble import (
+    RAW_INPUT_COLS,
+    ROBUST_Z_SCORE_THRESHOLD,
+    _narrate,
+    risk_index,
+    robust_statistics,
+    salami_mask,
+)
+from .feature_engineering import (
+    FEATURE_COLS,
+    build_features_frozen,
+    build_raw_features,
+    feature_window_state,
+)
+from .models_graph import score_graph_frozen
+from .models_lof import fit_lof_reference, score_lof_frozen
+
+BASELINE_VERSION = 1
+LOF_REFERENCE_ROWS = 2000
+SCORE_COLS = ["lof_score", "ae_score", "graph_score"]
+
+
+def reconstruction_scores(state: dict[str, list], X: np.ndarray) -> np.ndarray:
+    """
+    Same forward pass and ×10 MSE scaling as ``run_autoencoder``, in numpy,
+    from the weights stored by ``models_autoencoder.model_state``.
+    """
+    def dense(x, prefix):
+        return x @ np.asarray(state[f"{prefix}.weight"]).T + np.asarray(state[f"{prefix}.bias"])
+
+    X = np.asarray(X, dtype=np.float64)
+    h = np.maximum(dense(X, "encoder.0"), 0.0)
+    z = np.maximum(dense(h, "encoder.2"), 0.0)
+    h = np.maximum(dense(z, "decoder.0"), 0.0)
+    reconstructed = 1.0 / (1.0 + np.exp(-dense(h, "decoder.2")))
+    return ((reconstructed - X) ** 2).mean(axis=1) * 10.0
+
+
+def fit_baseline(
+    scored: pd.DataFrame,
+    engine_state: dict[str, Any],
+    trusted_vendors: list[str] | None = None,
+    robust_stats: str = "exact",
+) -> dict[str, Any] | None:
+    """
+    Freeze the output of ``score_transactions`` (and the ``engine_state``
+    it filled) into a JSON-friendly baseline.  Returns None when an engine
+    was not trained, e.g. for reports of fewer than three rows.
+    """
+    if engine_state.get("ae") is None or engine_state.get("graph") is None or len(scored) < 3:
+        return None
+
+    raw = build_raw_features(scored[[col for col in RAW_INPUT_COLS if col in scored.columns]])
+
+    reference = scored[FEATURE_COLS]
+    if len(reference) > LOF_REFERENCE_ROWS:
+        reference = reference.sample(LOF_REFERENCE_ROWS, random_state=42)
+
+    trusted = sorted({v.strip().lower() for v in trusted_vendors or []})
+    df = risk_index(scored, trusted)
+    is_salami = salami_mask(df)
+    risk_median, mad = robust_statistics(df.loc[~is_salami, "total_risk_index"], robust_stats)
+
+    return {
+        "version": BASELINE_VERSION,
+        "fitted_at": datetime.utcnow().isoformat(),
+        "rows": int(len(scored)),
+        "features": feature_window_state(raw),
+        "lof_reference": reference.to_numpy(dtype=np.float64).tolist(),
+        "ae": engine_state["ae"],
+        "graph": engine_state["graph"],
+        "score_max": {col: float(scored[col].max()) for col in SCORE_COLS},
+        "trusted_vendors": trusted,
+        "risk_median": risk_median,
+        "risk_mad": mad,
+    }
+
+
+def to_bytes(state: dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(state).encode())
+
+
+def from_bytes(payload: bytes) -> dict[str, Any]:
+    return json.loads(zlib.decompress(payload))
+
+
+class FrozenBaseline:
+    """A fitted baseline, ready to score small batches (thread-safe, read-only)."""
+
+    def __init__(self, state: dict[str, Any]):
+        if state.get("version") != BASELINE_VERSION:
+            raise ValueError("Baseline was fitted by an incompatible version; re-analyse the report")
+        self.state = state
+        self.lof = fit_lof_reference(np.asarray(state["lof_reference"]))
+
+    def score(
+        self,
+        records: list[dict[str, Any]],
+        report_id: str = "",
+        amount_threshold: float | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        One result per input row (in date order): transaction_id, amount,
+        risk_score, robust_z_score, flagged and – for flagged rows – the
+        narrator's explanation.
+        """
+        if not records:
+            return []
+        state = self.state
+
+        raw = pd.DataFrame(records)
+        raw = raw[[col for col in RAW_INPUT_COLS if col in raw.columns]]
+        df = build_features_frozen(raw, state["features"])
+
+        X = df[FEATURE_COLS].to_numpy(dtype=np.float64)
+        df["lof_score"] = score_lof_frozen(self.lof, X)
+        df["ae_score"] = reconstruction_scores(state["ae"], X)
+        df["graph_score"] = score_graph_frozen(state["graph"], df)
+
+        df = risk_index(df, state["trusted_vendors"], score_max=state["score_max"])
+        df["robust_z_score"] = 0.6745 * (df["total_risk_index"] - state["risk_median"]) / state["risk_mad"]
+
+        # Salami slicing over the baseline's vendor totals plus this batch
+        merchants = state["features"]["merchants"]
+        names = df["merchant"].astype(str)
+        batch_counts = names.map(names.value_counts())
+        batch_sums = df.groupby(names)["amount"].transform("sum")
+        counts = names.map(lambda m: merchants.get(m, {}).get("count", 0)) + batch_counts
+        sums = names.map(lambda m: merchants.get(m, {}).get("amount_sum", 0.0)) + batch_sums
+        is_salami = (counts > 50) & (sums / counts < 5.0)
+
+        df["flagged"] = (df["robust_z_score"] > ROBUST_Z_SCORE_THRESHOLD) | is_salami
+
+        anomalies = df[df["flagged"]]
+        df["explanation"] = ""
+        if len(anomalies):
+            narrated = _narrate(anomalies, report_id, amount_threshold)
+            df.loc[anomalies.index, "explanation"] = [doc["explanation"] for doc in narrated]
+
+        return [
+            {
+                "transaction_id": str(row["transaction_id"]),
+                "amount": float(row["amount"]),
+                "risk_score": round(float(row["total_risk_index"]), 4),
+                "robust_z_score": round(float(row["robust_z_score"]), 4),
+                "flagged": bool(row["flagged"]),
+                "explanation": row["explanation"],
+            }
+            for row in df.to_dict("records")
+        ]
@@ -0,0 +1,75 @@
+"""
+Pipeline Deadlines
+──────────────────
+Keeps an analysis inside the caller's latency budget.  The Flask proxy
+gives GraphQL calls 120 s, so by default the ML pipeline must finish
+within ``DEFAULT_DEADLINE_SECONDS`` of the request starting.
+
+A deadline is an absolute ``time.time()`` timestamp (or None for "no
+limit"), so it can be passed to worker processes unchanged.
+
+How stages react
+────────────────
+  lof    – fits on a sample when the full fit would not fit in its budget
+  ae     – stops early at its normal learning rate: after the last
+           epoch that fits, or the last batch inside its budget; run last
+           (``ANYTIME_ENGINES``), it also gets the time the other engines
+           did not use
+  graph  – stops Louvain after the last level inside its budget; skips
+           community detection (and betweenness) once the budget is gone
+  any    – an engine whose budget is already spent is not started; its
+           score column is 0
+
+Feature engineering, graph construction / PageRank and the combine step
+cannot be interrupted, so the default leaves headroom below the proxy's
+timeout for them and for the Mongo writes.
+
+Every shortened or skipped signal is reported as *degraded* (signal →
+reason) so the response can tell the auditor which signals to trust less.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+
+
+DEFAULT_DEADLINE_SECONDS = float(os.getenv("AUDITHAWK_PIPELINE_DEADLINE_SECONDS", "100"))
+
+# Share of the remaining time each engine gets when engines run one after
+# another.  Concurrent engines all get the full remaining time.
+ENGINE_BUDGET_SHARES = {"lof": 0.2, "ae": 0.4, "graph": 0.4}
+
+# Engines that can stop after any step.  Sequential runs start them last.
+ANYTIME_ENGINES = ("ae",)
+
+
+def deadline_after(seconds: float | None) -> float | None:
+    """Absolute deadline ``seconds`` from now (None / ≤ 0 means no limit)."""
+    if not seconds or seconds <= 0:
+        return None
+    return time.time() + seconds
+
+
+def remaining(deadline: float | None) -> float:
+    """Seconds left before ``deadline`` (infinite without one)."""
+    if deadline is None:
+        return float("inf")
+    return deadline - time.time()
+
+
+def expired(deadline: float | None) -> bool:
+    return deadline is not None and time.time() >= deadline
+
+
+def stage_deadline(deadline: float | None, share: float, remaining_share: float) -> float | None:
+    """
+    Deadline for one of several stages that still have to run in sequence:
+    ``share`` of the time left, out of ``remaining_share`` for all of them.
+    """
+    if deadline is None:
+        return None
+    if remaining_share <= 0:
+        return deadline
+    left = max(deadline - time.time(), 0.0)
+    return time.time() + left * min(share / remaining_share, 1.0)
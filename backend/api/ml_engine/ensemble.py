@@ -3,32 +3,416 @@ Ensemble Orchestrator  (Phase 1 Final)
 ───────────────────────────────────────────────────────
 """
 from __future__ import annotations
+import os
 import pandas as pd
 import numpy as np
 from typing import Any
 
 from .feature_engineering import build_features
-from .models_lof import run_lof
-from .models_autoencoder import run_autoencoder
-from .models_graph import run_graph_analysis
-from .narrator import generate_explanations
+from .executor import ENGINE_SPECS, run_engines
+from .memory import (
+    DEFAULT_MEMORY_BUDGET_MB,
+    bounded_working_memory,
+    downcast_floats,
+    downcast_raw,
+    pressure_options,
+    records_frame,
+    under_pressure,
+)
+from .narrator import fired_signals, generate_explanations
+from .profiling import PipelineProfiler, current_rss_mb
+from .sketches import QuantileSketch
+from .stage_cache import StageCache, frame_fingerprint, get_default_cache
 
 # 🚨 Reverted back to the hardcoded enterprise threshold
 ROBUST_Z_SCORE_THRESHOLD = 3.0
 MAD_FALLBACK_EPSILON = 1e-6
 
+# "exact" (pandas medians) | "sketch" (rank-error QuantileSketch, see sketches.py)
+DEFAULT_ROBUST_STATS = os.getenv("AUDITHAWK_ROBUST_STATS", "exact")
+
+# "sequential" | "thread" | "process" – see executor.py
+DEFAULT_EXECUTOR = os.getenv("AUDITHAWK_ML_EXECUTOR", "sequential")
+
+# >1 scores reports in that many shards across worker processes – see sharding.py
+DEFAULT_SHARDS = int(os.getenv("AUDITHAWK_ML_SHARDS", "1"))
+
+# Engine profiles: engine name → keyword arguments for that engine.
+# Engines missing from a profile are not run (and their modules – torch for
+# the autoencoder – never imported); their score column is 0.
+#   fast     – rules (velocity/rarity) + LOF fitted on a sample
+#   standard – every engine with its defaults
+#   deep     – longer autoencoder training + extended graph analysis
+PIPELINE_PROFILES: dict[str, dict[str, dict[str, Any]]] = {
+    "fast": {"lof": {"sample_rows": 5000}},
+    "standard": {"lof": {}, "ae": {}, "graph": {}},
+    "deep": {"lof": {}, "ae": {"epochs": 100}, "graph": {"extended": True}},
+}
+DEFAULT_PROFILE = os.getenv("AUDITHAWK_ML_PROFILE", "standard")
+
+# Everything combine_scores() needs.  Persisting these per report lets HITL
+# trusted-vendor changes re-score without re-training any engine.
+SCORE_CACHE_COLS = [
+    "transaction_id", "amount", "merchant",
+    "velocity", "pattern", "rarity", "magnitude",
+    "lof_score", "ae_score", "graph_score",
+]
+
+# Raw columns the pipeline actually reads; everything else (Mongo _id,
+# uploaded_at, explanation, ...) is dropped before feature engineering.
+RAW_INPUT_COLS = ["transaction_id", "date", "amount", "merchant", "account_id"]
+
+# Named stages and the stages whose output each one consumes.
+PIPELINE_DAG: dict[str, list[str]] = {
+    "features": [],
+    "lof": ["features"],
+    "ae": ["features"],
+    "graph": ["features"],
+    "combine": ["features", "lof", "ae", "graph"],
+    "narrate": ["combine"],
+}
+
+_USE_DEFAULT_CACHE = object()
+
 def run_pipeline(
     raw_records: list[dict[str, Any]],
     report_id: str,
     trusted_vendors: list[str] | None = None,
     amount_threshold: float | None = None,
+    executor: str | None = None,
+    thread_limits: dict[str, int] | None = None,
+    profiler: PipelineProfiler | None = None,
+    cache: StageCache | None | object = _USE_DEFAULT_CACHE,
+    shards: int | None = None,
+    robust_stats: str | None = None,
+    profile: str | None = None,
+    deadline: float | None = None,
+    degraded: dict[str, str] | None = None,
+    memory_budget_mb: float | None = None,
 ) -> list[dict[str, Any]]:
-    
+    """
+    Score ``raw_records`` and return one result dict per flagged row.
+
+    The work is split into the named stages of ``PIPELINE_DAG``.
+
+    ``executor`` selects how the LOF, autoencoder and graph engines are
+    scheduled ("sequential", "thread" or "process"); ``thread_limits``
+    overrides the per-engine CPU-thread budget used by the concurrent
+    modes.  When a ``profiler`` is given, every stage is recorded on it.
+    ``cache`` is the content-addressed stage cache; it defaults to the one
+    configured by ``AUDITHAWK_STAGE_CACHE_DIR`` (pass None to disable).
+    ``shards`` > 1 switches to sharded execution (see ``sharding.py``).
+    ``robust_stats`` picks exact medians or the quantile sketch for the
+    robust z-score.  ``profile`` is one of
+    ``PIPELINE_PROFILES`` (defaults to ``AUDITHAWK_ML_PROFILE``).
+    ``deadline`` is an absolute ``time.time()`` the engines must finish by
+    (see ``deadline.py``); ``degraded`` receives score column → reason for
+    every signal that was shortened or skipped to meet it.
+    ``memory_budget_mb`` enables the memory-budgeted mode (``memory.py``).
+    """
     if not raw_records:
         return []
 
-    df = pd.DataFrame(raw_records)
-    df = build_features(df)
+    profiler = profiler or PipelineProfiler()
+    scored = score_transactions(
+        raw_records,
+        executor=executor,
+        thread_limits=thread_limits,
+        profiler=profiler,
+        cache=cache,
+        shards=shards,
+        profile=profile,
+        deadline=deadline,
+        degraded=degraded,
+        memory_budget_mb=memory_budget_mb,
+    )
+    return combine_scores(
+        scored,
+        report_id,
+        trusted_vendors=trusted_vendors,
+        amount_threshold=amount_threshold,
+        profiler=profiler,
+        cache=cache,
+        robust_stats=robust_stats,
+    )
+
+
+# ── stage cache plumbing ─────────────────────────────────
+
+def _resolve_cache(cache: StageCache | None | object) -> StageCache | None:
+    return get_default_cache() if cache is _USE_DEFAULT_CACHE else cache  # type: ignore[return-value]
+
+
+def _run_stage(
+    cache: StageCache | None,
+    profiler: PipelineProfiler,
+    name: str,
+    fingerprint: str | None,
+    params: dict[str, Any],
+    rows_in: int,
+    compute,
+):
+    """Run one DAG stage through the cache (if any) and the profiler."""
+    with profiler.stage(name, rows_in=rows_in) as record:
+        if cache is None:
+            value = compute()
+        else:
+            key = cache.key(name, fingerprint, params)
+            hit, value = cache.get(name, key)
+            record["cache"] = "hit" if hit else "miss"
+            if not hit:
+                value = compute()
+                cache.put(name, key, value)
+        record["rows_out"] = len(value)
+    return value
+
+
+def invalidate_stage_cache(stage: str | None = None, cache: StageCache | None = None) -> int:
+    """
+    Drop cached outputs of ``stage`` and every stage downstream of it in
+    ``PIPELINE_DAG`` (all stages when ``stage`` is None).
+    """
+    cache = cache or get_default_cache()
+    if cache is None:
+        return 0
+    if stage is None:
+        return cache.invalidate()
+
+    affected = {stage}
+    changed = True
+    while changed:
+        changed = False
+        for name, deps in PIPELINE_DAG.items():
+            if name not in affected and affected.intersection(deps):
+                affected.add(name)
+                changed = True
+    return cache.invalidate(sorted(affected))
+
+
+# ── stages ───────────────────────────────────────────────
+
+def score_transactions(
+    raw_records: list[dict[str, Any]],
+    executor: str | None = None,
+    thread_limits: dict[str, int] | None = None,
+    profiler: PipelineProfiler | None = None,
+    cache: StageCache | None | object = _USE_DEFAULT_CACHE,
+    shards: int | None = None,
+    engine_state: dict[str, Any] | None = None,
+    profile: str | None = None,
+    deadline: float | None = None,
+    degraded: dict[str, str] | None = None,
+    memory_budget_mb: float | None = None,
+) -> pd.DataFrame:
+    """
+    The expensive half of the pipeline (``features`` → ``lof``/``ae``/``graph``).
+    Returns the feature frame with the three ``*_score`` columns attached.
+    The result does not depend on trusted vendors or the amount threshold.
+
+    In sharded mode the stage cache is bypassed and only
+    ``SCORE_CACHE_COLS`` are returned.
+
+    ``engine_state``, when given, is filled with each engine's fitted state
+    (AE weights, graph statistics) for ``baseline.fit_baseline``.  It stays
+    empty in sharded mode, where every shard fits its own models.
+
+    ``profile`` selects the engines and their settings; the score columns
+    of engines outside the profile are 0.
+
+    With a ``deadline`` engines may stop early or be skipped; ``degraded``
+    then receives score column → reason.  Degraded scores are never
+    written to the stage cache.
+
+    ``memory_budget_mb`` (default ``AUDITHAWK_ML_MEMORY_BUDGET_MB``) turns
+    on the memory-budgeted mode of ``memory.py``: categorical identifiers,
+    float32 features/scores, and sampled LOF once RSS nears the budget.
+    """
+    profile = profile or DEFAULT_PROFILE
+    if profile not in PIPELINE_PROFILES:
+        raise ValueError(f"Unknown profile '{profile}'. Expected one of {tuple(PIPELINE_PROFILES)}")
+    engine_options = PIPELINE_PROFILES[profile]
+    profiler = profiler or PipelineProfiler()
+    cache = _resolve_cache(cache)
+
+    memory_budget_mb = memory_budget_mb if memory_budget_mb is not None else DEFAULT_MEMORY_BUDGET_MB
+
+    with profiler.track_peak_rss():
+        raw = records_frame(raw_records, RAW_INPUT_COLS)
+        if memory_budget_mb:
+            raw = downcast_raw(raw)
+
+        n_shards = shards if shards is not None else DEFAULT_SHARDS
+        if n_shards > 1:
+            from .sharding import score_sharded
+            return score_sharded(
+                raw,
+                n_shards,
+                keep_cols=SCORE_CACHE_COLS,
+                profiler=profiler,
+                engine_options=engine_options,
+                deadline=deadline,
+                degraded=degraded,
+            )
+        raw_fp = frame_fingerprint(raw) if cache is not None else None
+
+        features_params = {"downcast": True} if memory_budget_mb else {}
+        df = _run_stage(
+            cache, profiler, "features", raw_fp, features_params, len(raw),
+            lambda: build_features(raw) if not memory_budget_mb else downcast_floats(build_features(raw)),
+        )
+        del raw  # the feature frame carries every raw column it still needs
+
+        pressure = under_pressure(memory_budget_mb, len(df))
+        if pressure:
+            engine_options = pressure_options(engine_options)
+            profiler.record("memory_pressure", rss_mb=current_rss_mb(), budget_mb=memory_budget_mb)
+
+        # Engines whose output is already cached are skipped; the rest go to the executor.
+        pending: list[str] = []
+        keys: dict[str, str] = {}
+        if engine_state is None:
+            engine_state = {}
+        if degraded is None:
+            degraded = {}
+        for name, (_module, _func, score_col, input_cols) in ENGINE_SPECS.items():
+            if name not in engine_options:
+                df[score_col] = 0.0
+                continue
+            if cache is None:
+                pending.append(name)
+                continue
+            keys[name] = cache.key(name, frame_fingerprint(df, input_cols), engine_options[name])
+            hit, scores = cache.get(name, keys[name])
+            if hit:
+                engine_state[name] = scores.attrs.get("model_state")
+                df[score_col] = scores
+                profiler.record(name, rows_in=len(df), rows_out=len(scores), cache="hit")
+            else:
+                pending.append(name)
+
+        with bounded_working_memory(pressure):
+            engine_scores = run_engines(
+                df,
+                mode=executor or DEFAULT_EXECUTOR,
+                engines=pending,
+                thread_limits=thread_limits,
+                profiler=profiler,
+                options=engine_options,
+                deadline=deadline,
+            )
+        for name in pending:
+            score_col = ENGINE_SPECS[name][2]
+            scores = engine_scores.pop(score_col)
+            engine_state[name] = scores.attrs.get("model_state")
+            df[score_col] = scores
+            if scores.attrs.get("degraded"):
+                degraded[score_col] = scores.attrs["degraded"]
+            elif cache is not None:
+                cache.put(name, keys[name], scores)
+
+        if memory_budget_mb:
+            downcast_floats(df)
+    return df
+
+
+def scores_to_columns(scored: pd.DataFrame) -> dict[str, list]:
+    """Columnar, BSON-friendly copy of ``SCORE_CACHE_COLS`` (row order kept)."""
+    columns: dict[str, list] = {}
+    for col in SCORE_CACHE_COLS:
+        if col in ("transaction_id", "merchant"):
+            columns[col] = scored[col].astype(str).tolist()
+        else:
+            columns[col] = scored[col].astype(float).tolist()
+    return columns
+
+
+def scores_from_columns(columns: dict[str, list]) -> pd.DataFrame | None:
+    """Rebuild a scored frame from ``scores_to_columns`` output (None if stale)."""
+    if not columns or not set(SCORE_CACHE_COLS) <= set(columns):
+        return None
+    return pd.DataFrame({col: columns[col] for col in SCORE_CACHE_COLS})
+
+
+def combine_scores(
+    scored: pd.DataFrame,
+    report_id: str,
+    trusted_vendors: list[str] | None = None,
+    amount_threshold: float | None = None,
+    profiler: PipelineProfiler | None = None,
+    cache: StageCache | None | object = _USE_DEFAULT_CACHE,
+    robust_stats: str | None = None,
+) -> list[dict[str, Any]]:
+    """
+    The cheap half (``combine`` → ``narrate``): trusted-vendor masking, the
+    total risk index, the robust z-score and the narrator.  Only reads
+    ``SCORE_CACHE_COLS``, so it can run on a frame restored from the
+    per-report score cache.
+
+    For the output of ``score_sharded`` (``attrs["shard_rows"]``) sketch
+    mode scores each shard's rows on their own and merges the per-shard
+    sketches.
+    """
+    if scored.empty:
+        return []
+
+    profiler = profiler or PipelineProfiler()
+    cache = _resolve_cache(cache)
+    trusted = sorted({v.strip().lower() for v in trusted_vendors or []})
+    robust_stats = robust_stats or DEFAULT_ROBUST_STATS
+    shard_rows = scored.attrs.get("shard_rows") if robust_stats == "sketch" else None
+
+    with profiler.track_peak_rss():
+        scored = scored[SCORE_CACHE_COLS]
+        scored_fp = frame_fingerprint(scored) if cache is not None else None
+        combine_params = {"trusted": trusted, "robust_stats": robust_stats}
+        if shard_rows:
+            combine_params["shard_rows"] = list(shard_rows)
+            combine = lambda: _combine_shards(scored, trusted_vendors, shard_rows)
+        else:
+            combine = lambda: _combine(scored, trusted_vendors, robust_stats)
+        anomalies = _run_stage(cache, profiler, "combine", scored_fp, combine_params, len(scored), combine)
+        del scored
+
+        anomalies_fp = frame_fingerprint(anomalies) if cache is not None else None
+        return _run_stage(
+            cache, profiler, "narrate", anomalies_fp,
+            {"report_id": report_id, "amount_threshold": amount_threshold}, len(anomalies),
+            lambda: _narrate(anomalies, report_id, amount_threshold),
+        )
+
+
+def robust_statistics(scores: pd.Series | QuantileSketch, method: str = "exact") -> tuple[float, float]:
+    """
+    (median, MAD) of ``scores`` – a series, or an already built (e.g.
+    merged) sketch; the MAD never drops to zero.
+    """
+    if isinstance(scores, QuantileSketch):
+        if scores.count == 0:
+            return 0.0, MAD_FALLBACK_EPSILON
+        risk_median, mad = scores.median_and_mad()
+    elif len(scores) == 0:
+        return 0.0, MAD_FALLBACK_EPSILON
+    elif method == "sketch":
+        risk_median, mad = QuantileSketch().add(scores.to_numpy()).median_and_mad()
+    else:
+        risk_median = float(scores.median())
+        mad = float((scores - risk_median).abs().median())
+    if mad == 0:
+        mad = MAD_FALLBACK_EPSILON
+    return float(risk_median), float(mad)
+
+
+def risk_index(
+    scored: pd.DataFrame,
+    trusted_vendors: list[str] | None,
+    score_max: dict[str, float] | None = None,
+) -> pd.DataFrame:
+    """
+    Copy of ``scored`` with ``total_risk_index`` attached.  With trusted
+    vendors the engine scores are rescaled by their maximum – the frame's
+    own, or ``score_max`` when scoring against a frozen baseline.
+    """
+    df = scored.copy()
 
     df_for_scoring = df.copy()
     if trusted_vendors:
@@ -37,13 +421,9 @@ def run_pipeline(
         df_for_scoring.loc[trusted_mask, "magnitude"] = 0.0
         df_for_scoring.loc[trusted_mask, "rarity"] = 0.0
 
-    df["lof_score"] = run_lof(df)
-    df["ae_score"] = run_autoencoder(df)
-    df["graph_score"] = run_graph_analysis(df)
-
     if trusted_vendors:
         for col in ["lof_score", "ae_score", "graph_score"]:
-            col_max = df[col].max()
+            col_max = score_max[col] if score_max is not None else df[col].max()
             if col_max > 0:
                 df[col] = df[col] / col_max
 
@@ -51,49 +431,98 @@ def run_pipeline(
         df["lof_score"], df["ae_score"], df["graph_score"], 
         df_for_scoring["velocity"], df_for_scoring["rarity"] 
     ], axis=1).max(axis=1)
-    
+
     if trusted_vendors:
         trusted_set = {v.strip().lower() for v in trusted_vendors}
         trusted_mask = df["merchant"].str.strip().str.lower().isin(trusted_set)
         df.loc[trusted_mask, "total_risk_index"] = df.loc[trusted_mask, ["velocity", "pattern"]].max(axis=1)
-    
+
+    return df
+
+
+def salami_mask(df: pd.DataFrame) -> pd.Series:
+    """Rows of vendors with > 50 payments averaging under 5.00 (salami slicing)."""
     vendor_counts = df.groupby("merchant")["amount"].transform("count")
     vendor_means = df.groupby("merchant")["amount"].transform("mean")
-    salami_mask = (vendor_counts > 50) & (vendor_means < 5.0)
+    return (vendor_counts > 50) & (vendor_means < 5.0)
 
-    clean_scores = df.loc[~salami_mask, "total_risk_index"]
-    if len(clean_scores) == 0:
-        risk_median = 0.0
-        mad = MAD_FALLBACK_EPSILON
-    else:
-        risk_median = float(clean_scores.median())
-        mad = float((clean_scores - risk_median).abs().median())
-        if mad == 0:
-            mad = MAD_FALLBACK_EPSILON
+
+def _combine(
+    scored: pd.DataFrame,
+    trusted_vendors: list[str] | None,
+    robust_stats: str = "exact",
+) -> pd.DataFrame:
+    """Risk index + robust z-score; returns the flagged rows."""
+    df = risk_index(scored, trusted_vendors)
+    is_salami = salami_mask(df)
+
+    clean_scores = df.loc[~is_salami, "total_risk_index"]
+    risk_median, mad = robust_statistics(clean_scores, robust_stats)
 
     df["robust_z_score"] = 0.6745 * (df["total_risk_index"] - risk_median) / mad
-    anomalies = df[(df["robust_z_score"] > ROBUST_Z_SCORE_THRESHOLD) | salami_mask].copy()
-    
-    explanations = generate_explanations(anomalies)
-    anomalies["explanation"] = explanations
+    return df[(df["robust_z_score"] > ROBUST_Z_SCORE_THRESHOLD) | is_salami].copy()
+
+
+def _combine_shards(
+    scored: pd.DataFrame,
+    trusted_vendors: list[str] | None,
+    shard_rows: list[int],
+) -> pd.DataFrame:
+    """
+    ``_combine`` in sketch mode over consecutive shards of ``scored``: one
+    risk index and sketch per shard (every merchant sits in one shard, so
+    the salami mask is shard-local), then the merged sketch's median / MAD.
+    The engine score maxima the trusted-vendor rescaling divides by are
+    report-wide, which keeps the risk index of each row as in ``_combine``.
+    """
+    score_max = {col: float(scored[col].max()) for col in ("lof_score", "ae_score", "graph_score")}
+    sketch = QuantileSketch()
+    risk_parts, salami_parts = [], []
+    start = 0
+    for n_rows in shard_rows:
+        part = risk_index(scored.iloc[start:start + n_rows], trusted_vendors, score_max=score_max)
+        is_salami = salami_mask(part)
+        sketch.merge(QuantileSketch().add(part.loc[~is_salami, "total_risk_index"].to_numpy()))
+        risk_parts.append(part["total_risk_index"].to_numpy())
+        salami_parts.append(is_salami.to_numpy())
+        start += n_rows
+    del part
+
+    risk_median, mad = robust_statistics(sketch)
+    robust_z = 0.6745 * (np.concatenate(risk_parts) - risk_median) / mad
+    flagged = (robust_z > ROBUST_Z_SCORE_THRESHOLD) | np.concatenate(salami_parts)
+    anomalies = risk_index(scored[flagged], trusted_vendors, score_max=score_max)
+    anomalies["robust_z_score"] = robust_z[flagged]
+    return anomalies
+
+
+def _narrate(
+    anomalies: pd.DataFrame,
+    report_id: str,
+    amount_threshold: float | None,
+) -> list[dict[str, Any]]:
+    """Explanations + result documents for the flagged rows."""
+    explanations = pd.Series(
+        generate_explanations(anomalies), index=anomalies.index, dtype=object,
+    )
 
     if amount_threshold is not None and amount_threshold > 0:
         threshold_note = f"Amount exceeds user threshold ({float(amount_threshold):.2f})."
         high_amount_mask = anomalies["amount"].astype(float) > float(amount_threshold)
-        anomalies.loc[high_amount_mask, "explanation"] = anomalies.loc[
-            high_amount_mask, "explanation"
-        ].apply(lambda text: f"{threshold_note} {text}".strip())
-
-    results: list[dict[str, Any]] = []
-    # 🚨 Reverted output map (removed robust_z_score and is_salami)
-    for _, row in anomalies.iterrows():
-        results.append({
-            "report_id": report_id,
-            "transaction_id": row.get("transaction_id", ""),
-            "amount": float(row.get("amount", 0)),
-            "risk_score": round(float(row["total_risk_index"]), 4),
-            "decision": "review_required",
-            "explanation": row["explanation"],
-        })
-
-    return results
\ No newline at end of file
+        explanations = explanations.where(
+            ~high_amount_mask, (threshold_note + " " + explanations).str.strip(),
+        )
+
+    # Assemble all result columns at once and emit them in a single pass;
+    # the records go straight into insert_many.
+    results = pd.DataFrame({
+        "report_id": report_id,
+        "transaction_id": anomalies.get("transaction_id", ""),
+        "amount": anomalies["amount"].astype(float),
+        "risk_score": anomalies["total_risk_index"].astype(float).round(4),
+        "decision": "review_required",
+        "explanation": explanations,
+        "signals": pd.Series(fired_signals(anomalies), index=anomalies.index, dtype=object),
+    }, index=anomalies.index)
+
+    return results.to_dict("records")
@@ -0,0 +1,295 @@
+"""
+Engine Executor
+───────────────
+Runs the three independent scoring engines (LOF, Autoencoder, Graph)
+over a shared, read-only feature frame.
+
+Modes
+─────
+  sequential – one engine after another in the calling thread (default).
+  thread     – a thread pool inside the current process.  torch and the
+               sklearn/BLAS kernels release the GIL, so LOF and the
+               autoencoder overlap well; the graph engine is pure Python.
+  process    – a persistent pool of spawned worker processes.  Each
+               engine gets its own interpreter, so the pure-Python graph
+               engine no longer competes for the GIL.
+
+Thread limits
+─────────────
+torch, OpenMP and BLAS each size their native thread pools to every core.
+Running three engines at once would start 3× as many compute threads as
+there are cores.  Every engine therefore gets a CPU-thread budget
+(``ENGINE_THREAD_LIMITS``).  In ``process`` mode the budget is applied
+inside the worker around each engine call; in ``thread`` mode the native
+pools are process-wide, so the engines share one cap equal to the sum of
+their budgets (never more than the core count).
+
+Engine modules are imported on first use, so torch is never loaded by a
+run that does not include the autoencoder.
+
+Deadlines
+─────────
+With a ``deadline`` (see ``deadline.py``) sequential engines split the
+remaining time by ``ENGINE_BUDGET_SHARES``, ``ANYTIME_ENGINES`` last;
+concurrent engines share it.
+An engine whose budget is gone before it starts is skipped and scores 0.
+"""
+
+from __future__ import annotations
+
+import atexit
+import importlib
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+import pandas as pd
+
+from .deadline import ANYTIME_ENGINES, ENGINE_BUDGET_SHARES, expired, stage_deadline
+from .profiling import PipelineProfiler, current_rss_mb
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # pragma: no cover
+    threadpool_limits = None  # type: ignore[assignment]
+
+
+EXECUTOR_MODES = ("sequential", "thread", "process")
+
+FEATURE_COLS = ["velocity", "pattern", "rarity", "magnitude"]
+
+# engine name → (module, function, score column, input columns)
+ENGINE_SPECS: dict[str, tuple[str, str, str, list[str]]] = {
+    "lof": ("models_lof", "run_lof", "lof_score", FEATURE_COLS),
+    "ae": ("models_autoencoder", "run_autoencoder", "ae_score", FEATURE_COLS),
+    "graph": ("models_graph", "run_graph_analysis", "graph_score",
+              ["account_id", "merchant", "amount"]),
+}
+
+
+def _default_thread_limits() -> dict[str, int]:
+    """LOF and graph are effectively single-threaded; the AE gets the rest."""
+    cores = os.cpu_count() or 1
+    return {"lof": 1, "graph": 1, "ae": max(1, cores - 2)}
+
+
+ENGINE_THREAD_LIMITS: dict[str, int] = _default_thread_limits()
+
+
+# ── thread limiting ──────────────────────────────────────
+
+@contextmanager
+def limit_threads(n_threads: int) -> Iterator[None]:
+    """
+    Cap torch intra-op threads and every BLAS/OpenMP pool to
+    ``n_threads`` for the duration of the block.
+    """
+    torch = sys.modules.get("torch")
+    previous_torch = torch.get_num_threads() if torch is not None else None
+    if torch is not None:
+        torch.set_num_threads(n_threads)
+    try:
+        if threadpool_limits is not None:
+            with threadpool_limits(limits=n_threads):
+                yield
+        else:
+            yield
+    finally:
+        if torch is not None and previous_torch is not None:
+            torch.set_num_threads(previous_torch)
+
+
+# ── engine invocation ────────────────────────────────────
+
+def _load_engine(name: str):
+    module_name, func_name, _col, _cols = ENGINE_SPECS[name]
+    module = importlib.import_module(f"{__package__}.{module_name}")
+    return getattr(module, func_name)
+
+
+def _run_engine(
+    name: str,
+    frame: pd.DataFrame,
+    n_threads: int | None,
+    cpu_clock: str = "process",
+    options: dict[str, Any] | None = None,
+) -> tuple[pd.Series, dict[str, Any]]:
+    """
+    Entry point for the concurrent modes (must stay importable for spawned
+    workers).  Returns the scores plus the timing measured where the engine
+    actually ran.
+    """
+    engine = _load_engine(name)
+    options = options or {}
+    clock = time.thread_time if cpu_clock == "thread" else time.process_time
+    wall_start, cpu_start = time.perf_counter(), clock()
+    if n_threads is None:
+        scores = engine(frame, **options)
+    else:
+        with limit_threads(n_threads):
+            scores = engine(frame, **options)
+    timing = {
+        "wall_ms": round((time.perf_counter() - wall_start) * 1000, 2),
+        "cpu_ms": round((clock() - cpu_start) * 1000, 2),
+        "rss_mb": current_rss_mb(),
+    }
+    return scores, timing
+
+
+def _skipped(name: str, df: pd.DataFrame) -> pd.Series:
+    """Zero scores for an engine the deadline did not leave time to start."""
+    scores = pd.Series(0.0, index=df.index, name=ENGINE_SPECS[name][2])
+    scores.attrs["degraded"] = "skipped (deadline)"
+    return scores
+
+
+# ── pools ────────────────────────────────────────────────
+
+_pool_lock = threading.Lock()
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """
+    Lazily start one long-lived pool.  Workers are *spawned* rather than
+    forked: forking a process that already owns torch/OpenMP threads can
+    deadlock, and spawn is the only option on Windows anyway.
+    """
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=len(ENGINE_SPECS),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def shutdown_pool() -> None:
+    """Stop the shared process pool (safe to call more than once)."""
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=True, cancel_futures=True)
+            _process_pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+# ── public API ───────────────────────────────────────────
+
+def run_engines(
+    df: pd.DataFrame,
+    mode: str = "sequential",
+    engines: list[str] | None = None,
+    thread_limits: dict[str, int] | None = None,
+    profiler: PipelineProfiler | None = None,
+    options: dict[str, dict[str, Any]] | None = None,
+    deadline: float | None = None,
+) -> dict[str, pd.Series]:
+    """
+    Run the requested engines over ``df`` and return ``{score_col: Series}``.
+
+    Parameters
+    ----------
+    df : DataFrame
+        Feature-engineered frame (see ``build_features``).  Never mutated.
+    mode : str
+        One of ``EXECUTOR_MODES``.
+    engines : list[str] | None
+        Subset of ``ENGINE_SPECS`` keys; defaults to all three.
+    thread_limits : dict[str, int] | None
+        Per-engine CPU-thread budget; missing engines fall back to
+        ``ENGINE_THREAD_LIMITS``.
+    profiler : PipelineProfiler | None
+        Receives one stage record per engine.  In ``thread`` mode CPU time
+        is the engine thread's own (native torch/BLAS threads excluded);
+        in ``process`` mode it is the worker process's.
+    options : dict[str, dict] | None
+        Extra keyword arguments per engine (see ``ensemble.PIPELINE_PROFILES``).
+    deadline : float | None
+        Absolute ``time.time()`` by which every engine must be done.
+        Shortened or skipped engines carry ``attrs["degraded"]``.
+    """
+    if mode not in EXECUTOR_MODES:
+        raise ValueError(f"Unknown executor mode '{mode}'. Expected one of {EXECUTOR_MODES}")
+
+    names = list(engines) if engines is not None else list(ENGINE_SPECS)
+    limits = {**ENGINE_THREAD_LIMITS, **(thread_limits or {})}
+    options = options or {}
+
+    if mode == "sequential" or len(names) < 2:
+        if deadline is not None:
+            names.sort(key=lambda name: name in ANYTIME_ENGINES)
+        results = {}
+        for position, name in enumerate(names):
+            score_col = ENGINE_SPECS[name][2]
+            if expired(deadline):
+                results[score_col] = _skipped(name, df)
+                if profiler is not None:
+                    profiler.record(name, rows_in=len(df), skipped="deadline")
+                continue
+
+            engine = _load_engine(name)
+            kwargs = dict(options.get(name, {}))
+            if deadline is not None:
+                remaining_share = sum(ENGINE_BUDGET_SHARES.get(n, 1.0) for n in names[position:])
+                kwargs["deadline"] = stage_deadline(
+                    deadline, ENGINE_BUDGET_SHARES.get(name, 1.0), remaining_share,
+                )
+            if profiler is None:
+                results[score_col] = engine(df, **kwargs)
+                continue
+            with profiler.stage(name, rows_in=len(df)) as record:
+                results[score_col] = engine(df, **kwargs)
+                record["rows_out"] = len(df)
+                if results[score_col].attrs.get("degraded"):
+                    record["degraded"] = results[score_col].attrs["degraded"]
+        return results
+
+    if expired(deadline):
+        for name in names:
+            if profiler is not None:
+                profiler.record(name, rows_in=len(df), skipped="deadline")
+        return {ENGINE_SPECS[name][2]: _skipped(name, df) for name in names}
+
+    if deadline is not None:
+        options = {name: {**options.get(name, {}), "deadline": deadline} for name in names}
+
+    if mode == "thread":
+        shared_cap = min(os.cpu_count() or 1, sum(limits[name] for name in names))
+        with limit_threads(shared_cap), ThreadPoolExecutor(max_workers=len(names)) as pool:
+            return _collect(pool, df, names, {name: None for name in names}, "thread", profiler, options)
+
+    return _collect(_get_process_pool(), df, names, limits, "process", profiler, options)
+
+
+def _collect(
+    pool: Executor,
+    df: pd.DataFrame,
+    names: list[str],
+    limits: dict[str, int | None],
+    cpu_clock: str,
+    profiler: PipelineProfiler | None,
+    options: dict[str, dict[str, Any]],
+) -> dict[str, pd.Series]:
+    futures = {
+        name: pool.submit(_run_engine, name, df[ENGINE_SPECS[name][3]], limits[name], cpu_clock,
+                          options.get(name))
+        for name in names
+    }
+    results = {}
+    for name in names:
+        scores, timing = futures[name].result()
+        results[ENGINE_SPECS[name][2]] = scores
+        if profiler is not None:
+            if scores.attrs.get("degraded"):
+                timing["degraded"] = scores.attrs["degraded"]
+            profiler.record(name, rows_in=len(df), rows_out=len(scores), executor=cpu_clock, **timing)
+    return results
@@ -26,6 +26,9 @@ def _safe_log2(x: pd.Series) -> pd.Series:
 
 # ── public API ───────────────────────────────────────────
 
+FEATURE_COLS = ["velocity", "pattern", "rarity", "magnitude"]
+
+
 def build_features(df: pd.DataFrame) -> pd.DataFrame:
     """
     Accepts a DataFrame with at least:
@@ -33,6 +36,23 @@ def build_features(df: pd.DataFrame) -> pd.DataFrame:
     Returns the same DataFrame with four new float columns:
         velocity, pattern, rarity, magnitude
     """
+    df = build_raw_features(df)
+    return normalise_features(df, feature_bounds(df))
+
+
+def build_raw_features(
+    df: pd.DataFrame,
+    total_rows: int | None = None,
+    global_max: float | None = None,
+) -> pd.DataFrame:
+    """
+    The four pillars before [0, 1] scaling.
+
+    Velocity and pattern only look at rows of the same merchant.  Rarity
+    and magnitude also need the report-wide row count and maximum amount;
+    pass ``total_rows`` / ``global_max`` when ``df`` is only one shard of
+    a report (every merchant's rows must be in the same shard).
+    """
     df = df.copy()
 
     # ── normalise types ──
@@ -66,23 +86,136 @@ def build_features(df: pd.DataFrame) -> pd.DataFrame:
 
     # ── 3. Rarity (Material Shell) ───────────────────────
     # How unusual is this vendor × how big is the amount?
-    vendor_freq = df["merchant"].map(df["merchant"].value_counts(normalize=True))
+    vendor_counts = df["merchant"].map(df["merchant"].value_counts()).astype(float)
+    vendor_freq = vendor_counts / (total_rows or len(df))
     df["rarity"] = (1 - vendor_freq) * (_safe_log2(df["amount"]) ** 2)
 
     # ── 4. Magnitude (Fat Finger) ────────────────────────
-    global_max = df["amount"].max() or 1.0
+    if global_max is None:
+        global_max = df["amount"].max()
+    global_max = global_max or 1.0
     df["magnitude"] = (_safe_log2(df["amount"] / global_max + 1)) ** 2
 
     # ── clean up temp cols ───────────────────────────────
     df.drop(columns=["hours_since_last", "time_decay", "is_weekend"], inplace=True)
 
-    # ── normalise features to [0, 1] ────────────────────
-    for col in ("velocity", "pattern", "rarity", "magnitude"):
-        col_min = df[col].min()
-        col_max = df[col].max()
+    return df
+
+
+def feature_bounds(df: pd.DataFrame) -> dict[str, tuple[float, float]]:
+    """(min, max) of every raw feature column."""
+    return {col: (float(df[col].min()), float(df[col].max())) for col in FEATURE_COLS}
+
+
+def merge_feature_bounds(
+    bounds: list[dict[str, tuple[float, float]]],
+) -> dict[str, tuple[float, float]]:
+    """Combine per-shard ``feature_bounds`` into report-wide bounds."""
+    return {
+        col: (min(b[col][0] for b in bounds), max(b[col][1] for b in bounds))
+        for col in FEATURE_COLS
+    }
+
+
+def normalise_features(
+    df: pd.DataFrame,
+    bounds: dict[str, tuple[float, float]],
+) -> pd.DataFrame:
+    """Min-max scale the four pillars to [0, 1] using ``bounds``."""
+    for col in FEATURE_COLS:
+        col_min, col_max = bounds[col]
         if col_max - col_min > 0:
             df[col] = (df[col] - col_min) / (col_max - col_min)
         else:
             df[col] = 0.0
 
     return df
+
+
+# ── frozen feature window (micro-batch scoring) ──────────
+
+VELOCITY_WINDOW_SECONDS = 7 * 24 * 3600
+
+
+def feature_window_state(raw: pd.DataFrame) -> dict:
+    """
+    Snapshot of everything needed to compute the four pillars for *new*
+    rows as if they had been appended to ``raw`` (a ``build_raw_features``
+    frame): report size and max amount, the scaling bounds, and per
+    merchant its row count, amount sum, and the (timestamp, amount) pairs
+    of its last 7 days.
+    """
+    dated = raw.dropna(subset=["date"])
+    epoch = (dated["date"] - pd.Timestamp(0)).dt.total_seconds()
+    merchants: dict[str, dict] = {}
+    for merchant, group in dated.assign(_ts=epoch).groupby("merchant", sort=False):
+        last = float(group["_ts"].max())
+        window = group[group["_ts"] > last - VELOCITY_WINDOW_SECONDS]
+        merchants[str(merchant)] = {
+            "window_ts": window["_ts"].astype(float).tolist(),
+            "window_amount": window["amount"].astype(float).tolist(),
+        }
+
+    counts = raw["merchant"].astype(str).value_counts()
+    sums = raw.groupby(raw["merchant"].astype(str))["amount"].sum()
+    for merchant, count in counts.items():
+        entry = merchants.setdefault(merchant, {"window_ts": [], "window_amount": []})
+        entry["count"] = int(count)
+        entry["amount_sum"] = float(sums[merchant])
+
+    return {
+        "total_rows": int(len(raw)),
+        "global_max": float(raw["amount"].max() or 1.0),
+        "bounds": {col: list(b) for col, b in feature_bounds(raw).items()},
+        "merchants": merchants,
+    }
+
+
+def build_features_frozen(df: pd.DataFrame, state: dict) -> pd.DataFrame:
+    """
+    Four pillars for a small batch against a ``feature_window_state``.
+    The baseline itself is not updated; rows within the batch do see the
+    earlier batch rows of the same merchant (velocity/pattern).  Features
+    are scaled with the baseline bounds and clipped to [0, 1].
+    """
+    df = df.copy()
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0)
+    df.sort_values("date", inplace=True)
+    df.reset_index(drop=True, inplace=True)
+
+    merchants = state["merchants"]
+    history: dict[str, tuple[list[float], list[float]]] = {}
+    velocity, hours_since_last = [], []
+    for merchant, when, amount in zip(df["merchant"].astype(str), df["date"], df["amount"]):
+        if merchant not in history:
+            known = merchants.get(merchant, {})
+            history[merchant] = (list(known.get("window_ts", [])), list(known.get("window_amount", [])))
+        stamps, amounts = history[merchant]
+
+        if pd.isna(when):
+            velocity.append(float(amount))
+            hours_since_last.append(0.0)
+            continue
+
+        ts = (when - pd.Timestamp(0)).total_seconds()
+        velocity.append(float(amount) + sum(
+            a for t, a in zip(stamps, amounts) if ts - VELOCITY_WINDOW_SECONDS < t <= ts
+        ))
+        earlier = [t for t in stamps if t <= ts]
+        hours_since_last.append((ts - max(earlier)) / 3600 if earlier else 0.0)
+        stamps.append(ts)
+        amounts.append(float(amount))
+
+    df["velocity"] = velocity
+    is_weekend = df["date"].dt.dayofweek.isin([5, 6]).astype(float)
+    df["pattern"] = np.exp(-0.1 * np.asarray(hours_since_last)) + is_weekend
+
+    counts = df["merchant"].astype(str).map(lambda m: merchants.get(m, {}).get("count", 0))
+    vendor_freq = counts / max(state["total_rows"], 1)
+    df["rarity"] = (1 - vendor_freq) * (_safe_log2(df["amount"]) ** 2)
+    df["magnitude"] = (_safe_log2(df["amount"] / (state["global_max"] or 1.0) + 1)) ** 2
+
+    df = normalise_features(df, {col: tuple(b) for col, b in state["bounds"].items()})
+    df[FEATURE_COLS] = df[FEATURE_COLS].clip(0.0, 1.0)
+    return df
@@ -0,0 +1,106 @@
+"""
+Memory-Budgeted Mode
+────────────────────
+Helpers that keep the pipeline inside an RSS budget
+(``AUDITHAWK_ML_MEMORY_BUDGET_MB``; off when unset or 0).
+
+Always on
+─────────
+  column pruning – only ``ensemble.RAW_INPUT_COLS`` are materialised from
+                   the input records; Mongo ``_id``s, ``uploaded_at``,
+                   ``explanation`` … are never copied into a DataFrame
+
+In budget mode
+──────────────
+  downcasting    – merchant / account_id become categoricals, the four
+                   features and the engine scores float32.  Amounts stay
+                   float64: they are money and are echoed back in results.
+  under pressure – when the RSS after feature engineering plus the
+                   engines' expected working set
+                   (``MEMORY_ENGINE_BYTES_PER_ROW`` per row, measured for
+                   full-data LOF) would exceed the budget, LOF and the
+                   autoencoder switch to fitting on a sample
+                   (``MEMORY_LOF_SAMPLE_ROWS`` / ``MEMORY_AE_SAMPLE_ROWS``)
+                   and score every row in chunks, and sklearn's chunked
+                   neighbour searches are capped at
+                   ``MEMORY_SKLEARN_WORKING_MB`` per chunk.
+"""
+
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+import numpy as np
+import pandas as pd
+
+from .profiling import current_rss_mb
+
+
+DEFAULT_MEMORY_BUDGET_MB = float(os.getenv("AUDITHAWK_ML_MEMORY_BUDGET_MB", "0")) or None
+
+MEMORY_ENGINE_BYTES_PER_ROW = 1024
+MEMORY_LOF_SAMPLE_ROWS = 20000
+MEMORY_AE_SAMPLE_ROWS = 50000
+MEMORY_SKLEARN_WORKING_MB = 64
+
+CATEGORY_COLS = ["merchant", "account_id"]
+FLOAT32_COLS = ["velocity", "pattern", "rarity", "magnitude", "lof_score", "ae_score", "graph_score"]
+
+
+def records_frame(records: list[dict[str, Any]], columns: list[str]) -> pd.DataFrame:
+    """
+    DataFrame of only ``columns`` (those present in any record), built
+    without materialising the other keys of ``records``.
+    """
+    present: set[str] = set()
+    for record in records:
+        present.update(record.keys())
+    return pd.DataFrame(records, columns=[col for col in columns if col in present])
+
+
+def downcast_raw(raw: pd.DataFrame) -> pd.DataFrame:
+    """Repeated identifiers → categoricals."""
+    for col in CATEGORY_COLS:
+        if col in raw:
+            raw[col] = raw[col].astype(str).astype("category")
+    return raw
+
+
+def downcast_floats(df: pd.DataFrame) -> pd.DataFrame:
+    """Features / engine scores → float32 (in place)."""
+    for col in FLOAT32_COLS:
+        if col in df and df[col].dtype == np.float64:
+            df[col] = df[col].astype(np.float32)
+    return df
+
+
+def under_pressure(budget_mb: float | None, n_rows: int) -> bool:
+    """Would running the engines over ``n_rows`` rows push RSS past the budget?"""
+    if not budget_mb:
+        return False
+    rss = current_rss_mb()
+    projected = (rss or 0.0) + n_rows * MEMORY_ENGINE_BYTES_PER_ROW / (1024 * 1024)
+    return projected > budget_mb
+
+
+def pressure_options(options: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """Engine options switched to their sampled variants."""
+    adjusted = {name: dict(kwargs) for name, kwargs in options.items()}
+    for name, limit in (("lof", MEMORY_LOF_SAMPLE_ROWS), ("ae", MEMORY_AE_SAMPLE_ROWS)):
+        if name in adjusted:
+            current = adjusted[name].get("sample_rows")
+            adjusted[name]["sample_rows"] = min(current or limit, limit)
+    return adjusted
+
+
+@contextmanager
+def bounded_working_memory(enabled: bool) -> Iterator[None]:
+    """Cap sklearn's per-chunk scratch memory (pairwise distances, kNN) in this thread."""
+    if not enabled:
+        yield
+        return
+    import sklearn
+    with sklearn.config_context(working_memory=MEMORY_SKLEARN_WORKING_MB):
+        yield
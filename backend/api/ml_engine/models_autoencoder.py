@@ -11,24 +11,45 @@ Training
 ────────
 ~50 epochs over the entire dataset (assumption: ≥99 % of rows are
 "normal", so the autoencoder learns to reconstruct normal patterns).
+Under a deadline training stops early, at the normal learning rate: after
+the last epoch that fits at the pace so far, or after the last mini-batch
+inside the deadline.  An early-stopped model is the unhurried run's model
+after fewer epochs.
 
 Scoring
 ───────
 Per-row Mean Squared Error (MSE) reconstruction loss:
   MSE_i = (1/n) Σ (X_i - X̂_i)²
 Normalised to [0, 1] across the dataset.
+
+The trained weights are attached to the returned Series as
+``attrs["model_state"]`` (plain nested lists) so a frozen copy of the
+model can score new transactions later without torch (see
+``baseline.reconstruction_scores``).
 """
 
 from __future__ import annotations
 
+import time
+
 import numpy as np
 import pandas as pd
 import torch
 import torch.nn as nn
 from torch.utils.data import DataLoader, TensorDataset
 
+from .deadline import expired, remaining
+
 FEATURE_COLS = ["velocity", "pattern", "rarity", "magnitude"]
 
+# Rows per forward pass when scoring a sampled (memory-budgeted) run
+SCORE_CHUNK_ROWS = 65536
+
+# Weight initialisation and batch order are seeded, like LOF sampling and
+# Louvain, so the same features always train the same model
+AE_SEED = 42
+
+
 
 # ── PyTorch Model ────────────────────────────────────────
 
@@ -65,6 +86,8 @@ def run_autoencoder(
     epochs: int = 50,
     lr: float = 1e-3,
     batch_size: int = 64,
+    deadline: float | None = None,
+    sample_rows: int | None = None,
 ) -> pd.Series:
     """
     Train an autoencoder on the feature-engineered DataFrame and return
@@ -81,6 +104,13 @@ def run_autoencoder(
         Adam learning rate.
     batch_size : int
         Mini-batch size for DataLoader.
+    deadline : float | None
+        Absolute ``time.time()`` at which training stops early (see
+        ``deadline.py``); the result then carries ``attrs["degraded"]``
+        and the epochs trained in ``attrs["epochs_run"]``.
+    sample_rows : int | None
+        Train on a random sample of this many rows and score every row
+        in chunks of ``SCORE_CHUNK_ROWS`` (memory-budgeted mode).
 
     Returns
     -------
@@ -93,31 +123,93 @@ def run_autoencoder(
         return pd.Series(np.zeros(len(df)), index=df.index, name="ae_score")
 
     tensor_x = torch.from_numpy(X)
+    train_x = tensor_x
+    if sample_rows is not None and len(X) > sample_rows:
+        rng = np.random.default_rng(42)
+        train_x = torch.from_numpy(X[rng.choice(len(X), size=sample_rows, replace=False)])
+    model, epochs_run = train_autoencoder(
+        train_x, epochs=epochs, lr=lr, batch_size=batch_size, deadline=deadline,
+    )
+    del train_x
+    criterion = nn.MSELoss(reduction="none")  # per-element loss
+
+    # ── Scoring ──────────────────────────────────────────
+    model.eval()
+    with torch.no_grad():
+        if sample_rows is None:
+            reconstructed = model(tensor_x)
+            # per-row MSE: mean over the 4 feature dimensions
+            mse = criterion(reconstructed, tensor_x).mean(dim=1).numpy()
+        else:
+            mse = np.concatenate([
+                criterion(model(chunk), chunk).mean(dim=1).numpy()
+                for chunk in torch.split(tensor_x, SCORE_CHUNK_ROWS)
+            ])
+
+    # REMOVE the mse / mse_max logic. Just return the raw error multiplied by a constant.
+    # We multiply by 10 just to bring tiny decimals (0.005) up to a readable baseline (0.05)
+    scores = mse * 10.0 
+    result = pd.Series(scores, index=df.index, name="ae_score")
+    result.attrs["model_state"] = model_state(model)
+    result.attrs["epochs_run"] = epochs_run
+    if epochs_run < epochs:
+        result.attrs["degraded"] = f"stopped early after {epochs_run:g}/{epochs} epochs (deadline)"
+    return result
+
+
+def train_autoencoder(
+    tensor_x: torch.Tensor,
+    epochs: int = 50,
+    lr: float = 1e-3,
+    batch_size: int = 64,
+    deadline: float | None = None,
+) -> tuple[TransactionAutoencoder, float]:
+    """
+    Fit a fresh autoencoder to reconstruct ``tensor_x``.  Returns the model
+    and the number of epochs trained (fractional when ``deadline`` hit
+    mid-epoch; at least one mini-batch is always trained).  Training
+    always runs at ``lr``; a ``deadline`` only ends it early – before an
+    epoch the pace so far says will not fit, or after the mini-batch
+    during which it passed.
+    """
     dataset = TensorDataset(tensor_x, tensor_x)  # input == target
-    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True)
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True,
+                        generator=torch.Generator().manual_seed(AE_SEED))
 
-    model = TransactionAutoencoder()
+    with torch.random.fork_rng(devices=[]):
+        torch.manual_seed(AE_SEED)
+        model = TransactionAutoencoder()
     optimiser = torch.optim.Adam(model.parameters(), lr=lr)
     criterion = nn.MSELoss(reduction="none")  # per-element loss
 
     # ── Training loop ────────────────────────────────────
     model.train()
-    for _epoch in range(epochs):
-        for batch_x, batch_target in loader:
+    started = time.time()
+    for epoch in range(epochs):
+        if epoch and not _epoch_fits(epoch, started, deadline):
+            return model, epoch
+        for batch_no, (batch_x, batch_target) in enumerate(loader):
             reconstructed = model(batch_x)
             loss = criterion(reconstructed, batch_target).mean()
             optimiser.zero_grad()
             loss.backward()
             optimiser.step()
+            if expired(deadline):
+                return model, max(round(epoch + (batch_no + 1) / len(loader), 2), 0.01)
 
-    # ── Scoring ──────────────────────────────────────────
-    model.eval()
-    with torch.no_grad():
-        reconstructed = model(tensor_x)
-        # per-row MSE: mean over the 4 feature dimensions
-        mse = criterion(reconstructed, tensor_x).mean(dim=1).numpy()
+    return model, epochs
 
-    # REMOVE the mse / mse_max logic. Just return the raw error multiplied by a constant.
-    # We multiply by 10 just to bring tiny decimals (0.005) up to a readable baseline (0.05)
-    scores = mse * 10.0 
-    return pd.Series(scores, index=df.index, name="ae_score")
+
+def _epoch_fits(epochs_done: int, started: float, deadline: float | None) -> bool:
+    """Whether one more epoch, at the average pace so far, ends before ``deadline``."""
+    if deadline is None:
+        return True
+    per_epoch = (time.time() - started) / epochs_done
+    return remaining(deadline) >= per_epoch
+
+
+# ── Frozen model ─────────────────────────────────────────
+
+def model_state(model: TransactionAutoencoder) -> dict[str, list]:
+    """state_dict as nested Python lists (BSON/JSON friendly)."""
+    return {name: tensor.detach().cpu().tolist() for name, tensor in model.state_dict().items()}
@@ -23,7 +23,14 @@ Graph-derived anomaly signals
 Final per-row graph_score = mean of the four normalised sub-scores,
 re-normalised to [0, 1].
 
-Dependencies:  networkx, python-louvain (community)
+Extended analysis (``extended=True``, the "deep" profile)
+──────────────────────────────────────────────────────────
+5. **Bridge merchants** – sampled betweenness centrality of the
+   merchant: merchants that sit on many shortest paths between
+   otherwise separate groups of accounts score higher.  The composite
+   then averages five sub-scores.
+
+Dependencies:  networkx, python-louvain 0.16 (community)
 """
 
 from __future__ import annotations
@@ -32,10 +39,31 @@ import numpy as np
 import pandas as pd
 import networkx as nx
 
+from .deadline import expired
+
 try:
     import community as community_louvain  # python-louvain
+    import community.community_louvain as _louvain_impl
 except ImportError:  # pragma: no cover
     community_louvain = None  # type: ignore[assignment]
+    _louvain_impl = None  # type: ignore[assignment]
+
+# ``_louvain_levels`` runs python-louvain's level loop itself, which needs
+# these module-private names of python-louvain 0.16 (pinned in
+# requirements.txt).  Another version must not silently change the graph
+# scores, so a missing name fails here rather than mid-analysis.
+_LOUVAIN_INTERNALS = ("__one_level", "__modularity", "__renumber", "__MIN",
+                      "Status", "induced_graph", "check_random_state")
+if _louvain_impl is not None:
+    _missing = [name for name in _LOUVAIN_INTERNALS if not hasattr(_louvain_impl, name)]
+    if _missing:
+        raise ImportError(
+            f"python-louvain {getattr(community_louvain, '__version__', '?')} lacks {', '.join(_missing)}; "
+            "models_graph needs python-louvain==0.16 (see requirements.txt)"
+        )
+
+# Source nodes sampled for betweenness centrality in extended mode
+BETWEENNESS_SAMPLES = 256
 
 
 # ── Helpers ──────────────────────────────────────────────
@@ -69,84 +97,168 @@ def _build_graph(df: pd.DataFrame) -> nx.Graph:
     return G
 
 
-# ── Sub-scores ───────────────────────────────────────────
+# ── Graph statistics ─────────────────────────────────────
 
-def _degree_score(G: nx.Graph, df: pd.DataFrame) -> np.ndarray:
+def _louvain_levels(G: nx.Graph, weight: str = "weight", random_state: int = 42):
     """
-    Low degree centrality → more isolated → higher anomaly score.
-    We invert: score = 1 - normalised_degree.
+    python-louvain's ``generate_dendrogram``, one level at a time: yields
+    each level's partition as soon as it is found, so the caller can stop
+    between levels.  Run to the end, the last level is exactly
+    ``best_partition(G, weight=weight, random_state=random_state)``.
     """
-    dc = nx.degree_centrality(G)
-    raw = np.array([
-        (dc.get(f"acc:{row['account_id']}", 0) +
-         dc.get(f"mer:{row['merchant']}", 0)) / 2
-        for _, row in df.iterrows()
-    ])
-    normed = _normalise(raw)
-    return 1.0 - normed  # invert: low centrality = high score
-
+    one_level = getattr(_louvain_impl, "__one_level")
+    modularity = getattr(_louvain_impl, "__modularity")
+    renumber = getattr(_louvain_impl, "__renumber")
+    min_gain = getattr(_louvain_impl, "__MIN")
+    random_state = _louvain_impl.check_random_state(random_state)
+
+    if G.number_of_edges() == 0:
+        yield {node: i for i, node in enumerate(G.nodes())}
+        return
+
+    current = G.copy()
+    status = _louvain_impl.Status()
+    status.init(current, weight, None)
+    mod = None
+    while True:
+        one_level(current, status, weight, 1.0, random_state)
+        new_mod = modularity(status, 1.0)
+        if mod is not None and new_mod - mod < min_gain:
+            return
+        partition = renumber(status.node2com)
+        yield partition
+        mod = new_mod
+        current = _louvain_impl.induced_graph(partition, current, weight)
+        status.init(current, weight)
+
+
+def _louvain_partition(G: nx.Graph, deadline: float | None) -> tuple[dict[str, int], str | None]:
+    """
+    Louvain community per node, plus a note when the deadline cut it short.
 
-def _pagerank_score(G: nx.Graph, df: pd.DataFrame) -> np.ndarray:
+    The levels come from ``_louvain_levels``, so with time left the result
+    is python-louvain's ``best_partition``; once the deadline passes the
+    last level finished is kept.
+    """
+    if community_louvain is None:
+        return {}, None
+    if expired(deadline):
+        return {}, "community detection skipped (deadline)"
+
+    dendrogram = []
+    for partition in _louvain_levels(G):
+        dendrogram.append(partition)
+        if expired(deadline):
+            return (
+                community_louvain.partition_at_level(dendrogram, len(dendrogram) - 1),
+                f"Louvain stopped after {len(dendrogram)} level(s) (deadline)",
+            )
+    return community_louvain.partition_at_level(dendrogram, len(dendrogram) - 1), None
+
+
+def _graph_state(G: nx.Graph, extended: bool = False, deadline: float | None = None) -> dict:
     """
-    Low merchant PageRank + high amount → anomalous.
-    Score per row = (1 - normalised_merchant_PR) * normalised_amount.
+    Everything the sub-scores read from the graph:
+        degree       – degree centrality per node
+        pagerank     – weighted PageRank per merchant node
+        partition    – Louvain community per node (empty without python-louvain)
+        mer_stats    – (mean, std) of each merchant's edge weights
+        betweenness  – sampled betweenness per merchant node (extended only)
+        degraded     – notes on steps shortened by ``deadline``
     """
     pr = nx.pagerank(G, weight="weight")
-    mer_pr = np.array([
-        pr.get(f"mer:{row['merchant']}", 0) for _, row in df.iterrows()
-    ])
-    amounts = df["amount"].values.astype(np.float64)
-    normed_pr = _normalise(mer_pr)
-    normed_amt = _normalise(amounts)
-    return (1.0 - normed_pr) * normed_amt
 
+    degraded: list[str] = []
+    partition, note = _louvain_partition(G, deadline)
+    if note:
+        degraded.append(note)
+
+    # Gather per-merchant edge weight stats
+    merchant_weights: dict[str, list[float]] = {}
+    for u, v, data in G.edges(data=True):
+        node = v if v.startswith("mer:") else u
+        merchant_weights.setdefault(node, []).append(data["weight"])
 
-def _community_score(G: nx.Graph, df: pd.DataFrame) -> np.ndarray:
+    mer_stats: dict[str, tuple[float, float]] = {}
+    for mer, weights in merchant_weights.items():
+        arr = np.array(weights)
+        mer_stats[mer] = (float(arr.mean()), float(arr.std()) or 1.0)
+
+    state = {
+        "degree": nx.degree_centrality(G),
+        "pagerank": {node: val for node, val in pr.items() if node.startswith("mer:")},
+        "partition": partition,
+        "mer_stats": mer_stats,
+    }
+    if extended and expired(deadline):
+        extended = False
+        degraded.append("bridge-merchant analysis skipped (deadline)")
+    if extended:
+        bc = nx.betweenness_centrality(
+            G, k=min(BETWEENNESS_SAMPLES, G.number_of_nodes()), seed=42,
+        )
+        state["betweenness"] = {node: val for node, val in bc.items() if node.startswith("mer:")}
+    state["degraded"] = degraded
+    return state
+
+
+def _row_nodes(df: pd.DataFrame) -> tuple[list[str], list[str]]:
+    acc_nodes = [f"acc:{acc}" for acc in df["account_id"]]
+    mer_nodes = [f"mer:{mer}" for mer in df["merchant"]]
+    return acc_nodes, mer_nodes
+
+
+# ── Sub-scores ───────────────────────────────────────────
+
+def _raw_degree(state: dict, acc_nodes: list[str], mer_nodes: list[str]) -> np.ndarray:
+    """Mean degree centrality of the row's account and merchant."""
+    dc = state["degree"]
+    return np.array([
+        (dc.get(acc, 0) + dc.get(mer, 0)) / 2
+        for acc, mer in zip(acc_nodes, mer_nodes)
+    ], dtype=np.float64)
+
+
+def _raw_pagerank(state: dict, mer_nodes: list[str]) -> np.ndarray:
+    pr = state["pagerank"]
+    return np.array([pr.get(mer, 0) for mer in mer_nodes], dtype=np.float64)
+
+
+def _raw_betweenness(state: dict, mer_nodes: list[str]) -> np.ndarray:
+    bc = state["betweenness"]
+    return np.array([bc.get(mer, 0) for mer in mer_nodes], dtype=np.float64)
+
+
+def _community_score(state: dict, acc_nodes: list[str], mer_nodes: list[str]) -> np.ndarray:
     """
     Louvain community detection. Transactions whose account and
     merchant live in *different* communities get score = 1; same
     community → 0.
     """
-    if community_louvain is None:
-        return np.zeros(len(df))
-
-    partition = community_louvain.best_partition(G, weight="weight",
-                                                  random_state=42)
-    scores = np.array([
-        0.0 if partition.get(f"acc:{row['account_id']}", -1)
-              == partition.get(f"mer:{row['merchant']}", -2)
-        else 1.0
-        for _, row in df.iterrows()
+    partition = state["partition"]
+    if not partition:
+        return np.zeros(len(acc_nodes))
+
+    return np.array([
+        0.0 if partition.get(acc, -1) == partition.get(mer, -2) else 1.0
+        for acc, mer in zip(acc_nodes, mer_nodes)
     ])
-    return scores
 
 
-def _edge_weight_outlier(G: nx.Graph, df: pd.DataFrame) -> np.ndarray:
+def _edge_weight_outlier(state: dict, mer_nodes: list[str], amounts: np.ndarray) -> np.ndarray:
     """
     For each merchant, compute mean and std of incoming edge weights.
     Transactions > 2σ above the merchant's mean score = 1;
     otherwise scale linearly.
     """
-    # Gather per-merchant edge weight stats
-    merchant_weights: dict[str, list[float]] = {}
-    for u, v, data in G.edges(data=True):
-        node = v if v.startswith("mer:") else u
-        merchant_weights.setdefault(node, []).append(data["weight"])
-
-    mer_stats: dict[str, tuple[float, float]] = {}
-    for mer, weights in merchant_weights.items():
-        arr = np.array(weights)
-        mer_stats[mer] = (float(arr.mean()), float(arr.std()) or 1.0)
-
-    scores = np.zeros(len(df))
-    for i, (_, row) in enumerate(df.iterrows()):
-        mer_node = f"mer:{row['merchant']}"
+    mer_stats = state["mer_stats"]
+    scores = np.zeros(len(mer_nodes))
+    for i, (mer_node, amt) in enumerate(zip(mer_nodes, amounts)):
         mean, std = mer_stats.get(mer_node, (0.0, 1.0))
-        amt = float(row.get("amount", 0))
         if std < 1e-9:
             scores[i] = 0.0
         else:
-            z = (amt - mean) / std
+            z = (float(amt) - mean) / std
             scores[i] = min(max(z / 2.0, 0.0), 1.0)  # clip to [0, 1]
 
     return scores
@@ -154,15 +266,28 @@ def _edge_weight_outlier(G: nx.Graph, df: pd.DataFrame) -> np.ndarray:
 
 # ── Public API ───────────────────────────────────────────
 
-def run_graph_analysis(df: pd.DataFrame) -> pd.Series:
+def run_graph_analysis(
+    df: pd.DataFrame,
+    extended: bool = False,
+    deadline: float | None = None,
+) -> pd.Series:
     """
     Build a transaction graph from the feature-engineered DataFrame
     and return per-row graph anomaly scores normalised to [0, 1].
 
+    The graph statistics and normalisation bounds are attached as
+    ``attrs["model_state"]`` for ``score_graph_frozen``.
+
     Parameters
     ----------
     df : DataFrame
         Must contain columns: account_id, merchant, amount.
+    extended : bool
+        Add the bridge-merchant (betweenness) sub-score.
+    deadline : float | None
+        Absolute ``time.time()`` by which to stop refining communities
+        (see ``deadline.py``); shortened steps are listed in
+        ``attrs["degraded"]``.
 
     Returns
     -------
@@ -173,16 +298,132 @@ def run_graph_analysis(df: pd.DataFrame) -> pd.Series:
         return pd.Series(np.zeros(len(df)), index=df.index,
                          name="graph_score")
 
+    signals, state = graph_signals(df, extended, deadline)
+    degraded = state.pop("degraded")
+    final, state["bounds"] = score_graph_signals(signals, df["amount"].values.astype(np.float64))
+    result = pd.Series(final, index=df.index, name="graph_score")
+    result.attrs["model_state"] = state
+    if degraded:
+        result.attrs["degraded"] = "; ".join(degraded)
+    return result
+
+
+def graph_signals(
+    df: pd.DataFrame,
+    extended: bool = False,
+    deadline: float | None = None,
+    n_nodes: int | None = None,
+) -> tuple[pd.DataFrame, dict]:
+    """
+    The per-row inputs of the sub-scores, before any min-max scaling
+    (columns ``degree``, ``pagerank``, ``community``, ``edge_outlier`` and,
+    extended, ``betweenness``), plus the graph state.
+
+    ``n_nodes`` is the node count of the whole report's graph when ``df``
+    holds only some of its connected components (a shard): the
+    centralities are rescaled to their value in that graph, which is
+    exact for whole components.  Concatenate the shards' signals and
+    scale them once with ``score_graph_signals``.
+    """
     G = _build_graph(df)
+    state = _graph_state(G, extended, deadline)
+    if n_nodes:
+        _rescale_centralities(state, G.number_of_nodes(), n_nodes)
+    acc_nodes, mer_nodes = _row_nodes(df)
+    amounts = df["amount"].values.astype(np.float64)
+
+    signals = pd.DataFrame({
+        "degree": _raw_degree(state, acc_nodes, mer_nodes),
+        "pagerank": _raw_pagerank(state, mer_nodes),
+        "community": _community_score(state, acc_nodes, mer_nodes),
+        "edge_outlier": _edge_weight_outlier(state, mer_nodes, amounts),
+    }, index=df.index)
+    if "betweenness" in state:
+        signals["betweenness"] = _raw_betweenness(state, mer_nodes)
+    return signals, state
+
+
+def _rescale_centralities(state: dict, n_graph: int, n_nodes: int) -> None:
+    """
+    Centralities of a graph of ``n_graph`` nodes → their value once it is
+    one part of a graph of ``n_nodes`` nodes (no edges between the parts).
+    """
+    if n_nodes <= n_graph:
+        return
+    state["pagerank"] = {node: val * n_graph / n_nodes for node, val in state["pagerank"].items()}
+    state["degree"] = {node: val * (n_graph - 1) / (n_nodes - 1) for node, val in state["degree"].items()}
+    if "betweenness" in state and n_graph > 2:
+        factor = (n_graph - 1) * (n_graph - 2) / ((n_nodes - 1) * (n_nodes - 2))
+        state["betweenness"] = {node: val * factor for node, val in state["betweenness"].items()}
+
+
+def score_graph_signals(
+    signals: pd.DataFrame,
+    amounts: np.ndarray,
+) -> tuple[np.ndarray, dict[str, tuple[float, float]]]:
+    """
+    Per-row graph_score in [0, 1] from ``graph_signals``, min-max scaled
+    over all of ``signals``; also returns the scaling bounds.
+    """
+    raw_degree = signals["degree"].to_numpy(dtype=np.float64)
+    mer_pr = signals["pagerank"].to_numpy(dtype=np.float64)
 
     # Four sub-scores
-    s_degree = _degree_score(G, df)
-    s_pr = _pagerank_score(G, df)
-    s_comm = _community_score(G, df)
-    s_edge = _edge_weight_outlier(G, df)
+    # Low degree centrality → more isolated → higher anomaly score (inverted)
+    s_degree = 1.0 - _normalise(raw_degree)
+    # Low merchant PageRank + high amount → anomalous
+    s_pr = (1.0 - _normalise(mer_pr)) * _normalise(amounts)
+    s_comm = signals["community"].to_numpy(dtype=np.float64)
+    s_edge = signals["edge_outlier"].to_numpy(dtype=np.float64)
+
+    sub_scores = [s_degree, s_pr, s_comm, s_edge]
+    fitted = [("degree", raw_degree), ("pagerank", mer_pr), ("amount", amounts)]
+    if "betweenness" in signals:
+        raw_bc = signals["betweenness"].to_numpy(dtype=np.float64)
+        sub_scores.append(_normalise(raw_bc))
+        fitted.append(("betweenness", raw_bc))
+
+    # Equal-weight average of the sub-scores
+    composite = sum(sub_scores) / len(sub_scores)
+    fitted.append(("composite", composite))
+    bounds = {name: (float(arr.min()), float(arr.max())) for name, arr in fitted}
+    return _normalise(composite), bounds
+
+
+def _scale(arr: np.ndarray, bounds: tuple[float, float]) -> np.ndarray:
+    """``_normalise`` with fixed (fit-time) bounds, clipped to [0, 1]."""
+    mn, mx = bounds
+    if mx - mn < 1e-9:
+        return np.zeros_like(arr, dtype=np.float64)
+    return np.clip((arr - mn) / (mx - mn), 0.0, 1.0)
 
-    # Equal-weight average of the four sub-scores
-    composite = (s_degree + s_pr + s_comm + s_edge) / 4.0
-    final = _normalise(composite)
 
-    return pd.Series(final, index=df.index, name="graph_score")
+def score_graph_frozen(state: dict, df: pd.DataFrame) -> np.ndarray:
+    """
+    Score new rows against the graph statistics of a previous
+    ``run_graph_analysis`` call without rebuilding the graph.  Accounts
+    and merchants the graph has never seen count as fully isolated.
+    """
+    acc_nodes, mer_nodes = _row_nodes(df)
+    amounts = df["amount"].values.astype(np.float64)
+    bounds = state["bounds"]
+
+    s_degree = 1.0 - _scale(_raw_degree(state, acc_nodes, mer_nodes), bounds["degree"])
+    s_pr = (1.0 - _scale(_raw_pagerank(state, mer_nodes), bounds["pagerank"])) \
+        * _scale(amounts, bounds["amount"])
+    s_comm = _community_score(state, acc_nodes, mer_nodes)
+    if state["partition"]:
+        # an unseen node has no community, so it cannot share the other's
+        s_comm = np.where(
+            [acc not in state["partition"] or mer not in state["partition"]
+             for acc, mer in zip(acc_nodes, mer_nodes)],
+            1.0, s_comm,
+        )
+    s_edge = _edge_weight_outlier(state, mer_nodes, amounts)
+
+    sub_scores = [s_degree, s_pr, s_comm, s_edge]
+    if "betweenness" in state:
+        sub_scores.append(_scale(_raw_betweenness(state, mer_nodes), bounds["betweenness"]))
+
+    composite = sum(sub_scores) / len(sub_scores)
+    return _scale(composite, bounds["composite"])
@@ -18,15 +18,24 @@ import numpy as np
 import pandas as pd
 from sklearn.neighbors import LocalOutlierFactor
 
+from .deadline import remaining
+
 
 # Feature columns produced by feature_engineering.build_features()
 FEATURE_COLS = ["velocity", "pattern", "rarity", "magnitude"]
 
+# Conservative LOF throughput on the 4 features, used to size the sample
+# when a deadline would not leave time for the full fit
+LOF_ROWS_PER_SECOND = 20000
+LOF_MIN_SAMPLE_ROWS = 1000
+
 
 def run_lof(
     df: pd.DataFrame,
     n_neighbors: int = 20,
     contamination: float = 0.05,
+    sample_rows: int | None = None,
+    deadline: float | None = None,
 ) -> pd.Series:
     """
     Run LOF on the engineered features and return an anomaly score series.
@@ -41,6 +50,14 @@ def run_lof(
     contamination : float
         Expected proportion of outliers (only affects the internal
         threshold; we use the raw negative_outlier_factor_ for scoring).
+    sample_rows : int | None
+        When set and the frame is larger, LOF is fitted on a random sample
+        of this many rows (novelty mode) and every row is scored against
+        it – O(n·sample) instead of O(n²) neighbour search.
+    deadline : float | None
+        Absolute ``time.time()`` budget.  When the full fit is not
+        expected to finish in time, a sample sized to the budget is used
+        instead and the result carries ``attrs["degraded"]``.
 
     Returns
     -------
@@ -48,6 +65,24 @@ def run_lof(
     """
     X = df[FEATURE_COLS].values
 
+    degraded = None
+    if deadline is not None:
+        budget_rows = int(max(remaining(deadline), 0.0) * LOF_ROWS_PER_SECOND)
+        if budget_rows < min(len(X), sample_rows or len(X)):
+            # fitting on the sample and scoring every row against it ≈ 2 passes
+            sample_rows = max(LOF_MIN_SAMPLE_ROWS, budget_rows // 2)
+            if sample_rows < len(X):
+                degraded = f"fitted on a {sample_rows}-row sample (deadline)"
+
+    if sample_rows is not None and len(X) > sample_rows:
+        rng = np.random.default_rng(42)
+        reference = X[rng.choice(len(X), size=sample_rows, replace=False)]
+        shifted = score_lof_frozen(fit_lof_reference(reference, n_neighbors), X)
+        result = pd.Series(shifted, index=df.index, name="lof_score")
+        if degraded:
+            result.attrs["degraded"] = degraded
+        return result
+
     # Adapt n_neighbors when dataset is tiny
     effective_neighbours = min(n_neighbors, max(2, len(X) - 1))
 
@@ -66,3 +101,19 @@ def run_lof(
    # REMOVE the shifted / score_max logic. Return the raw shifted score.
     # 0 means normal. Anything > 1.5 is mathematically dense anomaly.
     return pd.Series(shifted, index=df.index, name="lof_score")
+
+
+# ── Frozen reference set (micro-batch scoring) ───────────
+
+def fit_lof_reference(X_ref: np.ndarray, n_neighbors: int = 20) -> LocalOutlierFactor:
+    """Fit LOF in novelty mode on a stored reference set of feature rows."""
+    effective_neighbours = min(n_neighbors, max(2, len(X_ref) - 1))
+    lof = LocalOutlierFactor(n_neighbors=effective_neighbours, novelty=True)
+    lof.fit(np.asarray(X_ref, dtype=np.float64))
+    return lof
+
+
+def score_lof_frozen(lof: LocalOutlierFactor, X: np.ndarray) -> np.ndarray:
+    """Same 0-shifted score as ``run_lof`` for rows outside the reference set."""
+    raw_scores = -lof.score_samples(np.asarray(X, dtype=np.float64))
+    return np.maximum(raw_scores - 1.0, 0.0)
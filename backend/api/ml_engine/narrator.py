@@ -8,6 +8,43 @@ auditor-friendly threat intelligence. Ranks signals by severity.
 from __future__ import annotations
 import pandas as pd
 
+# (signal, score column, fires above, explanation) in narration order; also
+# counted per report by ``api/report_analytics.py``
+SIGNAL_RULES: list[tuple[str, str, float, str]] = [
+    ("velocity", "velocity", 0.7,
+     "Velocity Risk ({score:.2f}): Rapid, repeated payments to this vendor."),
+    ("time_anomaly", "pattern", 0.7,
+     "Time Anomaly ({score:.2f}): Transaction occurred outside normal business hours."),
+    ("unusual_vendor", "rarity", 0.7,
+     "Unusual Vendor ({score:.2f}): Payment made to an unrecognized or rare merchant."),
+    ("massive_outlier", "magnitude", 0.7,
+     "Massive Outlier ({score:.2f}): Abnormally large amount compared to corporate baselines."),
+    ("lof", "lof_score", 0.5,
+     "Data Deviation (LOF {score:.2f}): Metadata strongly breaks historical purchasing patterns."),
+    ("autoencoder", "ae_score", 0.5,
+     "Behavioral Anomaly (AI {score:.2f}): Deep learning detected a break in established normal behavior."),
+    ("graph", "graph_score", 0.5,
+     "Suspicious Network (Graph {score:.2f}): Funds moving between isolated accounts or sinkholes."),
+]
+
+# A flagged row none of the rules fired for
+COMPOSITE_SIGNAL = "composite"
+COMPOSITE_EXPLANATION = "Composite Risk: Flagged by multiple weak risk signals reaching the anomaly threshold."
+
+
+def fired_signals(anomalies: pd.DataFrame) -> list[list[str]]:
+    """The ``SIGNAL_RULES`` each row fires (``[COMPOSITE_SIGNAL]`` for none)."""
+    fired = [
+        (name, (anomalies[column] > fires_above).to_numpy())
+        for name, column, fires_above, _text in SIGNAL_RULES
+        if column in anomalies
+    ]
+    return [
+        [name for name, mask in fired if mask[i]] or [COMPOSITE_SIGNAL]
+        for i in range(len(anomalies))
+    ]
+
+
 def generate_explanations(anomalies: pd.DataFrame, max_reasons: int = 2) -> list[str]:
     """
     Given a DataFrame of anomalous rows, rank the triggered rules by score 
@@ -19,44 +56,14 @@ def generate_explanations(anomalies: pd.DataFrame, max_reasons: int = 2) -> list
         # Store tuples of (score, explanation_text)
         signals: list[tuple[float, str]] = []
 
-        # Velocity
-        vel = row.get("velocity", 0.0)
-        if vel > 0.7:
-            signals.append((vel, f"Velocity Risk ({vel:.2f}): Rapid, repeated payments to this vendor."))
-
-        # Pattern
-        pat = row.get("pattern", 0.0)
-        if pat > 0.7:
-            signals.append((pat, f"Time Anomaly ({pat:.2f}): Transaction occurred outside normal business hours."))
-
-        # Rarity
-        rar = row.get("rarity", 0.0)
-        if rar > 0.7:
-            signals.append((rar, f"Unusual Vendor ({rar:.2f}): Payment made to an unrecognized or rare merchant."))
-
-        # Magnitude
-        mag = row.get("magnitude", 0.0)
-        if mag > 0.7:
-            signals.append((mag, f"Massive Outlier ({mag:.2f}): Abnormally large amount compared to corporate baselines."))
-
-        # LOF
-        lof = row.get("lof_score", 0.0)
-        if lof > 0.5:
-            signals.append((lof, f"Data Deviation (LOF {lof:.2f}): Metadata strongly breaks historical purchasing patterns."))
-
-        # Autoencoder (Phase 2)
-        ae = row.get("ae_score", 0.0)
-        if ae > 0.5:
-            signals.append((ae, f"Behavioral Anomaly (AI {ae:.2f}): Deep learning detected a break in established normal behavior."))
-
-        # Graph (Phase 3)
-        graph = row.get("graph_score", 0.0)
-        if graph > 0.5:
-            signals.append((graph, f"Suspicious Network (Graph {graph:.2f}): Funds moving between isolated accounts or sinkholes."))
+        for _name, column, fires_above, text in SIGNAL_RULES:
+            score = row.get(column, 0.0)
+            if score > fires_above:
+                signals.append((score, text.format(score=score)))
 
         # Fallback if nothing explicitly crossed the high thresholds
         if not signals:
-            explanations.append("Composite Risk: Flagged by multiple weak risk signals reaching the anomaly threshold.")
+            explanations.append(COMPOSITE_EXPLANATION)
             continue
 
         # 🚨 THE TRIAGE LOGIC: Sort by score (highest first) and slice the top N
@@ -69,4 +76,4 @@ def generate_explanations(anomalies: pd.DataFrame, max_reasons: int = 2) -> list
         
         explanations.append(explanation)
 
-    return explanations
\ No newline at end of file
+    return explanations
@@ -0,0 +1,187 @@
+"""
+Pipeline Profiler
+─────────────────
+Lightweight per-stage instrumentation for the upload / re-analysis path.
+
+For every stage we record:
+  wall_ms         – elapsed wall-clock time
+  cpu_ms          – CPU time consumed by this process (or by the worker
+                    process / thread that ran the stage)
+  rss_mb          – resident set size when the stage finished
+  peak_traced_mb  – peak Python-heap allocation during the stage
+                    (tracemalloc; only when ``trace_memory`` is on, since
+                    tracing slows pandas-heavy code down noticeably)
+  rows_in/rows_out
+
+``to_dict()`` produces a BSON/JSON-friendly document that is stored on
+``audit_reports.pipeline_profile``.  Besides the process's lifetime peak
+RSS it reports ``run_peak_rss_mb``: the highest RSS seen while this run
+was inside ``track_peak_rss()`` (sampled by a background thread, so very
+short spikes can be missed; worker processes are not included).
+
+An optional ``on_stage(event, name)`` listener is called with "start"
+before a stage runs and "end" after it finished without raising (and
+for every ``record``).  Background jobs use it to publish progress and
+to cancel a run at a stage boundary by raising from the listener.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Iterator
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # type: ignore[assignment]
+
+
+_MB = 1024 * 1024
+
+RSS_SAMPLE_INTERVAL_SECONDS = 0.05
+
+
+# ── memory helpers ───────────────────────────────────────
+
+def current_rss_mb() -> float | None:
+    """Current RSS of this process in MB (Linux: /proc, else peak RSS)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            resident_pages = int(fh.read().split()[1])
+        return round(resident_pages * os.sysconf("SC_PAGE_SIZE") / _MB, 2)
+    except (OSError, ValueError, AttributeError, IndexError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float | None:
+    """Lifetime peak RSS of this process in MB, when the OS exposes it."""
+    if resource is None:
+        return None
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / _MB, 2)
+
+
+# ── profiler ─────────────────────────────────────────────
+
+class PipelineProfiler:
+    """Collects one record per stage, in execution order."""
+
+    def __init__(
+        self,
+        trace_memory: bool | None = None,
+        on_stage: Callable[[str, str], None] | None = None,
+    ):
+        if trace_memory is None:
+            trace_memory = os.getenv("AUDITHAWK_PROFILE_TRACEMALLOC", "0") == "1"
+        self.trace_memory = trace_memory
+        self.stages: list[dict[str, Any]] = []
+        self.started_at = datetime.utcnow()
+        self._started = time.perf_counter()
+        self.run_peak_rss_mb: float | None = None
+        self._sampling = 0
+        self._sampling_lock = threading.Lock()
+        self.on_stage = on_stage
+
+    def _notify(self, event: str, name: str) -> None:
+        if self.on_stage is not None:
+            self.on_stage(event, name)
+
+    def _observe_rss(self, rss_mb: float | None) -> None:
+        if rss_mb is not None and (self.run_peak_rss_mb is None or rss_mb > self.run_peak_rss_mb):
+            self.run_peak_rss_mb = rss_mb
+
+    @contextmanager
+    def track_peak_rss(self) -> Iterator[None]:
+        """Sample RSS in the background for the duration of the block (re-entrant)."""
+        with self._sampling_lock:
+            self._sampling += 1
+            owner = self._sampling == 1
+        stop = threading.Event()
+        sampler = None
+        if owner:
+            def _sample() -> None:
+                while not stop.wait(RSS_SAMPLE_INTERVAL_SECONDS):
+                    self._observe_rss(current_rss_mb())
+
+            self._observe_rss(current_rss_mb())
+            sampler = threading.Thread(target=_sample, name="rss-sampler", daemon=True)
+            sampler.start()
+        try:
+            yield
+        finally:
+            with self._sampling_lock:
+                self._sampling -= 1
+            if sampler is not None:
+                stop.set()
+                sampler.join()
+                self._observe_rss(current_rss_mb())
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int | None = None) -> Iterator[dict[str, Any]]:
+        """
+        Time the enclosed block.  The yielded record may be updated by
+        the caller, typically to set ``rows_out``.
+        """
+        self._notify("start", name)
+        record: dict[str, Any] = {"stage": name, "rows_in": rows_in, "rows_out": None}
+        started_tracing = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_ms"] = round((time.perf_counter() - wall_start) * 1000, 2)
+            record["cpu_ms"] = round((time.process_time() - cpu_start) * 1000, 2)
+            record["rss_mb"] = current_rss_mb()
+            self._observe_rss(record["rss_mb"])
+            if self.trace_memory:
+                record["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / _MB, 2)
+                if started_tracing:
+                    tracemalloc.stop()
+            else:
+                record["peak_traced_mb"] = None
+            self.stages.append(record)
+        self._notify("end", name)
+
+    def record(self, name: str, **fields: Any) -> None:
+        """Add a stage that was measured elsewhere (e.g. in a worker process)."""
+        self.stages.append({
+            "stage": name,
+            "rows_in": None,
+            "rows_out": None,
+            "wall_ms": None,
+            "cpu_ms": None,
+            "rss_mb": None,
+            "peak_traced_mb": None,
+            **fields,
+        })
+        self._notify("end", name)
+
+    def checkpoint(self) -> int:
+        return len(self.stages)
+
+    def rollback(self, checkpoint: int) -> None:
+        """Forget stages recorded after ``checkpoint`` (e.g. a retried Mongo transaction)."""
+        del self.stages[checkpoint:]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "started_at": self.started_at.isoformat(),
+            "total_wall_ms": round((time.perf_counter() - self._started) * 1000, 2),
+            "peak_rss_mb": peak_rss_mb(),
+            "run_peak_rss_mb": self.run_peak_rss_mb,
+            "stages": list(self.stages),
+        }
@@ -0,0 +1,261 @@
+"""
+Sharded Pipeline Execution
+──────────────────────────
+Scores reports that are too large for one worker by splitting the rows
+into shards and scoring each shard in its own worker process.
+
+Shard assignment
+────────────────
+Rows are grouped by connected component of the account ↔ merchant graph,
+so every transaction a graph edge touches stays together.  Components are
+bin-packed (largest first) into ``n_shards`` shards.  A component that is
+larger than one shard's fair share (typically the giant component formed
+by ubiquitous vendors) is split by merchant instead.  Every merchant's
+rows therefore always land in one shard, which keeps velocity, pattern
+and the vendor-frequency part of rarity exact.
+
+Global statistics
+─────────────────
+  rarity/magnitude – computed with the report-wide row count and max amount
+  [0, 1] scaling   – per-shard feature bounds are merged before scaling
+  graph_score      – shards return the unscaled graph signals, with the
+                     centralities rescaled to the report-wide node count;
+                     the parent scales them once over every row
+  robust z-score   – combine_scores runs over the concatenated per-shard
+                     scores, so the median/MAD are report-wide; in sketch
+                     mode it builds one sketch per shard and merges them
+
+LOF and the autoencoder are fitted per shard; for shards made of whole
+components the graph signals are exact.
+
+Each worker builds its shard's raw features once: the first pass spills
+them to a temporary file and returns only their bounds, the second reads
+them back.  Shards send back ``keep_cols`` and the graph signals only.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from .deadline import ENGINE_BUDGET_SHARES, expired, stage_deadline
+from .executor import ENGINE_SPECS, limit_threads, run_engines
+from .feature_engineering import (
+    build_raw_features,
+    feature_bounds,
+    merge_feature_bounds,
+    normalise_features,
+)
+from .models_graph import graph_signals, score_graph_signals
+from .profiling import PipelineProfiler
+
+
+# ── shard assignment ─────────────────────────────────────
+
+def assign_shards(raw: pd.DataFrame, n_shards: int) -> np.ndarray:
+    """Return a shard id (0 … n_shards-1) for every row of ``raw``."""
+    n_rows = len(raw)
+    if n_shards <= 1 or n_rows == 0:
+        return np.zeros(n_rows, dtype=np.int32)
+
+    acc_codes, acc_uniques = pd.factorize(raw["account_id"].astype(str))
+    mer_codes, mer_uniques = pd.factorize(raw["merchant"].astype(str))
+    n_acc, n_mer = len(acc_uniques), len(mer_uniques)
+
+    # Bipartite graph: accounts are nodes [0, n_acc), merchants [n_acc, n_acc + n_mer)
+    adjacency = coo_matrix(
+        (np.ones(n_rows, dtype=np.int8), (acc_codes, mer_codes + n_acc)),
+        shape=(n_acc + n_mer, n_acc + n_mer),
+    )
+    _n_comp, node_labels = connected_components(adjacency, directed=False)
+    row_component = node_labels[acc_codes]
+
+    # Work units: whole components, or single merchants of oversized components
+    capacity = int(np.ceil(n_rows / n_shards))
+    comp_sizes = np.bincount(row_component)
+    oversized = comp_sizes[row_component] > capacity
+    unit_keys = np.where(oversized, mer_codes + len(comp_sizes), row_component)
+    unit_codes, unit_uniques = pd.factorize(unit_keys)
+    unit_sizes = np.bincount(unit_codes)
+
+    # Greedy bin-packing: biggest unit into the currently lightest shard
+    loads = np.zeros(n_shards, dtype=np.int64)
+    unit_shard = np.empty(len(unit_uniques), dtype=np.int32)
+    for unit in np.argsort(-unit_sizes, kind="stable"):
+        target = int(np.argmin(loads))
+        unit_shard[unit] = target
+        loads[target] += unit_sizes[unit]
+
+    return unit_shard[unit_codes]
+
+
+# ── worker tasks (module-level so spawned workers can import them) ──
+
+def _shard_features(
+    shard: pd.DataFrame,
+    total_rows: int,
+    global_max: float,
+    spill_path: str,
+) -> dict[str, tuple[float, float]]:
+    raw = build_raw_features(shard, total_rows, global_max)
+    raw.to_pickle(spill_path)
+    return feature_bounds(raw)
+
+
+def _score_shard(
+    spill_path: str,
+    bounds: dict[str, tuple[float, float]],
+    n_threads: int,
+    keep_cols: list[str],
+    n_nodes: int,
+    engine_options: dict[str, dict] | None = None,
+    deadline: float | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame | None, dict[str, str]]:
+    df = normalise_features(pd.read_pickle(spill_path), bounds)
+    os.remove(spill_path)
+
+    options = dict(engine_options) if engine_options is not None else {name: {} for name in ENGINE_SPECS}
+    graph_options = options.pop("graph", None)
+    signals = None
+    degraded = {}
+    # the graph signals come last, so the other engines leave it its budget share
+    engines_deadline = deadline
+    if graph_options is not None:
+        shares = [ENGINE_BUDGET_SHARES.get(name, 1.0) for name in options]
+        engines_deadline = stage_deadline(deadline, sum(shares),
+                                          sum(shares) + ENGINE_BUDGET_SHARES.get("graph", 1.0))
+    with limit_threads(n_threads):
+        for col, scores in run_engines(df, mode="sequential", engines=list(options),
+                                       options=options, deadline=engines_deadline).items():
+            df[col] = scores
+            if scores.attrs.get("degraded"):
+                degraded[col] = scores.attrs["degraded"]
+        if graph_options is not None and expired(deadline):
+            degraded["graph_score"] = "skipped (deadline)"
+        elif graph_options is not None:
+            signals, state = graph_signals(df, deadline=deadline, n_nodes=n_nodes, **graph_options)
+            if state["degraded"]:
+                degraded["graph_score"] = "; ".join(state["degraded"])
+    for col in keep_cols:
+        if col not in df:
+            df[col] = 0.0  # engine left out by the profile, or scored by the parent
+    return df[keep_cols], signals, degraded
+
+
+# ── pool ─────────────────────────────────────────────────
+
+_pool_lock = threading.Lock()
+_shard_pool: ProcessPoolExecutor | None = None
+_shard_pool_size = 0
+
+
+def _get_shard_pool(n_workers: int) -> ProcessPoolExecutor:
+    global _shard_pool, _shard_pool_size
+    with _pool_lock:
+        if _shard_pool is None or _shard_pool_size != n_workers:
+            if _shard_pool is not None:
+                _shard_pool.shutdown(wait=True)
+            _shard_pool = ProcessPoolExecutor(
+                max_workers=n_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _shard_pool_size = n_workers
+        return _shard_pool
+
+
+# ── public API ───────────────────────────────────────────
+
+def score_sharded(
+    raw: pd.DataFrame,
+    n_shards: int,
+    keep_cols: list[str],
+    n_workers: int | None = None,
+    profiler: PipelineProfiler | None = None,
+    engine_options: dict[str, dict] | None = None,
+    deadline: float | None = None,
+    degraded: dict[str, str] | None = None,
+) -> pd.DataFrame:
+    """
+    Sharded equivalent of ``ensemble.score_transactions``: features and
+    engines per shard in worker processes.  Returns only ``keep_cols`` for
+    every row (shards concatenated), ready for ``combine_scores``.
+    ``engine_options`` restricts and configures the engines as in
+    ``ensemble.PIPELINE_PROFILES`` (all engines with defaults when None).
+    Every shard works to ``deadline``; ``degraded``, when given, receives
+    score column → reason for signals shortened in any shard.
+    """
+    profiler = profiler or PipelineProfiler()
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, n_shards))
+    threads_per_worker = max(1, (os.cpu_count() or 1) // n_workers)
+
+    with profiler.stage("shard_assign", rows_in=len(raw)) as record:
+        shard_ids = assign_shards(raw, n_shards)
+        shards = [raw[shard_ids == i] for i in range(n_shards)]
+        shards = [shard for shard in shards if len(shard)]
+        record["rows_out"] = len(shards)
+        record["shard_rows"] = [len(shard) for shard in shards]
+
+    total_rows = len(raw)
+    global_max = float(pd.to_numeric(raw["amount"], errors="coerce").fillna(0.0).max())
+    n_nodes = int(raw["account_id"].astype(str).nunique() + raw["merchant"].astype(str).nunique())
+    pool = _get_shard_pool(n_workers)
+
+    with tempfile.TemporaryDirectory(prefix="audithawk-shards-") as spill_dir:
+        spill_paths = [os.path.join(spill_dir, f"shard-{i}.pkl") for i in range(len(shards))]
+
+        with profiler.stage("shard_features", rows_in=total_rows) as record:
+            bounds = merge_feature_bounds(list(pool.map(
+                _shard_features,
+                shards,
+                [total_rows] * len(shards),
+                [global_max] * len(shards),
+                spill_paths,
+            )))
+            del shards
+            record["rows_out"] = total_rows
+
+        with profiler.stage("shard_engines", rows_in=total_rows) as record:
+            futures = [
+                pool.submit(_score_shard, path, bounds, threads_per_worker, keep_cols,
+                            n_nodes, engine_options, deadline)
+                for path in spill_paths
+            ]
+            frames, signal_parts, offset = [], [], 0
+            for future in futures:
+                frame, shard_signals, shard_degraded = future.result()
+                frames.append(frame)
+                if shard_signals is not None:
+                    signal_parts.append((offset, shard_signals))
+                offset += len(frame)
+                if degraded is not None:
+                    for col, reason in shard_degraded.items():
+                        degraded.setdefault(col, reason)
+            scored = pd.concat(frames, ignore_index=True)
+            # shard boundaries, for the per-shard sketches of combine_scores
+            scored.attrs["shard_rows"] = [len(frame) for frame in frames]
+            del frames
+            record["rows_out"] = len(scored)
+            record["workers"] = n_workers
+
+    if signal_parts:
+        # one min-max scaling over every shard's graph signals
+        with profiler.stage("shard_graph_scale", rows_in=len(scored)) as record:
+            positions = np.concatenate([np.arange(start, start + len(part)) for start, part in signal_parts])
+            signals = pd.concat([part for _start, part in signal_parts], ignore_index=True)
+            del signal_parts
+            graph_score = scored["graph_score"].to_numpy(dtype=np.float64, copy=True)
+            graph_score[positions], _bounds = score_graph_signals(
+                signals, scored["amount"].to_numpy(dtype=np.float64)[positions],
+            )
+            scored["graph_score"] = graph_score
+            record["rows_out"] = len(positions)
+
+    return scored
@@ -0,0 +1,166 @@
+"""
+Quantile Sketch
+───────────────
+A KLL-style rank-error sketch used for the robust z-score (median / MAD of
+the total risk index) without sorting every value.
+
+Values enter level 0, at most k at a time, so no more than about 4·k
+items are ever sorted together.  When a level holds more than its
+capacity it is sorted and every other item (random offset) moves up one
+level with twice the weight; capacities shrink by 2/3 per level below the
+top, so the sketch keeps about 3·k items however many values were added.
+
+Sketches with the same k merge (``merge``) by concatenating their levels
+and compacting again – the sharded pipeline builds one per shard – and
+round-trip through JSON (``to_dict`` / ``from_dict``).
+
+Error bound (k = ``DEFAULT_K``)
+──────────────────────────────
+  quantile(q) – a value whose rank is within ε·n of q·n, where the
+                normalised rank error ε ≈ 2.3 / k^0.97 with 99 % confidence
+                (≈ 0.3 % for k = 1000)
+  MAD         – the median of |x − median| over the weighted items, so
+                within 2·ε·n ranks of the true MAD rank around the
+                estimated median
+
+The bound holds for merged sketches with n the total count.  Both are
+actual sample values, never bucket representatives, so a report whose
+scores cluster tightly around the median keeps a non-zero MAD.  While
+fewer than k values have been added nothing is compacted and every
+answer is exact (linear interpolation between ranks, as pandas does).
+
+The error is additive in rank, so extreme tails are not covered: for
+k = 1000 the rank error (≈ 0.3 %) is wider than the top 0.1 % of a
+report, and a 99.9th-percentile cut-off ("The Whale") read from the
+sketch could land anywhere in the top 0.4 %.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Iterable
+
+import numpy as np
+
+
+DEFAULT_K = 1000
+
+# Lower levels never shrink below this many items
+MIN_LEVEL_CAPACITY = 8
+
+LEVEL_CAPACITY_DECAY = 2 / 3
+
+
+class QuantileSketch:
+    """Rank-error quantile sketch for float values (compactions are seeded)."""
+
+    def __init__(self, k: int = DEFAULT_K, seed: int = 0):
+        if k < MIN_LEVEL_CAPACITY:
+            raise ValueError(f"k must be at least {MIN_LEVEL_CAPACITY}")
+        self.k = k
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+        self._levels: list[np.ndarray] = [np.empty(0)]
+        self.count = 0
+
+    # ── building ──
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._levels) - level - 1
+        return max(MIN_LEVEL_CAPACITY, math.ceil(self.k * LEVEL_CAPACITY_DECAY ** depth))
+
+    def _compact(self, level: int) -> None:
+        if level + 1 == len(self._levels):
+            self._levels.append(np.empty(0))
+        items = np.sort(self._levels[level])
+        odd = items.size % 2
+        promoted = items[odd:][int(self._rng.integers(0, 2))::2]
+        self._levels[level] = items[:odd]
+        self._levels[level + 1] = np.concatenate([self._levels[level + 1], promoted])
+
+    def _compress(self) -> None:
+        while True:
+            full = [h for h, items in enumerate(self._levels) if items.size > self._capacity(h)]
+            if not full:
+                return
+            self._compact(full[0])
+
+    def add(self, values: Iterable[float] | np.ndarray) -> "QuantileSketch":
+        arr = np.asarray(values, dtype=np.float64).ravel()
+        arr = arr[~np.isnan(arr)]
+        for start in range(0, arr.size, self.k):
+            block = arr[start:start + self.k]
+            self._levels[0] = np.concatenate([self._levels[0], block])
+            self.count += int(block.size)
+            self._compress()
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Add every value ``other`` summarises (``other`` is left unchanged)."""
+        if other.k != self.k:
+            raise ValueError("Cannot merge sketches with different k")
+        for h, items in enumerate(other._levels):
+            if h == len(self._levels):
+                self._levels.append(np.empty(0))
+            self._levels[h] = np.concatenate([self._levels[h], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    # ── serialization ──
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "k": self.k,
+            "seed": self.seed,
+            "count": self.count,
+            "levels": [items.tolist() for items in self._levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(int(data["k"]), int(data.get("seed", 0)))
+        sketch._levels = [np.asarray(items, dtype=np.float64) for items in data.get("levels") or [[]]]
+        sketch.count = int(data.get("count", 0))
+        return sketch
+
+    # ── queries ──
+
+    @property
+    def retained(self) -> int:
+        """Number of items the sketch currently holds."""
+        return sum(items.size for items in self._levels)
+
+    def _weighted_items(self) -> tuple[np.ndarray, np.ndarray]:
+        """(values, weights) in ascending value order."""
+        values = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(items.size, 2 ** h, dtype=np.int64)
+                                  for h, items in enumerate(self._levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], weights[order]
+
+    @staticmethod
+    def _weighted_quantile(values: np.ndarray, weights: np.ndarray, q: float) -> float:
+        # item i stands for the ranks [cum_i − w_i, cum_i − 1]
+        cumulative = np.cumsum(weights)
+        rank = q * (cumulative[-1] - 1)
+        low, high = math.floor(rank), math.ceil(rank)
+        v_low = values[np.searchsorted(cumulative, low, side="right")]
+        v_high = values[np.searchsorted(cumulative, high, side="right")]
+        return float(v_low + (rank - low) * (v_high - v_low))
+
+    def quantile(self, q: float) -> float:
+        """Approximate q-quantile (0 ≤ q ≤ 1); NaN when empty."""
+        if self.count == 0:
+            return float("nan")
+        return self._weighted_quantile(*self._weighted_items(), q)
+
+    def median_and_mad(self) -> tuple[float, float]:
+        """(median, median absolute deviation from the median)."""
+        if self.count == 0:
+            return float("nan"), float("nan")
+        values, weights = self._weighted_items()
+        median = self._weighted_quantile(values, weights, 0.5)
+        deviations = np.abs(values - median)
+        order = np.argsort(deviations, kind="stable")
+        return median, self._weighted_quantile(deviations[order], weights[order], 0.5)
@@ -0,0 +1,185 @@
+"""
+Content-Addressed Stage Cache
+─────────────────────────────
+On-disk cache for the outputs of the named pipeline stages
+(features, lof, ae, graph, combine, narrate).
+
+Keys
+────
+  sha256(stage name + input fingerprint + stage parameters + CACHE_VERSION)
+
+The input fingerprint is a hash of the *content* of the stage's input
+columns (``frame_fingerprint``), so re-analysing an unchanged report,
+re-uploading the same file or re-running a test produces the same key and
+the stage is skipped.
+
+Eviction
+────────
+Entries are pickles under ``<directory>/<stage>/<key>.pkl``.  A hit touches
+the file's mtime; whenever the total size exceeds ``max_bytes`` the least
+recently used files are deleted first.
+
+Bump ``CACHE_VERSION`` whenever a stage's maths changes, otherwise stale
+outputs computed by the old code keep being served.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import Counter
+from typing import Any
+
+import pandas as pd
+
+
+CACHE_VERSION = 7
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def frame_fingerprint(df: pd.DataFrame, columns: list[str] | None = None) -> str:
+    """Stable content hash of ``df[columns]`` (values, dtypes, names and order)."""
+    frame = df if columns is None else df[columns]
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(c), str(t)] for c, t in frame.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+class StageCache:
+    """Size-bounded LRU pickle cache, safe to share between threads."""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # ── keys & paths ──
+
+    @staticmethod
+    def key(stage: str, fingerprint: str, params: dict[str, Any] | None = None) -> str:
+        payload = json.dumps(
+            {"stage": stage, "input": fingerprint, "params": params or {}, "v": CACHE_VERSION},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, stage: str, key: str) -> str:
+        return os.path.join(self.directory, stage, f"{key}.pkl")
+
+    # ── lookup / store ──
+
+    def get(self, stage: str, key: str) -> tuple[bool, Any]:
+        """Return ``(True, value)`` on a hit, ``(False, None)`` on a miss."""
+        path = self._path(stage, key)
+        try:
+            with open(path, "rb") as fh:
+                value = pickle.load(fh)
+            os.utime(path)  # mark as recently used
+        except (OSError, pickle.UnpicklingError, EOFError):
+            with self._lock:
+                self.misses[stage] += 1
+            return False, None
+        with self._lock:
+            self.hits[stage] += 1
+        return True, value
+
+    def put(self, stage: str, key: str, value: Any) -> None:
+        stage_dir = os.path.join(self.directory, stage)
+        os.makedirs(stage_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=stage_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(stage, key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict()
+
+    # ── maintenance ──
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".pkl"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _mtime, size, _path in entries)
+            for _mtime, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def invalidate(self, stages: list[str] | None = None) -> int:
+        """Delete every entry of ``stages`` (all stages when None). Returns count removed."""
+        removed = 0
+        with self._lock:
+            for _mtime, _size, path in self._entries():
+                stage = os.path.basename(os.path.dirname(path))
+                if stages is not None and stage not in stages:
+                    continue
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def stats(self) -> dict[str, Any]:
+        entries = self._entries()
+        with self._lock:
+            return {
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+                "entries": len(entries),
+                "bytes": sum(size for _mtime, size, _path in entries),
+                "max_bytes": self.max_bytes,
+            }
+
+
+# ── process-wide default ─────────────────────────────────
+
+_default_cache: StageCache | None = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> StageCache | None:
+    """
+    The cache configured through ``AUDITHAWK_STAGE_CACHE_DIR`` (and
+    ``AUDITHAWK_STAGE_CACHE_MAX_MB``); None when caching is not enabled.
+    """
+    global _default_cache
+    directory = os.getenv("AUDITHAWK_STAGE_CACHE_DIR")
+    if not directory:
+        return None
+    with _default_lock:
+        if _default_cache is None or _default_cache.directory != directory:
+            max_mb = int(os.getenv("AUDITHAWK_STAGE_CACHE_MAX_MB", str(DEFAULT_MAX_BYTES // (1024 * 1024))))
+            _default_cache = StageCache(directory, max_bytes=max_mb * 1024 * 1024)
+        return _default_cache
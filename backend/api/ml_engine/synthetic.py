@@ -0,0 +1,174 @@
+"""
+Synthetic Ledger Generator
+──────────────────────────
+Builds ledgers of any size (10k … 10M rows) for benchmarks and detection
+quality checks, with the README threat patterns injected at known rows.
+
+Normal traffic
+──────────────
+  merchants  – Zipf-like popularity; each has its own log-normal amount
+               profile
+  accounts   – uniform
+  time       – weekdays, business hours (≈ 08:00–19:00)
+
+Injected threats (``THREAT_PATTERNS``)
+──────────────────────────────────────
+  micro_ato         – $9.99 at ~3 AM from an existing account
+  structuring_ring  – 5 accounts each paying an identical $2,499.00 to the
+                      same merchant within a few days
+  shell_company     – a brand-new merchant receiving one or two massive
+                      transfers from a single account
+  whale             – amounts far above the report's 99.9th percentile
+  smurfing          – 15–30 just-below-$1,000 payments from one account to
+                      one merchant inside 7 days
+
+The returned frame has the pipeline's input columns plus
+``injected_pattern`` ("" for normal rows); use ``to_records`` to drop it.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+THREAT_PATTERNS = ("micro_ato", "structuring_ring", "shell_company", "whale", "smurfing")
+
+DEFAULT_START = "2024-01-01"
+
+
+def generate_ledger(
+    n_rows: int,
+    n_merchants: int = 500,
+    n_accounts: int = 2000,
+    anomaly_rate: float = 0.002,
+    days: int = 90,
+    start: str = DEFAULT_START,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    ``n_rows`` transactions in total, about ``anomaly_rate`` of them
+    injected threats (spread evenly over ``THREAT_PATTERNS``), in date order.
+    """
+    rng = np.random.default_rng(seed)
+    n_threat_rows = max(len(THREAT_PATTERNS), int(n_rows * anomaly_rate))
+    per_pattern = max(1, n_threat_rows // len(THREAT_PATTERNS))
+
+    start_ts = pd.Timestamp(start)
+    merchants = np.array([f"Vendor {i:05d}" for i in range(n_merchants)])
+    accounts = np.array([f"ACC_{i:06d}" for i in range(n_accounts)])
+
+    threats = [
+        _micro_ato(rng, per_pattern, merchants, accounts, start_ts, days),
+        _structuring_ring(rng, per_pattern, merchants, accounts, start_ts, days),
+        _shell_company(rng, per_pattern, accounts, start_ts, days),
+        _whale(rng, per_pattern, merchants, accounts, start_ts, days),
+        _smurfing(rng, per_pattern, merchants, accounts, start_ts, days),
+    ]
+    injected = pd.concat(threats, ignore_index=True)
+    normal = _normal_traffic(rng, max(n_rows - len(injected), 0), merchants, accounts, start_ts, days)
+
+    ledger = pd.concat([normal, injected], ignore_index=True)
+    ledger = ledger.sort_values("date", kind="stable").reset_index(drop=True)
+    ledger.insert(0, "transaction_id", [f"T{i:08d}" for i in range(len(ledger))])
+    return ledger
+
+
+def to_records(ledger: pd.DataFrame) -> list[dict]:
+    """Pipeline input records (the label column removed)."""
+    return ledger.drop(columns=["injected_pattern"]).to_dict("records")
+
+
+def to_csv(ledger: pd.DataFrame) -> str:
+    """CSV text in the upload format, for parser benchmarks."""
+    frame = ledger.drop(columns=["injected_pattern"])
+    return frame.to_csv(index=False, date_format="%Y-%m-%d %H:%M:%S")
+
+
+# ── normal traffic ───────────────────────────────────────
+
+def _business_times(rng: np.random.Generator, n: int, start: pd.Timestamp, days: int) -> pd.DatetimeIndex:
+    day = rng.integers(0, days, n)
+    dates = start + pd.to_timedelta(day, unit="D")
+    weekend = dates.dayofweek >= 5
+    # move most weekend rows to the previous Friday
+    shift = np.where(weekend & (rng.random(n) < 0.9), dates.dayofweek - 4, 0)
+    minutes = np.clip(rng.normal(13.5 * 60, 150, n), 8 * 60, 19 * 60).astype(np.int64)
+    return dates - pd.to_timedelta(shift, unit="D") + pd.to_timedelta(minutes, unit="m")
+
+
+def _normal_traffic(rng, n, merchants, accounts, start, days) -> pd.DataFrame:
+    popularity = 1.0 / np.arange(1, len(merchants) + 1) ** 1.1
+    merchant_idx = rng.choice(len(merchants), size=n, p=popularity / popularity.sum())
+    mu = rng.uniform(3.0, 6.0, len(merchants))  # e^3 ≈ $20 … e^6 ≈ $400 typical ticket
+    amounts = np.round(rng.lognormal(mu[merchant_idx], 0.6), 2)
+    return pd.DataFrame({
+        "date": _business_times(rng, n, start, days),
+        "amount": amounts,
+        "merchant": merchants[merchant_idx],
+        "account_id": accounts[rng.integers(0, len(accounts), n)],
+        "injected_pattern": "",
+    })
+
+
+# ── threats ──────────────────────────────────────────────
+
+def _frame(dates, amounts, merchant, account, pattern) -> pd.DataFrame:
+    return pd.DataFrame({
+        "date": pd.DatetimeIndex(dates),
+        "amount": np.round(np.asarray(amounts, dtype=np.float64), 2),
+        "merchant": merchant,
+        "account_id": account,
+        "injected_pattern": pattern,
+    })
+
+
+def _micro_ato(rng, n, merchants, accounts, start, days) -> pd.DataFrame:
+    day = rng.integers(0, days, n)
+    minutes = rng.integers(2 * 60 + 30, 3 * 60 + 30, n)
+    dates = start + pd.to_timedelta(day, unit="D") + pd.to_timedelta(minutes, unit="m")
+    return _frame(dates, np.full(n, 9.99), merchants[rng.integers(0, len(merchants), n)],
+                  accounts[rng.integers(0, len(accounts), n)], "micro_ato")
+
+
+def _structuring_ring(rng, n, merchants, accounts, start, days) -> pd.DataFrame:
+    frames, left = [], n
+    while left > 0:
+        size = min(5, left)
+        base = start + pd.Timedelta(days=int(rng.integers(0, max(days - 3, 1))))
+        dates = base + pd.to_timedelta(rng.integers(0, 3 * 24 * 60, size), unit="m")
+        ring = rng.choice(len(accounts), size=size, replace=False)
+        frames.append(_frame(dates, np.full(size, 2499.00), merchants[rng.integers(0, len(merchants))],
+                             accounts[ring], "structuring_ring"))
+        left -= size
+    return pd.concat(frames, ignore_index=True)
+
+
+def _shell_company(rng, n, accounts, start, days) -> pd.DataFrame:
+    frames, left, shell_no = [], n, 0
+    while left > 0:
+        size = min(int(rng.integers(1, 3)), left)
+        dates = start + pd.to_timedelta(rng.integers(0, days * 24 * 60, size), unit="m")
+        frames.append(_frame(dates, rng.uniform(50_000, 250_000, size), f"Shell Holdings {shell_no:04d} LLC",
+                             accounts[rng.integers(0, len(accounts))], "shell_company"))
+        left -= size
+        shell_no += 1
+    return pd.concat(frames, ignore_index=True)
+
+
+def _whale(rng, n, merchants, accounts, start, days) -> pd.DataFrame:
+    dates = _business_times(rng, n, start, days)
+    return _frame(dates, rng.uniform(400_000, 2_000_000, n), merchants[rng.integers(0, 20, n)],
+                  accounts[rng.integers(0, len(accounts), n)], "whale")
+
+
+def _smurfing(rng, n, merchants, accounts, start, days) -> pd.DataFrame:
+    frames, left = [], n
+    while left > 0:
+        size = min(int(rng.integers(15, 31)), left)
+        base = start + pd.Timedelta(days=int(rng.integers(0, max(days - 7, 1))))
+        dates = base + pd.to_timedelta(np.sort(rng.integers(0, 7 * 24 * 60, size)), unit="m")
+        frames.append(_frame(dates, rng.uniform(900, 999.99, size), merchants[rng.integers(0, len(merchants))],
+                             accounts[rng.integers(0, len(accounts))], "smurfing"))
+        left -= size
+    return pd.concat(frames, ignore_index=True)
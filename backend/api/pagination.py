@@ -0,0 +1,136 @@
+"""
+Cursor Pagination
+─────────────────
+Relay-style pages (``first`` / ``after``, ``last`` / ``before``) over Mongo
+collections and over in-memory rows (bucketed reports).
+
+Pages are keyset-paginated: a cursor is the opaque (sort value, tiebreak)
+pair of the last row seen, and the next page is the rows strictly past it
+in (sort field, tiebreak) order – no ``skip``, so page 500 costs the same
+as page 1 and rows written between pages do not shift it.
+
+  Mongo      – tiebreak ``_id``; ``find(filter ∧ past cursor).sort().limit(n + 1)``
+  in-memory  – tiebreak the row's position (``_row``) in the report
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+
+DEFAULT_PAGE_SIZE = int(os.getenv("AUDITHAWK_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("AUDITHAWK_MAX_PAGE_SIZE", "1000"))
+
+
+class PaginationError(ValueError):
+    """Bad page arguments or a cursor that was not issued by this API."""
+
+
+@dataclass
+class Page:
+    items: list[dict]
+    cursors: list[str] = field(default_factory=list)
+    has_next: bool = False
+    has_previous: bool = False
+
+
+def encode_cursor(value: Any, tiebreak: Any) -> str:
+    raw = json.dumps([value, tiebreak], default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[Any, Any]:
+    try:
+        value, tiebreak = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise PaginationError(f"Invalid cursor '{cursor}'")
+    return value, tiebreak
+
+
+def page_window(first: int | None = None, after: str | None = None, last: int | None = None,
+                before: str | None = None) -> tuple[int, bool, str | None]:
+    """(page size, backwards?, cursor) from the Relay arguments."""
+    if first is not None and last is not None:
+        raise PaginationError("Pass either first or last, not both")
+    if (last is None and before is not None) or (last is not None and after is not None):
+        raise PaginationError("Use first with after, or last with before")
+    size = last if last is not None else first
+    if size is None:
+        size = DEFAULT_PAGE_SIZE
+    if size < 0:
+        raise PaginationError("first / last must not be negative")
+    backwards = last is not None
+    return min(size, MAX_PAGE_SIZE), backwards, (before if backwards else after)
+
+
+def _finish(items: list[dict], limit: int, backwards: bool, cursor: str | None,
+            sort_field: str | None, tiebreak: str) -> Page:
+    more = len(items) > limit
+    items = items[:limit]
+    if backwards:
+        items.reverse()
+    page = Page(
+        items=items,
+        cursors=[encode_cursor(item.get(sort_field) if sort_field else None, str(item[tiebreak])) for item in items],
+    )
+    if backwards:
+        page.has_previous, page.has_next = more, cursor is not None
+    else:
+        page.has_next, page.has_previous = more, cursor is not None
+    return page
+
+
+def paginate_collection(collection, query: dict, sort_field: str | None = None, descending: bool = False,
+                        first: int | None = None, after: str | None = None, last: int | None = None,
+                        before: str | None = None, projection: dict | None = None) -> Page:
+    """One page of ``collection.find(query)`` in (sort_field, _id) order."""
+    limit, backwards, cursor = page_window(first, after, last, before)
+    reverse = descending != backwards  # walking the order backwards flips it
+    op = "$lt" if reverse else "$gt"
+
+    if cursor is not None:
+        value, tiebreak = decode_cursor(cursor)
+        try:
+            oid = ObjectId(tiebreak)
+        except Exception:
+            raise PaginationError(f"Invalid cursor '{cursor}'")
+        past = (
+            {"$or": [{sort_field: {op: value}}, {sort_field: value, "_id": {op: oid}}]}
+            if sort_field else {"_id": {op: oid}}
+        )
+        query = {"$and": [query, past]}
+
+    direction = DESCENDING if reverse else ASCENDING
+    sort = ([(sort_field, direction)] if sort_field else []) + [("_id", direction)]
+    if projection is not None and sort_field:
+        projection = {**projection, sort_field: 1}
+    items = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+    return _finish(items, limit, backwards, cursor, sort_field, "_id")
+
+
+def paginate_rows(rows: list[dict], sort_field: str | None = None, descending: bool = False,
+                  first: int | None = None, after: str | None = None, last: int | None = None,
+                  before: str | None = None) -> Page:
+    """``paginate_collection`` over rows already in memory (tiebreak ``_row``)."""
+    limit, backwards, cursor = page_window(first, after, last, before)
+    reverse = descending != backwards
+
+    def key(row: dict) -> tuple:
+        return (row.get(sort_field) if sort_field else 0, row["_row"])
+
+    ordered = sorted(rows, key=key, reverse=reverse)
+    if cursor is not None:
+        value, tiebreak = decode_cursor(cursor)
+        try:
+            mark = (value if sort_field else 0, int(tiebreak))
+        except (TypeError, ValueError):
+            raise PaginationError(f"Invalid cursor '{cursor}'")
+        ordered = [row for row in ordered if (key(row) < mark if reverse else key(row) > mark)]
+    return _finish(ordered[:limit + 1], limit, backwards, cursor, sort_field, "_row")
@@ -0,0 +1,108 @@
+"""
+GraphQL Selection → Mongo Projection
+────────────────────────────────────
+List resolvers read and build only what the query selected:
+
+    fields = selected_fields(info)                    # {"transaction_id", "amount"}
+    docs = collection.find(query, mongo_projection(fields, TransactionType))
+    return [minimal_row(TransactionType, doc, fields) for doc in docs]
+
+``selected_fields`` follows fragment spreads and inline fragments and,
+with ``path=("edges", "node")``, looks inside a Relay connection.  Names
+are snake_case, like the ObjectType attributes (aliases do not matter).
+Stored fields have the same names as the ObjectType fields, except ``id``,
+which is read from ``_id``.
+
+Rows are plain dicts: graphene's default resolvers read them like the
+ObjectType, without building an instance per row.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Iterable
+
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import FragmentSpreadNode, InlineFragmentNode
+
+
+ID_FIELD = "id"
+
+
+def _flatten(info, selection_set) -> Iterable:
+    for selection in (selection_set.selections if selection_set else []):
+        if isinstance(selection, FragmentSpreadNode):
+            yield from _flatten(info, info.fragments[selection.name.value].selection_set)
+        elif isinstance(selection, InlineFragmentNode):
+            yield from _flatten(info, selection.selection_set)
+        else:
+            yield selection
+
+
+def selected_fields(info, path: Iterable[str] = ()) -> set[str]:
+    """Fields selected below the resolved field (and below ``path`` inside it)."""
+    path = tuple(path)
+
+    def _walk(selection_set, remaining: tuple[str, ...]) -> set[str]:
+        if not remaining:
+            return {
+                to_snake_case(field.name.value)
+                for field in _flatten(info, selection_set)
+                if not field.name.value.startswith("__")
+            }
+        found: set[str] = set()
+        for field in _flatten(info, selection_set):
+            if field.name.value == remaining[0]:
+                found |= _walk(field.selection_set, remaining[1:])
+        return found
+
+    fields: set[str] = set()
+    for field_node in info.field_nodes:
+        fields |= _walk(field_node.selection_set, path)
+    return fields
+
+
+def stored_fields(fields: Iterable[str], node_type) -> list[str]:
+    """The selected fields ``node_type`` reads from its document (``id`` aside)."""
+    known = node_type._meta.fields
+    return sorted(name for name in fields if name in known and name != ID_FIELD)
+
+
+def mongo_projection(fields: Iterable[str], node_type, extra: Iterable[str] = ()) -> dict[str, int]:
+    """Projection for ``fields`` of ``node_type`` (``_id`` always included) plus ``extra``."""
+    projection = {"_id": 1}
+    for name in [*stored_fields(fields, node_type), *extra]:
+        projection[name] = 1
+    return projection
+
+
+def minimal_row(node_type, doc: dict, fields: Iterable[str] | None = None,
+                defaults: dict[str, Any] | None = None,
+                convert: dict[str, Callable[[Any], Any]] | None = None) -> dict[str, Any]:
+    """
+    The values of ``fields`` (default: all) of ``node_type`` read from
+    ``doc``, as a plain dict the default resolvers read like the
+    ObjectType; a field missing from the document gets its ``defaults``.
+    """
+    known = node_type._meta.fields
+    defaults = defaults or {}
+    convert = convert or {}
+    values = {}
+    for name in (known if fields is None else fields):
+        if name not in known:
+            continue
+        if name == ID_FIELD:
+            value = doc.get("_id")
+            value = str(value) if value is not None else None
+        else:
+            value = doc.get(name, defaults.get(name))
+        if name in convert:
+            value = convert[name](value)
+        values[name] = value
+    return values
+
+
+def minimal_node(node_type, doc: dict, fields: Iterable[str] | None = None,
+                 defaults: dict[str, Any] | None = None,
+                 convert: dict[str, Callable[[Any], Any]] | None = None):
+    """``minimal_row`` as a ``node_type`` instance."""
+    return node_type(**minimal_row(node_type, doc, fields, defaults, convert))
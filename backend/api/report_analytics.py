@@ -0,0 +1,105 @@
+"""
+Report Analytics
+────────────────
+One compact document per report (``report_analytics``, _id = report id)
+holding what the dashboard charts, so it loads without fetching rows:
+
+  total_transactions, flagged_count, flagged_amount
+  risk_histogram   – flagged rows per risk-score bin (``RISK_HISTOGRAM_EDGES``)
+  signals          – flagged rows per narrator signal (``narrator.SIGNAL_RULES``)
+  top_merchants    – the ``ANALYTICS_TOP_N`` merchants / accounts with the
+  top_accounts       largest flagged amount
+  decisions        – {decision: {count, amount}}
+
+Built from the stored flags at the end of every analysis run (upload
+commit, re-analysis); ``decisions`` is then kept current by
+``update_anomaly_status`` (see api/db.py).
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+from collections import Counter, defaultdict
+from typing import Any, Iterable
+
+
+ANALYTICS_TOP_N = int(os.getenv("AUDITHAWK_ANALYTICS_TOP_N", "10"))
+
+# Lower bin edges; the last bin is open-ended
+RISK_HISTOGRAM_EDGES = [0.0, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0]
+
+# Row fields the merchant / account rankings read
+DETAIL_FIELDS = ("merchant", "account_id")
+
+
+def flag_details(rows: Iterable[dict], transaction_ids: Iterable[str]) -> dict[str, dict]:
+    """``DETAIL_FIELDS`` of the rows behind ``transaction_ids``, by transaction id."""
+    wanted = set(transaction_ids)
+    return {
+        row["transaction_id"]: {name: row.get(name) for name in DETAIL_FIELDS}
+        for row in rows
+        if row.get("transaction_id") in wanted
+    }
+
+
+def risk_histogram(scores: Iterable[float]) -> list[dict[str, Any]]:
+    counts = [0] * len(RISK_HISTOGRAM_EDGES)
+    for score in scores:
+        counts[max(bisect.bisect_right(RISK_HISTOGRAM_EDGES, score) - 1, 0)] += 1
+    uppers = [*RISK_HISTOGRAM_EDGES[1:], None]
+    return [
+        {"min_score": low, "max_score": high, "count": count}
+        for low, high, count in zip(RISK_HISTOGRAM_EDGES, uppers, counts)
+    ]
+
+
+def _top(amounts: dict[str, float], counts: Counter) -> list[dict[str, Any]]:
+    ranked = sorted(amounts, key=lambda name: (-amounts[name], name))[:ANALYTICS_TOP_N]
+    return [
+        {"name": name, "flagged_count": counts[name], "flagged_amount": round(amounts[name], 2)}
+        for name in ranked
+    ]
+
+
+def build_report_analytics(flags: list[dict], details: dict[str, dict],
+                           total_transactions: int) -> dict[str, Any]:
+    """
+    The analytics of a report from its flag documents (``transaction_id``,
+    ``amount``, ``risk_score``, ``decision``, ``signals``) and the
+    ``flag_details`` of their rows.
+    """
+    signals: Counter = Counter()
+    decisions: dict[str, dict[str, Any]] = defaultdict(lambda: {"count": 0, "amount": 0.0})
+    merchant_amounts: dict[str, float] = defaultdict(float)
+    account_amounts: dict[str, float] = defaultdict(float)
+    merchant_counts: Counter = Counter()
+    account_counts: Counter = Counter()
+    flagged_amount = 0.0
+
+    for flag in flags:
+        amount = float(flag.get("amount") or 0)
+        flagged_amount += amount
+        signals.update(flag.get("signals") or [])
+        decision = decisions[flag.get("decision") or "review_required"]
+        decision["count"] += 1
+        decision["amount"] += amount
+
+        detail = details.get(flag.get("transaction_id"), {})
+        if detail.get("merchant"):
+            merchant_amounts[detail["merchant"]] += amount
+            merchant_counts[detail["merchant"]] += 1
+        if detail.get("account_id"):
+            account_amounts[detail["account_id"]] += amount
+            account_counts[detail["account_id"]] += 1
+
+    return {
+        "total_transactions": int(total_transactions or 0),
+        "flagged_count": len(flags),
+        "flagged_amount": round(flagged_amount, 2),
+        "risk_histogram": risk_histogram(float(flag.get("risk_score") or 0) for flag in flags),
+        "signals": dict(signals),
+        "top_merchants": _top(merchant_amounts, merchant_counts),
+        "top_accounts": _top(account_amounts, account_counts),
+        "decisions": {name: {**value, "amount": round(value["amount"], 2)} for name, value in decisions.items()},
+    }
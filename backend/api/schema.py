@@ -1,34 +1,142 @@
 import graphene
 import jwt
+import logging
 import os
+import threading
+import time
 from django.conf import settings
 from django.contrib.auth import get_user_model, authenticate
 from django.utils import timezone
 from datetime import datetime, timedelta
-from pymongo import ReturnDocument, UpdateOne
 from .csv_parser import parse_transaction_csv, CSVParserError
+from .ml_engine.deadline import DEFAULT_DEADLINE_SECONDS, deadline_after
+from .ml_engine.profiling import PipelineProfiler
+from .pagination import Page, decode_cursor, page_window, paginate_collection, paginate_rows
+from .projection import minimal_row, mongo_projection, selected_fields, stored_fields
+from .report_analytics import build_report_analytics, flag_details
 
 from .db import (
-    audit_reports_col, transactions_col, transaction_batch_col, flagged_transactions_col,
+    audit_reports_col, transactions_col, flagged_transactions_col,
     users_col,
     get_trusted_vendors, add_trusted_vendor, remove_trusted_vendor,
+    save_report_scores, load_report_scores,
+    save_model_baseline, get_model_baseline, load_model_baseline_state,
+    discard_report_rows, report_rows_visible, save_transaction_batch, load_transaction_batch,
+    TRANSACTION_STORAGE, get_visible_report, save_transaction_buckets, load_transaction_buckets,
+    load_flag_overlay, insert_report, update_report, get_dashboard_summary,
+    load_report_flags, load_flag_details, save_report_analytics, get_report_analytics, set_flag_decision,
+    get_analysis_job, request_job_cancel, update_report_status, write_flag_diff,
 )
+from .jobs import LeaseLost, enqueue_upload, requeue_upload
+
+logger = logging.getLogger(__name__)
 
 JWT_SECRET = settings.SECRET_KEY
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
+# Row cap for scoreTransactions (micro-batches only; bigger files go through upload)
+MAX_SCORE_BATCH = 500
+
+
+def score_transactions(transactions, profiler=None, engine_state=None, profile=None,
+                       deadline=None, degraded=None):
+    """Features + LOF/AE/graph engines (the expensive, vendor-independent half)."""
+    from .ml_engine.ensemble import score_transactions as _score_transactions
+    return _score_transactions(
+        transactions, profiler=profiler, engine_state=engine_state, profile=profile,
+        deadline=deadline, degraded=degraded,
+    )
+
+
+def describe_degraded(degraded):
+    """["ae_score: stopped early after 12/50 epochs (deadline)", ...] for the API response."""
+    return [f"{signal}: {reason}" for signal, reason in sorted((degraded or {}).items())]
+
+
+def resolve_profile(profile):
+    """Validated engine profile name (the configured default when None)."""
+    from .ml_engine.ensemble import DEFAULT_PROFILE, PIPELINE_PROFILES
+    profile = (profile or DEFAULT_PROFILE).strip().lower()
+    if profile not in PIPELINE_PROFILES:
+        raise ValueError(f"Unknown profile '{profile}'. Expected one of: {', '.join(PIPELINE_PROFILES)}")
+    return profile
 
-def run_pipeline(transactions, report_id, trusted, amount_threshold=None):
-    from .ml_engine.ensemble import run_pipeline as _run_pipeline
-    return _run_pipeline(
-        transactions,
+
+def combine_scores(scored, report_id, trusted, amount_threshold=None, profiler=None):
+    """Trusted-vendor masking, risk index, robust z-score and explanations."""
+    from .ml_engine.ensemble import combine_scores as _combine_scores
+    return _combine_scores(
+        scored,
         report_id,
         trusted,
         amount_threshold=amount_threshold,
+        profiler=profiler,
     )
 
 
+def cache_report_scores(user_id, report_id, scored, profiler, session):
+    from .ml_engine.ensemble import scores_to_columns
+    with profiler.stage("mongo_write_score_cache", rows_in=len(scored)):
+        save_report_scores(user_id, report_id, scores_to_columns(scored), session=session)
+
+
+def load_cached_scores(user_id, report_id, expected_rows, profiler, session):
+    """Cached scored frame for a report, or None when missing/stale."""
+    from .ml_engine.ensemble import scores_from_columns
+    with profiler.stage("mongo_read_score_cache") as record:
+        scored = scores_from_columns(load_report_scores(user_id, report_id, session=session))
+        record["rows_out"] = 0 if scored is None else len(scored)
+    if scored is None or len(scored) != expected_rows:
+        return None
+    return scored
+
+
+def refresh_baseline(user_id, report_id, scored, engine_state, trusted):
+    """
+    Freeze the models just trained on ``report_id`` as the user's
+    micro-batch baseline.  A failure never fails the upload; it is
+    returned (None on success) for the job / response to report.
+    """
+    from .ml_engine.baseline import fit_baseline, to_bytes
+    try:
+        state = fit_baseline(scored, engine_state, trusted)
+        if state is not None:
+            save_model_baseline(user_id, report_id, to_bytes(state), state["fitted_at"])
+    except Exception as e:
+        logger.exception("Baseline refresh failed for report %s", report_id)
+        return f"Baseline not refreshed: {e}"
+    return None
+
+
+# user_id → (fitted_at, report_id, FrozenBaseline); rebuilt when the stored baseline changes
+_frozen_baselines = {}
+_frozen_baselines_lock = threading.Lock()
+
+
+def get_frozen_baseline(user_id):
+    """(report_id, FrozenBaseline) for the user, or (None, None) before their first upload."""
+    from .ml_engine.baseline import FrozenBaseline, from_bytes
+    cached = _frozen_baselines.get(user_id)
+    for _attempt in range(2):
+        doc = get_model_baseline(user_id, fitted_at=cached[0] if cached else None)
+        if doc is None:
+            return None, None
+        if cached and cached[0] == doc.get("fitted_at"):
+            return cached[1], cached[2]
+        payload = load_model_baseline_state(doc)
+        if payload is not None:
+            break
+        # replaced by a refresh between the two reads: read the new one
+    else:
+        raise RuntimeError("The baseline is being refreshed; try again")
+
+    baseline = FrozenBaseline(from_bytes(payload))
+    with _frozen_baselines_lock:
+        _frozen_baselines[user_id] = (doc["fitted_at"], doc["report_id"], baseline)
+    return doc["report_id"], baseline
+
+
 def get_current_user_id(info):
     request = info.context
     auth_header = ""
@@ -90,6 +198,9 @@ class AuditReportType(graphene.ObjectType):
     total_transactions = graphene.Int()
     flagged_count = graphene.Int()
     status = graphene.String()
+    pipeline_profile = graphene.JSONString()  # per-stage timings of the last run
+    profile = graphene.String()  # engine profile of the last run (fast / standard / deep)
+    degraded_signals = graphene.List(graphene.String)  # signals cut short by the deadline
 
 
 class FlaggedTransactionType(graphene.ObjectType):
@@ -105,6 +216,154 @@ class FlaggedTransactionType(graphene.ObjectType):
     is_salami = graphene.Boolean()
 
 
+class SortDirection(graphene.Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+
+class TransactionSortField(graphene.Enum):
+    TRANSACTION_ID = "transaction_id"
+    DATE = "date"
+    AMOUNT = "amount"
+    MERCHANT = "merchant"
+    RISK_SCORE = "risk_score"
+
+
+class FlaggedTransactionSortField(graphene.Enum):
+    TRANSACTION_ID = "transaction_id"
+    AMOUNT = "amount"
+    RISK_SCORE = "risk_score"
+
+
+class TransactionConnection(graphene.relay.Connection):
+    """A page of a report's transactions (see api/pagination.py)"""
+    class Meta:
+        node = TransactionType
+
+    total_count = graphene.Int()  # rows matching the filter, across all pages
+
+    def resolve_total_count(root, info):
+        return root.count_total()
+
+
+class FlaggedTransactionConnection(graphene.relay.Connection):
+    """A page of a report's flagged transactions"""
+    class Meta:
+        node = FlaggedTransactionType
+
+    total_count = graphene.Int()
+
+    def resolve_total_count(root, info):
+        return root.count_total()
+
+
+# Values of fields a stored document may lack
+TRANSACTION_DEFAULTS = {"flagged": False, "explanation": "", "risk_score": 0.0, "decision": "monitor"}
+FLAGGED_TRANSACTION_DEFAULTS = {"robust_z_score": 0.0, "is_salami": False}
+AUDIT_REPORT_DEFAULTS = {"profile": "standard"}
+AUDIT_REPORT_CONVERT = {
+    # 🚨 FIX: Convert native datetime back to string for UI compatibility
+    "uploaded_at": lambda value: value.isoformat() if isinstance(value, datetime) else (value or ""),
+    "degraded_signals": lambda value: describe_degraded(value),
+}
+
+# Flag fields bucketed rows take from the flagged_transactions overlay
+OVERLAY_FIELDS = {"flagged", "explanation", "risk_score", "decision"}
+
+
+# List resolvers return plain dict rows (see api/projection.py)
+def transaction_row(txn, fields=None):
+    return minimal_row(TransactionType, txn, fields, TRANSACTION_DEFAULTS)
+
+
+def flagged_transaction_row(txn, fields=None):
+    return minimal_row(FlaggedTransactionType, txn, fields, FLAGGED_TRANSACTION_DEFAULTS)
+
+
+def audit_report_row(report, fields=None):
+    return minimal_row(AuditReportType, report, fields, AUDIT_REPORT_DEFAULTS, AUDIT_REPORT_CONVERT)
+
+
+def bucketed_rows(user_id, report_id, fields, start=0, stop=None):
+    """
+    A bucketed report's rows with the ``fields`` of TransactionType that
+    were selected: only those columns are read, and the overlay only when
+    a flag field was selected.
+    """
+    columns = [name for name in stored_fields(fields, TransactionType) if name not in OVERLAY_FIELDS]
+    needs_overlay = bool(OVERLAY_FIELDS & set(fields))
+    if needs_overlay:
+        columns.append("transaction_id")
+    rows = load_transaction_buckets(user_id, report_id, start=start, stop=stop, columns=columns) or []
+    if needs_overlay:
+        apply_flag_overlay(rows, load_flag_overlay(user_id, report_id))
+    return rows
+
+
+def apply_flag_overlay(rows, overlay):
+    """Give bucketed rows their flag fields from the flagged_transactions overlay."""
+    for txn in rows:
+        flagged = overlay.get(txn.get("transaction_id", ""))
+        if flagged is None:
+            txn.update(flagged=False, explanation="", risk_score=0.0, decision="monitor")
+        else:
+            txn.update(
+                flagged=True,
+                explanation=flagged.get("explanation", ""),
+                risk_score=float(flagged.get("risk_score", 0) or 0),
+                decision=flagged.get("decision", "review_required"),
+            )
+    return rows
+
+
+def build_connection(connection_type, page, to_node, count_total):
+    connection = connection_type(
+        edges=[
+            connection_type.Edge(node=to_node(item), cursor=cursor)
+            for item, cursor in zip(page.items, page.cursors)
+        ],
+        page_info=graphene.relay.PageInfo(
+            has_next_page=page.has_next,
+            has_previous_page=page.has_previous,
+            start_cursor=page.cursors[0] if page.cursors else None,
+            end_cursor=page.cursors[-1] if page.cursors else None,
+        ),
+    )
+    connection.count_total = count_total  # only run when totalCount is selected
+    return connection
+
+
+def _sort_args(sort_by, sort_direction):
+    """(mongo field | None, descending) from the GraphQL enum arguments."""
+    sort_field = getattr(sort_by, "value", sort_by)
+    return sort_field, getattr(sort_direction, "value", sort_direction) == "desc"
+
+
+def bucketed_transactions_page(user_id, report, fields, sort_field, descending, flagged, page_args):
+    """
+    A page of a bucketed report.  In upload order only the buckets under
+    the page are read; sorting or filtering needs every row in memory first.
+    """
+    report_id = str(report["_id"])
+    if sort_field is None and flagged is None:
+        limit, backwards, cursor = page_window(**page_args)
+        position = int(decode_cursor(cursor)[1]) if cursor is not None else None
+        if backwards:
+            stop = position if position is not None else report.get("total_transactions", 0)
+            start = max(stop - limit - 1, 0)
+        else:
+            start = position + 1 if position is not None else 0
+            stop = start + limit + 1
+        rows = bucketed_rows(user_id, report_id, fields, start=start, stop=stop)
+        return paginate_rows(rows, **page_args), lambda: report.get("total_transactions", 0)
+
+    needed = set(fields) | {sort_field} | ({"flagged"} if flagged is not None else set())
+    rows = bucketed_rows(user_id, report_id, needed - {None})
+    if flagged is not None:
+        rows = [txn for txn in rows if txn["flagged"] == flagged]
+    return paginate_rows(rows, sort_field, descending, **page_args), lambda: len(rows)
+
+
 # ============================================
 # Mock Data (In-Memory Storage) - REPLACED WITH MONGODB
 # ============================================
@@ -120,6 +379,108 @@ class DashboardSummaryType(graphene.ObjectType):
     processing_count = graphene.Int()
     completed_count = graphene.Int()
 
+
+class RiskBucketType(graphene.ObjectType):
+    min_score = graphene.Float()
+    max_score = graphene.Float()  # null for the open-ended last bin
+    count = graphene.Int()
+
+
+class SignalCountType(graphene.ObjectType):
+    signal = graphene.String()
+    count = graphene.Int()
+
+
+class FlaggedAmountGroupType(graphene.ObjectType):
+    """A merchant or account ranked by its flagged amount"""
+    name = graphene.String()
+    flagged_count = graphene.Int()
+    flagged_amount = graphene.Float()
+
+
+class DecisionCountType(graphene.ObjectType):
+    decision = graphene.String()
+    count = graphene.Int()
+    amount = graphene.Float()
+
+
+class ReportAnalyticsType(graphene.ObjectType):
+    """Precomputed dashboard metrics of one report (see api/report_analytics.py)"""
+    report_id = graphene.ID()
+    total_transactions = graphene.Int()
+    flagged_count = graphene.Int()
+    flagged_amount = graphene.Float()
+    risk_histogram = graphene.List(RiskBucketType)
+    signals = graphene.List(SignalCountType)
+    top_merchants = graphene.List(FlaggedAmountGroupType)
+    top_accounts = graphene.List(FlaggedAmountGroupType)
+    decisions = graphene.List(DecisionCountType)
+    updated_at = graphene.String()
+
+
+def report_analytics_type(analytics: dict) -> ReportAnalyticsType:
+    updated_at = analytics.get("updated_at")
+    return ReportAnalyticsType(
+        report_id=analytics["report_id"],
+        total_transactions=analytics.get("total_transactions", 0),
+        flagged_count=analytics.get("flagged_count", 0),
+        flagged_amount=analytics.get("flagged_amount", 0.0),
+        risk_histogram=analytics.get("risk_histogram", []),
+        signals=[
+            {"signal": signal, "count": count}
+            for signal, count in sorted(analytics.get("signals", {}).items(), key=lambda item: (-item[1], item[0]))
+        ],
+        top_merchants=analytics.get("top_merchants", []),
+        top_accounts=analytics.get("top_accounts", []),
+        # decision changes move flags between the counts with $inc: drop emptied ones
+        decisions=[
+            {"decision": decision, "count": value["count"], "amount": round(value["amount"], 2)}
+            for decision, value in sorted(analytics.get("decisions", {}).items())
+            if value.get("count", 0) > 0
+        ],
+        updated_at=updated_at.isoformat() if isinstance(updated_at, datetime) else updated_at,
+    )
+
+
+class JobStatusType(graphene.ObjectType):
+    """Background analysis of one report (see api/jobs.py)"""
+    report_id = graphene.ID()
+    status = graphene.String()  # queued | running | completed | failed | cancelled
+    stage = graphene.String()  # stage currently running
+    stages_done = graphene.Int()
+    stages_total = graphene.Int()
+    progress = graphene.Float()  # 0 … 1
+    cancel_requested = graphene.Boolean()
+    error = graphene.String()
+    flagged_count = graphene.Int()
+    degraded_signals = graphene.List(graphene.String)
+    baseline_error = graphene.String()  # set when the micro-batch baseline could not be refreshed
+    created_at = graphene.String()
+    started_at = graphene.String()
+    finished_at = graphene.String()
+
+
+def job_status_type(job):
+    def _iso(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+
+    return JobStatusType(
+        report_id=job["_id"],
+        status=job.get("status"),
+        stage=job.get("stage"),
+        stages_done=job.get("stages_done", 0),
+        stages_total=job.get("stages_total", 0),
+        progress=job.get("progress", 0.0),
+        cancel_requested=job.get("cancel_requested", False),
+        error=job.get("error"),
+        flagged_count=job.get("flagged_count"),
+        degraded_signals=job.get("degraded_signals") or [],
+        baseline_error=job.get("baseline_error"),
+        created_at=_iso(job.get("created_at")),
+        started_at=_iso(job.get("started_at")),
+        finished_at=_iso(job.get("finished_at")),
+    )
+
 # ============================================
 # Query Resolvers
 # ============================================
@@ -138,71 +499,113 @@ class Query(graphene.ObjectType):
         FlaggedTransactionType,
         report_id=graphene.ID(required=True)
     )
+    # cursor-paginated, sortable and filterable versions of the two lists
+    transactions_connection = graphene.relay.ConnectionField(
+        TransactionConnection,
+        report_id=graphene.ID(required=True),
+        sort_by=TransactionSortField(),
+        sort_direction=SortDirection(),
+        flagged=graphene.Boolean(),
+    )
+    flagged_transactions_connection = graphene.relay.ConnectionField(
+        FlaggedTransactionConnection,
+        report_id=graphene.ID(required=True),
+        sort_by=FlaggedTransactionSortField(),
+        sort_direction=SortDirection(),
+        decision=graphene.String(),
+    )
     dashboard_summary = graphene.Field(DashboardSummaryType)
+    report_analytics = graphene.Field(ReportAnalyticsType, report_id=graphene.ID(required=True))
     trusted_vendors = graphene.List(graphene.String)
+    job_status = graphene.Field(JobStatusType, report_id=graphene.ID(required=True))
 
     def resolve_audit_reports(root, info):
         user_id = get_current_user_id(info)
         if not user_id:
             return []
 
-        reports = audit_reports_col.find({"user_id": user_id})
-        return [
-            AuditReportType(
-                id=str(r["_id"]),
-                file_name=r["file_name"],
-                # 🚨 FIX: Convert native datetime back to string for UI compatibility
-                uploaded_at=r["uploaded_at"].isoformat() if isinstance(r.get("uploaded_at"), datetime) else r.get("uploaded_at", ""),
-                total_transactions=r["total_transactions"],
-                flagged_count=r["flagged_count"],
-                status=r["status"]
-            )
-            for r in reports
-        ]
+        fields = selected_fields(info)
+        reports = audit_reports_col.find({"user_id": user_id}, mongo_projection(fields, AuditReportType))
+        return [audit_report_row(r, fields) for r in reports]
 
     def resolve_transactions(root, info, report_id):
         user_id = get_current_user_id(info)
         if not user_id:
             return []
+        # rows of a report still being committed are not shown half-written
+        report = get_visible_report(user_id, report_id)
+        if report is None:
+            return []
 
-        transactions = transactions_col.find({"report_id": report_id, "user_id": user_id})
-        return [
-            TransactionType(
-                id=str(txn["_id"]),
-                transaction_id=txn["transaction_id"],
-                date=txn["date"],
-                amount=txn["amount"],
-                merchant=txn["merchant"],
-                category=txn["category"],
-                account_id=txn["account_id"],
-                flagged=txn.get("flagged", False),
-                explanation=txn.get("explanation", ""),
-                risk_score=txn.get("risk_score", 0.0),
-                decision=txn.get("decision", "monitor"),
+        fields = selected_fields(info)
+        if report.get("storage") == "buckets":
+            # flag / decision state comes from the flagged_transactions overlay
+            transactions = bucketed_rows(user_id, report_id, fields)
+        else:
+            transactions = transactions_col.find(
+                {"report_id": report_id, "user_id": user_id}, mongo_projection(fields, TransactionType),
             )
-            for txn in transactions
-        ]
+        return [transaction_row(txn, fields) for txn in transactions]
 
     def resolve_flagged_transactions(root, info, report_id):
         user_id = get_current_user_id(info)
         if not user_id:
             return []
+        # rows of a report still being committed are not shown half-written
+        if not report_rows_visible(user_id, report_id):
+            return []
+
+        fields = selected_fields(info)
+        transactions = flagged_transactions_col.find(
+            {"report_id": report_id, "user_id": user_id}, mongo_projection(fields, FlaggedTransactionType),
+        )
+        return [flagged_transaction_row(txn, fields) for txn in transactions]
 
-        transactions = flagged_transactions_col.find({"report_id": report_id, "user_id": user_id})
-        return [
-            FlaggedTransactionType(
-                id=str(txn["_id"]),
-                transaction_id=txn["transaction_id"],
-                amount=txn["amount"],
-                risk_score=txn["risk_score"],
-                decision=txn["decision"],
-                explanation=txn["explanation"],
-                # 🚨 ADD THESE TWO LINES:
-                robust_z_score=txn.get("robust_z_score", 0.0),
-                is_salami=txn.get("is_salami", False)
+    def resolve_transactions_connection(root, info, report_id, sort_by=None, sort_direction=None,
+                                        flagged=None, **page_args):
+        user_id = get_current_user_id(info)
+        report = get_visible_report(user_id, report_id) if user_id else None
+        if report is None:
+            return build_connection(TransactionConnection, Page(items=[]), transaction_row, lambda: 0)
+
+        sort_field, descending = _sort_args(sort_by, sort_direction)
+        fields = selected_fields(info, ("edges", "node"))
+        if report.get("storage") == "buckets":
+            page, count_total = bucketed_transactions_page(
+                user_id, report, fields, sort_field, descending, flagged, page_args,
             )
-            for txn in transactions
-        ]
+        else:
+            query = {"report_id": report_id, "user_id": user_id}
+            if flagged is not None:
+                query["flagged"] = flagged
+            page = paginate_collection(
+                transactions_col, query, sort_field, descending,
+                projection=mongo_projection(fields, TransactionType), **page_args,
+            )
+            count_total = lambda: transactions_col.count_documents(query)
+        return build_connection(
+            TransactionConnection, page, lambda txn: transaction_row(txn, fields), count_total,
+        )
+
+    def resolve_flagged_transactions_connection(root, info, report_id, sort_by=None, sort_direction=None,
+                                                decision=None, **page_args):
+        user_id = get_current_user_id(info)
+        if not user_id or not report_rows_visible(user_id, report_id):
+            return build_connection(FlaggedTransactionConnection, Page(items=[]), flagged_transaction_row, lambda: 0)
+
+        sort_field, descending = _sort_args(sort_by, sort_direction)
+        fields = selected_fields(info, ("edges", "node"))
+        query = {"report_id": report_id, "user_id": user_id}
+        if decision:
+            query["decision"] = decision
+        page = paginate_collection(
+            flagged_transactions_col, query, sort_field, descending,
+            projection=mongo_projection(fields, FlaggedTransactionType), **page_args,
+        )
+        return build_connection(
+            FlaggedTransactionConnection, page, lambda txn: flagged_transaction_row(txn, fields),
+            lambda: flagged_transactions_col.count_documents(query),
+        )
 
     def resolve_dashboard_summary(root, info):
         user_id = get_current_user_id(info)
@@ -215,22 +618,38 @@ class Query(graphene.ObjectType):
                 completed_count=0,
             )
 
-        reports = list(audit_reports_col.find({"user_id": user_id}))
-        
-        total_reports = len(reports)
-        total_transactions = sum(report.get("total_transactions", 0) for report in reports)
-        total_flagged = sum(report.get("flagged_count", 0) for report in reports)
-        processing_count = sum(1 for report in reports if report.get("status") == "processing")
-        completed_count = sum(1 for report in reports if report.get("status") == "completed")
+        # one document, kept current as reports change (see db.py)
+        summary = get_dashboard_summary(user_id)
+        status_counts = summary.get("status_counts", {})
 
         return DashboardSummaryType(
-            total_reports=total_reports,
-            total_transactions=total_transactions,
-            total_flagged=total_flagged,
-            processing_count=processing_count,
-            completed_count=completed_count
+            total_reports=summary.get("total_reports", 0),
+            total_transactions=summary.get("total_transactions", 0),
+            total_flagged=summary.get("total_flagged", 0),
+            processing_count=sum(status_counts.get(status, 0) for status in ("queued", "processing")),
+            completed_count=status_counts.get("completed", 0),
         )
 
+    def resolve_report_analytics(root, info, report_id):
+        user_id = get_current_user_id(info)
+        if not user_id:
+            return None
+        report = get_visible_report(user_id, report_id)
+        if report is None:
+            return None
+
+        analytics = get_report_analytics(user_id, report_id)
+        if analytics is None:
+            # reports analysed before analytics were written: build them once
+            flags = load_report_flags(user_id, report_id)
+            details = load_flag_details(
+                user_id, report_id, [flag["transaction_id"] for flag in flags], report.get("storage") == "buckets",
+            )
+            analytics = build_report_analytics(flags, details, report.get("total_transactions"))
+            save_report_analytics(user_id, report_id, analytics)
+            analytics = {**analytics, "report_id": report_id}
+        return report_analytics_type(analytics)
+
     def resolve_trusted_vendors(root, info):
         user_id = get_current_user_id(info)
         if not user_id:
@@ -238,6 +657,14 @@ class Query(graphene.ObjectType):
 
         return get_trusted_vendors(user_id)
 
+    def resolve_job_status(root, info, report_id):
+        user_id = get_current_user_id(info)
+        if not user_id:
+            return None
+
+        job = get_analysis_job(user_id, report_id)
+        return job_status_type(job) if job else None
+
 
 # ============================================
 # Mutation Types
@@ -247,23 +674,195 @@ class UploadAuditFileResponse(graphene.ObjectType):
     success = graphene.Boolean()
     message = graphene.String()
     report = graphene.Field(AuditReportType)
+    job = graphene.Field(JobStatusType)
+
+
+def analyze_upload(progress, profiler, user_id, report_id, file_name, transactions, uploaded_at_dt,
+                   effective_threshold, profile, storage="documents", deadline=None):
+    """
+    Background half of an upload, run as a queued job (see ``jobs.py``)
+    with ``progress`` as the profiler's stage listener.  Returns the fields
+    stored on the finished job.
+
+    ``deadline`` is the job's own budget (``JOB_DEADLINE_SECONDS``), not
+    the request-time one: no HTTP client is waiting on a background job.
+
+    Compute – features, engines, combine and narrate – runs with no Mongo
+    session open.  The commit (``commit_upload``) then writes the finished
+    documents; the report's status is what makes them visible at once.
+    """
+    from bson import ObjectId
+
+    # Fence: only the worker recorded here may commit this report's results
+    update_report(
+        {"_id": ObjectId(report_id), "user_id": user_id},
+        {"status": "processing", "analysis_owner": progress.worker_id},
+    )
+
+    trusted = get_trusted_vendors(user_id)
+    prepared_transactions = []
+    for txn in transactions:
+        prepared_transactions.append(
+            {
+                **txn,
+                "report_id": report_id,
+                "user_id": user_id,
+                "uploaded_at": uploaded_at_dt, # 🚨 NEW: Stamp the row so it can self-destruct
+                "flagged": False,
+                "explanation": "",
+                "risk_score": 0.0,
+                "decision": "monitor",
+            }
+        )
+
+    engine_state = {}
+    degraded = {}
+    scored = score_transactions(
+        prepared_transactions, profiler=profiler, engine_state=engine_state, profile=profile,
+        deadline=deadline, degraded=degraded,
+    )
+    flagged_docs = combine_scores(
+        scored,
+        report_id,
+        trusted,
+        amount_threshold=effective_threshold,
+        profiler=profiler,
+    )
+
+    # Rows are written once, already carrying their flag
+    flags_by_id = {flagged.get("transaction_id", ""): flagged for flagged in flagged_docs}
+    for txn in prepared_transactions:
+        flagged = flags_by_id.get(txn.get("transaction_id", ""))
+        if flagged is not None:
+            txn.update(
+                flagged=True,
+                explanation=flagged.get("explanation", ""),
+                risk_score=float(flagged.get("risk_score", 0) or 0),
+                decision=flagged.get("decision", "review_required"),
+            )
+    for flagged in flagged_docs:
+        flagged["user_id"] = user_id
+
+    commit_upload(
+        progress, profiler, user_id, report_id, file_name, uploaded_at_dt,
+        prepared_transactions, scored, flagged_docs, degraded, storage,
+    )
+
+    # a model cut short by the deadline is not worth freezing
+    baseline_error = None
+    if not degraded:
+        baseline_error = refresh_baseline(user_id, report_id, scored, engine_state, trusted)
+    return {
+        "flagged_count": len(flagged_docs),
+        "degraded_signals": describe_degraded(degraded),
+        "baseline_error": baseline_error,
+    }
+
+
+# Attempts at the (idempotent) commit on Mongo errors before the job fails
+COMMIT_ATTEMPTS = 3
+
+
+def commit_upload(progress, profiler, user_id, report_id, file_name, uploaded_at_dt,
+                  prepared_transactions, scored, flagged_docs, degraded, storage="documents"):
+    """
+    Write an analysed upload.  The report goes ``processing`` →
+    ``committing`` → ``completed``; rows of a report that is not completed
+    are hidden from readers, and every attempt starts by discarding what
+    an earlier, interrupted one left behind – so the commit can simply be
+    retried, without re-running the ML.  Both status changes are fenced by
+    ``analysis_owner``.
+
+    With ``storage="buckets"`` the rows go to ``transaction_buckets`` and
+    their flags only to ``flagged_transactions``; the buckets are also the
+    re-analysis snapshot, so no separate batch is written.
+    """
+    from bson import ObjectId
+    from pymongo.errors import PyMongoError
+
+    report_filter = {"_id": ObjectId(report_id), "analysis_owner": progress.worker_id}
+    checkpoint = profiler.checkpoint()
+
+    for attempt in range(1, COMMIT_ATTEMPTS + 1):
+        profiler.rollback(checkpoint)
+        try:
+            with profiler.stage("mongo_commit_begin"):
+                if update_report(report_filter, {"status": "committing"}) is None:
+                    raise LeaseLost(f"Report {report_id} is being analysed by another worker")
+                discard_report_rows(user_id, report_id)
+
+            with profiler.stage("mongo_insert_transactions", rows_in=len(prepared_transactions)) as record:
+                if storage == "buckets":
+                    record["buckets"] = save_transaction_buckets(
+                        user_id, report_id, uploaded_at_dt, prepared_transactions,
+                    )
+                elif prepared_transactions:
+                    transactions_col.insert_many(
+                        [{k: v for k, v in txn.items() if k != "_id"} for txn in prepared_transactions],
+                    )
+
+            with profiler.stage("mongo_insert_batch", rows_in=len(prepared_transactions)) as record:
+                if storage == "buckets":
+                    record["segments"] = 0
+                else:
+                    record["segments"] = save_transaction_batch(
+                        user_id, report_id, file_name, uploaded_at_dt, prepared_transactions,
+                    )
+
+            cache_report_scores(user_id, report_id, scored, profiler, None)
+
+            with profiler.stage("mongo_write_flags", rows_in=len(flagged_docs)):
+                if flagged_docs:
+                    flagged_transactions_col.insert_many(
+                        [{k: v for k, v in doc.items() if k != "_id"} for doc in flagged_docs],
+                    )
+
+            with profiler.stage("mongo_write_analytics", rows_in=len(flagged_docs)):
+                details = flag_details(prepared_transactions, [doc["transaction_id"] for doc in flagged_docs])
+                save_report_analytics(
+                    user_id, report_id, build_report_analytics(flagged_docs, details, len(prepared_transactions)),
+                )
+
+            committed = update_report(
+                report_filter,
+                {
+                    "flagged_count": len(flagged_docs),
+                    "status": "completed",
+                    "pipeline_profile": profiler.to_dict(),
+                    "degraded_signals": dict(degraded),
+                },
+            )
+            if committed is None:
+                raise LeaseLost(f"Report {report_id} is being analysed by another worker")
+            return
+        except PyMongoError:
+            if attempt == COMMIT_ATTEMPTS:
+                raise
+            logger.warning("Commit of report %s failed (attempt %s/%s)", report_id, attempt, COMMIT_ATTEMPTS,
+                           exc_info=True)
+            time.sleep(attempt)
 
 
 class UploadAuditFile(graphene.Mutation):
     """
     Upload and parse a CSV file containing financial transactions.
     This is the ONLY way to upload data - no REST endpoints are used.
+
+    The CSV is parsed and the report created right away; the analysis runs
+    as a background job.  Poll ``jobStatus(reportId)`` for its progress.
     """
     class Arguments:
         file_name = graphene.String(required=True)
         csv_content = graphene.String(required=True)
         threshold_limit = graphene.Float(required=False)
+        profile = graphene.String(required=False)  # fast | standard | deep
 
     Output = UploadAuditFileResponse
 
-    def mutate(root, info, file_name, csv_content, threshold_limit=None):
+    def mutate(root, info, file_name, csv_content, threshold_limit=None, profile=None):
         """
-        Parse CSV content, validate it, and create an audit report.
+        Parse CSV content, validate it, create an audit report and queue
+        its analysis.
         """
         user_id = get_current_user_id(info)
         if not user_id:
@@ -278,126 +877,58 @@ class UploadAuditFile(graphene.Mutation):
             effective_threshold = float(threshold_limit)
 
         try:
-            # Parse and validate CSV content using csv_parser
-            transactions, summary = parse_transaction_csv(csv_content)
-            mongo_client = audit_reports_col.database.client
-            response_payload = {}
-
-            def _upload_transaction(session):
-                trusted = get_trusted_vendors(user_id)
-                
-                # 🚨 FIX: Create native datetime for Mongo, string for GraphQL
-                uploaded_at_dt = datetime.utcnow()
-                uploaded_at_str = uploaded_at_dt.isoformat()
-
-                new_report = {
-                    "file_name": file_name,
-                    "uploaded_at": uploaded_at_dt, # Native Datetime
-                    "total_transactions": summary['total_transactions'],
-                    "flagged_count": 0,
-                    "status": "processing",
-                    "user_id": user_id,
-                    "threshold_limit": effective_threshold,
-                }
-
-                result = audit_reports_col.insert_one(new_report, session=session)
-                report_id = str(result.inserted_id)
-
-                prepared_transactions = []
-                for txn in transactions:
-                    prepared_transactions.append(
-                        {
-                            **txn,
-                            "report_id": report_id,
-                            "user_id": user_id,
-                            "uploaded_at": uploaded_at_dt, # 🚨 NEW: Stamp the row so it can self-destruct
-                            "flagged": False,
-                            "explanation": "",
-                            "risk_score": 0.0,
-                            "decision": "monitor",
-                        }
-                    )
+            profile = resolve_profile(profile)
+        except ValueError as e:
+            return UploadAuditFileResponse(success=False, message=str(e), report=None)
 
-                if prepared_transactions:
-                    transactions_col.insert_many(prepared_transactions, session=session)
-
-                transaction_batch_col.insert_one(
-                    {
-                        "report_id": report_id,
-                        "user_id": user_id,
-                        "file_name": file_name,
-                        "uploaded_at": uploaded_at_dt, # Native Datetime required for TTL!
-                        "total_transactions": len(prepared_transactions),
-                        "transactions": prepared_transactions,
-                    },
-                    session=session,
-                )
-
-                flagged_docs = run_pipeline(
-                    prepared_transactions,
-                    report_id,
-                    trusted,
-                    amount_threshold=effective_threshold,
-                )
-
-                if flagged_docs:
-                    for flagged in flagged_docs:
-                        flagged["user_id"] = user_id
-                    flagged_transactions_col.insert_many(flagged_docs, session=session)
-
-                    txn_updates = [
-                        UpdateOne(
-                            {
-                                "report_id": report_id,
-                                "transaction_id": flagged.get("transaction_id", ""),
-                                "user_id": user_id,
-                            },
-                            {
-                                "$set": {
-                                    "flagged": True,
-                                    "explanation": flagged.get("explanation", ""),
-                                    "risk_score": float(flagged.get("risk_score", 0) or 0),
-                                    "decision": flagged.get("decision", "review_required"),
-                                }
-                            },
-                        )
-                        for flagged in flagged_docs
-                    ]
-                    if txn_updates:
-                        transactions_col.bulk_write(txn_updates, ordered=False, session=session)
-
-                flagged_count = len(flagged_docs)
-                audit_reports_col.update_one(
-                    {"_id": result.inserted_id},
-                    {"$set": {"flagged_count": flagged_count, "status": "completed"}},
-                    session=session,
-                )
-
-                response_payload.update(
-                    {
-                        "id": report_id,
-                        "file_name": file_name,
-                        "uploaded_at": uploaded_at_str, # String for the frontend
-                        "total_transactions": summary['total_transactions'],
-                        "flagged_count": flagged_count,
-                        "status": "completed",
-                    }
-                )
-
-            with mongo_client.start_session() as session:
-                session.with_transaction(_upload_transaction)
+        try:
+            # Parse and validate CSV content using csv_parser (again in the
+            # job; here only so a bad file is rejected right away)
+            _transactions, summary = parse_transaction_csv(csv_content)
+
+            # 🚨 FIX: Create native datetime for Mongo, string for GraphQL
+            uploaded_at_dt = datetime.utcnow()
+            uploaded_at_str = uploaded_at_dt.isoformat()
+
+            new_report = {
+                "file_name": file_name,
+                "uploaded_at": uploaded_at_dt, # Native Datetime
+                "total_transactions": summary['total_transactions'],
+                "flagged_count": 0,
+                "status": "queued",
+                "user_id": user_id,
+                "threshold_limit": effective_threshold,
+                "profile": profile,
+                "storage": TRANSACTION_STORAGE,
+            }
+
+            report_id = insert_report(new_report)
+
+            job = enqueue_upload(user_id, report_id, csv_content, {
+                "file_name": file_name,
+                "uploaded_at": uploaded_at_dt,
+                "threshold_limit": effective_threshold,
+                "profile": profile,
+                "storage": TRANSACTION_STORAGE,
+            })
 
             return UploadAuditFileResponse(
                 success=True,
-                message=f"Successfully uploaded and analyzed {summary['total_transactions']} transactions ({response_payload['flagged_count']} flagged)",
+                message=(
+                    f"Uploaded {summary['total_transactions']} transactions; "
+                    f"analysis queued (poll jobStatus for progress)"
+                ),
                 report=AuditReportType(
-                    id=response_payload["id"],
-                    file_name=response_payload["file_name"],
-                    uploaded_at=response_payload["uploaded_at"],
-                    total_transactions=response_payload["total_transactions"],
-                    flagged_count=response_payload["flagged_count"],
-                    status=response_payload["status"]
-                )
+                    id=report_id,
+                    file_name=file_name,
+                    uploaded_at=uploaded_at_str, # String for the frontend
+                    total_transactions=summary['total_transactions'],
+                    flagged_count=0,
+                    status="queued",
+                    profile=profile,
+                    degraded_signals=[],
+                ),
+                job=job_status_type(job),
             )
             
         except CSVParserError as e:
@@ -414,6 +945,48 @@ class UploadAuditFile(graphene.Mutation):
             )
 
 
+class CancelAnalysisResponse(graphene.ObjectType):
+    success = graphene.Boolean()
+    message = graphene.String()
+    job = graphene.Field(JobStatusType)
+
+
+class CancelAnalysis(graphene.Mutation):
+    """
+    Stop an analysis by setting its job's ``cancel_requested``.  A queued
+    job is cancelled at once.  A running one reads the flag at its next
+    stage boundary and stops; the worker then releases the job as
+    "cancelled", discards any rows a commit in progress had written and
+    marks the report "cancelled".  The commit's report updates are fenced
+    by ``analysis_owner``, so a run that has lost its lease cannot commit
+    over the cancellation.
+    """
+    class Arguments:
+        report_id = graphene.ID(required=True)
+
+    Output = CancelAnalysisResponse
+
+    def mutate(root, info, report_id):
+        user_id = get_current_user_id(info)
+        if not user_id:
+            return CancelAnalysisResponse(success=False, message="Authentication required", job=None)
+
+        job, changed = request_job_cancel(user_id, report_id)
+        if job is None:
+            return CancelAnalysisResponse(success=False, message="No analysis job for this report", job=None)
+        if not changed:
+            return CancelAnalysisResponse(
+                success=False, message=f"Analysis already {job['status']}", job=job_status_type(job),
+            )
+        if job["status"] == "cancelled":
+            # it never started: no worker will release it, so close the report here
+            update_report_status(user_id, report_id, "cancelled")
+            return CancelAnalysisResponse(success=True, message="Analysis cancelled", job=job_status_type(job))
+        return CancelAnalysisResponse(
+            success=True, message="Cancellation requested", job=job_status_type(job),
+        )
+
+
 class UpdateTransactionDecisionResponse(graphene.ObjectType):
     success = graphene.Boolean()
     message = graphene.String()
@@ -449,11 +1022,7 @@ class UpdateTransactionDecision(graphene.Mutation):
             )
         
         # Find and update the flagged transaction in MongoDB
-        result = flagged_transactions_col.find_one_and_update(
-            {"report_id": report_id, "transaction_id": transaction_id, "user_id": user_id},
-            {"$set": {"decision": decision}},
-            return_document=ReturnDocument.AFTER
-        )
+        result = set_flag_decision(user_id, report_id, transaction_id, decision)
         
         if not result:
             return UpdateTransactionDecisionResponse(
@@ -566,16 +1135,65 @@ class AnalyzeReportResponse(graphene.ObjectType):
     success = graphene.Boolean()
     message = graphene.String()
     flagged_count = graphene.Int()
+    used_cached_scores = graphene.Boolean()
+    degraded_signals = graphene.List(graphene.String)
+    job = graphene.Field(JobStatusType)  # set when the analysis was queued instead
+
+
+# Reports whose upload analysis ended without results; AnalyzeReport runs it again
+RERUNNABLE_STATUSES = ("failed", "cancelled")
+
+
+def requeue_report(user_id, report, profile):
+    """Queue a failed / cancelled report's upload analysis again."""
+    report_id, status = str(report["_id"]), report["status"]
+    # the report moves first, so the worker's "processing" cannot be overwritten
+    if update_report(
+        {"_id": report["_id"], "user_id": user_id, "status": status}, {"status": "queued", "profile": profile},
+    ) is None:
+        return AnalyzeReportResponse(success=False, message="Report changed meanwhile; try again", flagged_count=0)
+
+    job = requeue_upload(user_id, report_id, {"profile": profile})
+    if job is None:
+        update_report(
+            {"_id": report["_id"], "user_id": user_id, "status": "queued"},
+            {"status": status, "profile": report.get("profile")},
+        )
+        return AnalyzeReportResponse(
+            success=False, message="The uploaded file is no longer stored; upload it again", flagged_count=0,
+        )
+    return AnalyzeReportResponse(
+        success=True,
+        message="Analysis queued (poll jobStatus for progress)",
+        flagged_count=0,
+        used_cached_scores=False,
+        job=job_status_type(job),
+    )
 
 
 class AnalyzeReport(graphene.Mutation):
-    """Re-run the ML ensemble pipeline on an existing report."""
+    """
+    Re-score an existing report.  By default only the combination step is
+    re-run over the cached per-engine scores (HITL trusted-vendor changes
+    only affect that step); ``full_rerun`` re-trains every engine.  A
+    ``profile`` different from the report's last one also re-trains, and
+    so does a report whose last run was degraded by the deadline.
+
+    The write-back is a diff against the stored flags (``write_flag_diff``):
+    auditor decisions on transactions that stay flagged are kept.
+
+    A failed or cancelled report has nothing to re-score: its upload
+    analysis is queued again as a background job (``jobs.requeue_upload``)
+    and the response carries the job.
+    """
     class Arguments:
         report_id = graphene.ID(required=True)
+        full_rerun = graphene.Boolean(required=False)
+        profile = graphene.String(required=False)  # fast | standard | deep
 
     Output = AnalyzeReportResponse
 
-    def mutate(root, info, report_id):
+    def mutate(root, info, report_id, full_rerun=False, profile=None):
         from bson import ObjectId
         user_id = get_current_user_id(info)
         if not user_id:
@@ -584,95 +1202,223 @@ class AnalyzeReport(graphene.Mutation):
         report = audit_reports_col.find_one({"_id": ObjectId(report_id), "user_id": user_id})
         if not report:
             return AnalyzeReportResponse(success=False, message="Report not found", flagged_count=0)
+        status = report.get("status")
+        if status != "completed" and status not in RERUNNABLE_STATUSES:
+            return AnalyzeReportResponse(
+                success=False, message=f"Report is {status}; wait for its analysis to finish",
+                flagged_count=0,
+            )
+
+        previous_profile = report.get("profile", "standard")
+        try:
+            profile = resolve_profile(profile or previous_profile)
+        except ValueError as e:
+            return AnalyzeReportResponse(success=False, message=str(e), flagged_count=0)
+
+        if status in RERUNNABLE_STATUSES:
+            return requeue_report(user_id, report, profile)
+        full_rerun = full_rerun or profile != previous_profile or bool(report.get("degraded_signals"))
+        bucketed = report.get("storage") == "buckets"
+        deadline = deadline_after(DEFAULT_DEADLINE_SECONDS)
 
         mongo_client = audit_reports_col.database.client
-        flagged_count = 0
+        profiler = PipelineProfiler()
+        baseline_inputs = {}
+        degraded = {}
 
         try:
-            def _reanalyze_transaction(session):
-                nonlocal flagged_count
-                txns = list(
-                    transactions_col.find(
-                        {"report_id": report_id, "user_id": user_id},
-                        session=session,
-                    )
+            # ── compute (no session open) ──
+            scored = txns = None
+            if not full_rerun:
+                scored = load_cached_scores(
+                    user_id, report_id, report.get("total_transactions"), profiler, None,
                 )
+            used_cache = scored is not None
+
+            trusted = get_trusted_vendors(user_id)
+            if scored is None:
+                with profiler.stage("mongo_read_transactions") as record:
+                    # the upload snapshot (or the buckets): a few sequential reads
+                    txns = (load_transaction_buckets if bucketed else load_transaction_batch)(user_id, report_id)
+                    if txns is None:
+                        txns = list(transactions_col.find({"report_id": report_id, "user_id": user_id}))
+                    record["rows_out"] = len(txns)
                 if not txns:
                     raise ValueError("No transactions for this report")
-
-                trusted = get_trusted_vendors(user_id)
-                flagged_transactions_col.delete_many(
-                    {"report_id": report_id, "user_id": user_id},
-                    session=session,
+                engine_state = {}
+                scored = score_transactions(
+                    txns, profiler=profiler, engine_state=engine_state, profile=profile,
+                    deadline=deadline, degraded=degraded,
                 )
-                transactions_col.update_many(
-                    {"report_id": report_id, "user_id": user_id},
-                    {
-                        "$set": {
-                            "flagged": False,
-                            "explanation": "",
-                            "risk_score": 0.0,
-                            "decision": "monitor",
-                        }
-                    },
-                    session=session,
+                # a cache, not results: a partial write only fails its row-count check
+                cache_report_scores(user_id, report_id, scored, profiler, None)
+                baseline_inputs.update(
+                    report_id=report_id, scored=scored, engine_state=engine_state, trusted=trusted,
                 )
 
-                flagged_docs = run_pipeline(
-                    txns,
-                    report_id,
-                    trusted,
-                    amount_threshold=report.get("threshold_limit"),
+            flagged_docs = combine_scores(
+                scored,
+                report_id,
+                trusted,
+                amount_threshold=report.get("threshold_limit"),
+                profiler=profiler,
+            )
+            flagged_count = len(flagged_docs)
+            for flagged in flagged_docs:
+                flagged["user_id"] = user_id
+            flagged_ids = [flagged["transaction_id"] for flagged in flagged_docs]
+            with profiler.stage("mongo_read_flag_details", rows_in=flagged_count):
+                # merchant / account for the analytics (a cached run has not read the rows)
+                details = (
+                    flag_details(txns, flagged_ids) if txns is not None
+                    else load_flag_details(user_id, report_id, flagged_ids, bucketed)
                 )
-                flagged_count = len(flagged_docs)
+            computed_checkpoint = profiler.checkpoint()
+            write_back = {}
 
-                if flagged_docs:
-                    for flagged in flagged_docs:
-                        flagged["user_id"] = user_id
-                    flagged_transactions_col.insert_many(flagged_docs, session=session)
-
-                    txn_updates = [
-                        UpdateOne(
-                            {
-                                "report_id": report_id,
-                                "transaction_id": flagged.get("transaction_id", ""),
-                                "user_id": user_id,
-                            },
-                            {
-                                "$set": {
-                                    "flagged": True,
-                                    "explanation": flagged.get("explanation", ""),
-                                    "risk_score": float(flagged.get("risk_score", 0) or 0),
-                                    "decision": flagged.get("decision", "review_required"),
-                                }
-                            },
-                        )
-                        for flagged in flagged_docs
-                    ]
-                    if txn_updates:
-                        transactions_col.bulk_write(txn_updates, ordered=False, session=session)
-
-                audit_reports_col.update_one(
+            # ── commit: a short transaction, only the flag write-back ──
+            def _reanalyze_transaction(session):
+                # with_transaction may retry: drop timings from a failed attempt
+                profiler.rollback(computed_checkpoint)
+                with profiler.stage("mongo_write_flags", rows_in=flagged_count) as record:
+                    # only what changed is written; decisions on kept flags survive
+                    # (bucketed reports keep flags in flagged_transactions only)
+                    diff = write_flag_diff(
+                        user_id, report_id, flagged_docs, update_rows=not bucketed, session=session,
+                    )
+                    record.update(diff)
+                    write_back.update(diff)
+
+                with profiler.stage("mongo_write_analytics", rows_in=flagged_count):
+                    # from the stored flags: decisions kept by the diff count too
+                    analytics = build_report_analytics(
+                        load_report_flags(user_id, report_id, session=session), details,
+                        report.get("total_transactions"),
+                    )
+                    save_report_analytics(user_id, report_id, analytics, session=session)
+
+                update_report(
                     {"_id": ObjectId(report_id), "user_id": user_id},
-                    {"$set": {"flagged_count": flagged_count, "status": "completed"}},
+                    {
+                        "flagged_count": flagged_count,
+                        "status": "completed",
+                        "pipeline_profile": profiler.to_dict(),
+                        "profile": profile,
+                        "degraded_signals": dict(degraded),
+                    },
                     session=session,
                 )
 
             with mongo_client.start_session() as session:
                 session.with_transaction(_reanalyze_transaction)
 
+            baseline_error = None
+            if baseline_inputs and not degraded:
+                baseline_error = refresh_baseline(user_id, **baseline_inputs)
+
+            message = (
+                f"Re-analysis complete: {flagged_count} anomalies detected "
+                f"({write_back['inserted']} new, {write_back['deleted']} cleared, "
+                f"{write_back['changed']} re-scored)"
+            )
+            if degraded:
+                message += f"; degraded to meet the deadline: {', '.join(sorted(degraded))}"
+            if baseline_error:
+                message += f"; {baseline_error}"
             return AnalyzeReportResponse(
                 success=True,
-                message=f"Re-analysis complete: {flagged_count} anomalies detected",
+                message=message,
                 flagged_count=flagged_count,
+                used_cached_scores=used_cache,
+                degraded_signals=describe_degraded(degraded),
             )
         except Exception as ml_err:
             return AnalyzeReportResponse(
                 success=False,
                 message=f"Re-analysis failed: {ml_err}",
                 flagged_count=0,
+                used_cached_scores=False,
+            )
+
+
+class TransactionInput(graphene.InputObjectType):
+    transaction_id = graphene.String(required=True)
+    date = graphene.String(required=True)
+    amount = graphene.Float(required=True)
+    merchant = graphene.String(required=True)
+    account_id = graphene.String(required=True)
+
+
+class ScoredTransactionType(graphene.ObjectType):
+    transaction_id = graphene.String()
+    amount = graphene.Float()
+    risk_score = graphene.Float()
+    robust_z_score = graphene.Float()
+    flagged = graphene.Boolean()
+    explanation = graphene.String()
+
+
+class ScoreTransactionsResponse(graphene.ObjectType):
+    success = graphene.Boolean()
+    message = graphene.String()
+    baseline_report_id = graphene.ID()
+    results = graphene.List(ScoredTransactionType)
+    elapsed_ms = graphene.Float()
+
+
+class ScoreTransactions(graphene.Mutation):
+    """
+    Score a small batch of new transactions against the models frozen
+    from the user's latest analysed report.  Nothing is trained and
+    nothing is written; the baseline itself is not updated.
+    """
+    class Arguments:
+        transactions = graphene.List(graphene.NonNull(TransactionInput), required=True)
+        threshold_limit = graphene.Float(required=False)
+
+    Output = ScoreTransactionsResponse
+
+    def mutate(root, info, transactions, threshold_limit=None):
+        user_id = get_current_user_id(info)
+        if not user_id:
+            return ScoreTransactionsResponse(success=False, message="Authentication required", results=[])
+        if len(transactions) > MAX_SCORE_BATCH:
+            return ScoreTransactionsResponse(
+                success=False,
+                message=f"At most {MAX_SCORE_BATCH} transactions per call; upload a file for larger batches",
+                results=[],
             )
 
+        started = time.perf_counter()
+        try:
+            baseline_report_id, baseline = get_frozen_baseline(user_id)
+            if baseline is None:
+                return ScoreTransactionsResponse(
+                    success=False,
+                    message="No baseline yet: upload and analyse a report first",
+                    results=[],
+                )
+
+            effective_threshold = None
+            if threshold_limit is not None and threshold_limit > 0:
+                effective_threshold = float(threshold_limit)
+
+            results = baseline.score(
+                [dict(txn) for txn in transactions],
+                report_id=baseline_report_id,
+                amount_threshold=effective_threshold,
+            )
+            flagged = sum(1 for row in results if row["flagged"])
+            return ScoreTransactionsResponse(
+                success=True,
+                message=f"Scored {len(results)} transactions ({flagged} flagged)",
+                baseline_report_id=baseline_report_id,
+                results=[ScoredTransactionType(**row) for row in results],
+                elapsed_ms=round((time.perf_counter() - started) * 1000, 2),
+            )
+        except Exception as e:
+            return ScoreTransactionsResponse(success=False, message=f"Scoring failed: {e}", results=[])
+
 
 # ============================================
 # Trusted Vendor Mutations (HITL Masking)
@@ -726,9 +1472,11 @@ class RemoveTrustedVendor(graphene.Mutation):
 
 class Mutation(graphene.ObjectType):
     upload_audit_file = UploadAuditFile.Field()
+    cancel_analysis = CancelAnalysis.Field()
     update_transaction_decision = UpdateTransactionDecision.Field()
     # ML pipeline
     analyze_report = AnalyzeReport.Field()
+    score_transactions = ScoreTransactions.Field()
     # HITL Trusted Vendors
     add_trusted_vendor = AddTrustedVendor.Field()
     remove_trusted_vendor = RemoveTrustedVendor.Field()
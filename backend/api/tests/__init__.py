@@ -0,0 +1,59 @@
+"""
+API tests (``python manage.py test api``).
+
+They run against an in-memory Mongo (mongomock), never the configured
+``MONGO_URI``: ``pymongo.MongoClient`` is replaced here, before anything
+imports ``api.db``.  Without mongomock the Mongo-backed tests are skipped.
+"""
+
+from unittest import mock, skipIf
+
+from django.test import SimpleTestCase
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+else:
+    mock.patch("pymongo.MongoClient", mongomock.MongoClient).start()
+
+
+def _bulk_write(collection, requests, ordered=True, session=None, **_kwargs):
+    """
+    ``Collection.bulk_write`` for mongomock: applies InsertOne, UpdateOne
+    and DeleteOne requests one at a time and raises NotImplementedError
+    for any other request type.  mongomock's own bulk_write fails on every
+    UpdateOne, because pymongo always passes it a ``sort`` keyword (None
+    when unset) that mongomock's bulk builder does not accept.
+    """
+    from pymongo import DeleteOne, InsertOne, UpdateOne
+    for request in requests:
+        if isinstance(request, InsertOne):
+            collection.insert_one(request._doc)
+        elif isinstance(request, DeleteOne):
+            collection.delete_one(request._filter)
+        elif isinstance(request, UpdateOne):
+            collection.update_one(request._filter, request._doc, upsert=bool(request._upsert))
+        else:
+            raise NotImplementedError(type(request).__name__)
+
+
+@skipIf(mongomock is None, "needs mongomock")
+class MongoTestCase(SimpleTestCase):
+    """
+    Starts every test on an empty in-memory AuditHawk database.  mongomock
+    has no sessions, so ``db.in_transaction`` runs writes without one, and
+    bulk writes are applied one request at a time.
+    """
+
+    def setUp(self):
+        super().setUp()
+        from api import db
+        for name in db.db.list_collection_names():
+            db.db[name].delete_many({})
+        for patcher in (
+            mock.patch.object(db, "in_transaction", lambda write, session=None: write(session)),
+            mock.patch.object(mongomock.Collection, "bulk_write", _bulk_write),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
@@ -0,0 +1,41 @@
+from unittest import mock
+
+from bson import ObjectId
+
+from api import db, jobs
+from api.schema import requeue_report
+from api.tests import MongoTestCase
+
+
+class RequeueReportTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.report_id = db.insert_report({
+            "user_id": "u1", "status": "processing", "total_transactions": 3, "flagged_count": 0,
+            "profile": "fast",
+        })
+        db.enqueue_analysis_job("u1", self.report_id, kind="upload", params={"profile": "fast"},
+                                payload=b"csv", stages_total=1, max_attempts=2)
+        db.request_job_cancel("u1", self.report_id)
+        db.update_report_status("u1", self.report_id, "cancelled")
+        self.report = db.audit_reports_col.find_one({"_id": ObjectId(self.report_id)})
+
+    def test_cancelled_report_is_queued_again(self):
+        with mock.patch.object(jobs, "kick"):
+            response = requeue_report("u1", self.report, "standard")
+        self.assertTrue(response.success, response.message)
+        self.assertEqual(response.job.status, "queued")
+        report = db.audit_reports_col.find_one({"_id": ObjectId(self.report_id)})
+        self.assertEqual((report["status"], report["profile"]), ("queued", "standard"))
+        self.assertEqual(db.get_dashboard_summary("u1")["status_counts"].get("queued"), 1)
+
+    def test_report_is_restored_when_the_upload_is_gone(self):
+        db.analysis_job_payloads_col.delete_many({})
+        response = requeue_report("u1", self.report, "standard")
+        self.assertFalse(response.success)
+        report = db.audit_reports_col.find_one({"_id": ObjectId(self.report_id)})
+        self.assertEqual((report["status"], report["profile"]), ("cancelled", "fast"))
+
+    def test_a_report_that_moved_on_is_left_alone(self):
+        db.update_report_status("u1", self.report_id, "queued")
+        self.assertFalse(requeue_report("u1", self.report, "standard").success)
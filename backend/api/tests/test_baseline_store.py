@@ -0,0 +1,34 @@
+from unittest import mock
+
+from api import db
+from api.tests import MongoTestCase
+
+
+class BaselineStoreTests(MongoTestCase):
+    def save(self, fitted_at: str, payload: bytes) -> bool:
+        with mock.patch.object(db, "BASELINE_CHUNK_BYTES", 1000):
+            return db.save_model_baseline("u1", "r1", payload, fitted_at)
+
+    def test_state_is_chunked_and_older_chunks_dropped(self):
+        first, second = b"a" * 2500, b"b" * 1500
+        self.assertTrue(self.save("2026-01-01T00:00:00", first))
+        doc = db.get_model_baseline("u1")
+        self.assertEqual(db.load_model_baseline_state(doc), first)
+        self.assertEqual(db.model_baseline_chunks_col.count_documents({}), 3)
+
+        self.assertTrue(self.save("2026-01-02T00:00:00", second))
+        # a reader still holding the replaced document is told to re-read
+        self.assertIsNone(db.load_model_baseline_state(doc))
+        self.assertEqual(db.load_model_baseline_state(db.get_model_baseline("u1")), second)
+        self.assertEqual(db.model_baseline_chunks_col.count_documents({}), 2)
+
+    def test_an_older_fit_never_replaces_a_newer_one(self):
+        self.assertTrue(self.save("2026-01-02T00:00:00", b"new"))
+        self.assertFalse(self.save("2026-01-01T00:00:00", b"old"))
+        self.assertEqual(db.load_model_baseline_state(db.get_model_baseline("u1")), b"new")
+        self.assertEqual(db.model_baseline_chunks_col.count_documents({}), 1)
+
+    def test_refresh_failure_is_returned(self):
+        from api.schema import refresh_baseline
+        with mock.patch("api.ml_engine.baseline.fit_baseline", side_effect=ValueError("boom")):
+            self.assertEqual(refresh_baseline("u1", "r1", None, {}, []), "Baseline not refreshed: boom")
@@ -0,0 +1,75 @@
+import time
+from unittest import mock, skipUnless
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from api.ml_engine.executor import run_engines
+from api.ml_engine.feature_engineering import build_features
+from api.ml_engine.profiling import PipelineProfiler
+from api.ml_engine.synthetic import generate_ledger, to_records
+
+try:
+    import torch
+    from api.ml_engine import models_autoencoder
+except ImportError:
+    torch = None
+
+
+@skipUnless(torch is not None, "needs torch")
+class AutoencoderScheduleTests(SimpleTestCase):
+    def setUp(self):
+        self.x = torch.from_numpy(np.random.default_rng(0).random((2000, 4), dtype=np.float32))
+
+    def test_training_is_seeded(self):
+        torch.manual_seed(1)
+        first, _ = models_autoencoder.train_autoencoder(self.x, epochs=3)
+        torch.manual_seed(2)
+        second, _ = models_autoencoder.train_autoencoder(self.x, epochs=3)
+        for name, tensor in first.state_dict().items():
+            self.assertTrue(torch.equal(tensor, second.state_dict()[name]), name)
+
+    def test_no_deadline_trains_every_epoch(self):
+        _model, epochs_run = models_autoencoder.train_autoencoder(self.x, epochs=4)
+        self.assertEqual(epochs_run, 4)
+
+    def test_short_deadline_stops_early_at_the_same_learning_rate(self):
+        started = time.time()
+        _model, full_epochs = models_autoencoder.train_autoencoder(self.x, epochs=10)
+        budget = (time.time() - started) / 2
+        deadline = time.time() + budget
+        _model, epochs_run = models_autoencoder.train_autoencoder(self.x, epochs=10, deadline=deadline)
+        self.assertLess(epochs_run, full_epochs)
+        self.assertLess(time.time(), deadline + budget)
+
+    def test_early_stopped_model_is_the_unhurried_model_after_fewer_epochs(self):
+        with mock.patch.object(models_autoencoder, "_epoch_fits", lambda done, _started, _deadline: done < 3):
+            early, epochs_run = models_autoencoder.train_autoencoder(self.x, epochs=10, deadline=time.time() + 600)
+        prefix, _ = models_autoencoder.train_autoencoder(self.x, epochs=3)
+        self.assertEqual(epochs_run, 3)
+        for name, tensor in early.state_dict().items():
+            self.assertTrue(torch.equal(tensor, prefix.state_dict()[name]), name)
+
+    def test_epoch_fits_the_pace_so_far(self):
+        self.assertTrue(models_autoencoder._epoch_fits(3, time.time() - 3, None))
+        self.assertTrue(models_autoencoder._epoch_fits(3, time.time() - 3, time.time() + 5))
+        self.assertFalse(models_autoencoder._epoch_fits(3, time.time() - 3, time.time() + 0.5))
+
+    def test_early_stop_is_recorded(self):
+        df = pd.DataFrame(self.x.numpy(), columns=models_autoencoder.FEATURE_COLS)
+        scores = models_autoencoder.run_autoencoder(df, epochs=3)
+        self.assertEqual((scores.attrs["epochs_run"], scores.attrs.get("degraded")), (3, None))
+        scores = models_autoencoder.run_autoencoder(df, epochs=3, deadline=time.time() - 1)
+        self.assertLess(scores.attrs["epochs_run"], 3)
+        self.assertIn("stopped early", scores.attrs["degraded"])
+
+
+@skipUnless(torch is not None, "needs torch")
+class EngineOrderTests(SimpleTestCase):
+    def test_autoencoder_runs_last_under_a_deadline(self):
+        df = build_features(pd.DataFrame(to_records(generate_ledger(500))))
+        for deadline, expected in ((None, ["lof", "ae", "graph"]), (time.time() + 600, ["lof", "graph", "ae"])):
+            profiler = PipelineProfiler()
+            run_engines(df, profiler=profiler, deadline=deadline, options={"ae": {"epochs": 2}})
+            self.assertEqual([record["stage"] for record in profiler.stages], expected)
@@ -0,0 +1,21 @@
+from django.test import SimpleTestCase
+
+from api.management.commands.evaluate_modes import Command as EvaluateModes, _agreement
+
+
+class EvaluateModesGateTests(SimpleTestCase):
+    def test_agreement_reports_relative_drift(self):
+        agreement = _agreement({"a": 2.2, "b": 1.0, "c": 5.0}, {"a": 2.0, "b": 2.0, "d": 1.0})
+        self.assertEqual(agreement["recall"], 0.6667)
+        self.assertEqual(agreement["precision"], 0.6667)
+        self.assertEqual(agreement["risk_score_mae"], 0.6)
+        self.assertEqual(agreement["risk_score_drift"], 0.3)
+
+    def test_drift_limits_per_mode(self):
+        exact = {}
+        run = {"vs_exact": {"recall": 1.0, "precision": 1.0, "risk_score_mae": 0.3, "risk_score_drift": 0.15}}
+        self.assertEqual(EvaluateModes._check("sampled", run, exact, 0.1, None), [])
+        self.assertEqual(len(EvaluateModes._check("process", run, exact, 0.1, None)), 1)
+        self.assertEqual(len(EvaluateModes._check("sampled", run, exact, 0.1, 0.1)), 1)
+        for reported in ("sharded", "deadline", "fast"):
+            self.assertEqual(EvaluateModes._check(reported, run, exact, 0.1, 0.1), [])
@@ -0,0 +1,150 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+import graphene
+from django.test import RequestFactory, SimpleTestCase
+from graphene_django.views import GraphQLView
+from graphql import execute, parse
+
+from api import fast_graphql
+from api.fast_graphql import FastExecutionContext
+
+ROWS = 150  # above FAST_LIST_MIN_ITEMS
+
+
+class Risk(graphene.Enum):
+    LOW = "low"
+    HIGH = "high"
+
+
+class Merchant(graphene.ObjectType):
+    name = graphene.String(required=True)
+
+
+class Row(graphene.ObjectType):
+    transaction_id = graphene.String(required=True)
+    amount = graphene.Float()
+    count = graphene.Int()
+    flagged = graphene.Boolean()
+    date = graphene.DateTime()
+    risk = graphene.Field(Risk)
+    merchant = graphene.Field(Merchant)
+    upper_id = graphene.String()
+
+    def resolve_upper_id(parent, info):
+        return parent["transaction_id"].upper()
+
+
+class Edge(graphene.ObjectType):
+    cursor = graphene.String(required=True)
+    node = graphene.Field(Row, required=True)
+
+
+class Query(graphene.ObjectType):
+    rows = graphene.List(graphene.NonNull(Row))
+    objects = graphene.List(Row)
+    edges = graphene.List(Edge)
+
+    def resolve_rows(root, info):
+        return root["rows"]
+
+    def resolve_objects(root, info):
+        return [SimpleNamespace(**row) if row else None for row in root["rows"]]
+
+    def resolve_edges(root, info):
+        return ({"cursor": f"c{i}", "node": row} for i, row in enumerate(root["rows"]))
+
+
+schema = graphene.Schema(query=Query).graphql_schema
+
+LEAVES = "transactionId amount count flagged date risk merchant { name } __typename"
+
+
+def rows(n: int = ROWS) -> list[dict]:
+    return [
+        {
+            "transaction_id": f"t{i}",
+            "amount": i * 1.5,
+            "count": i,
+            "flagged": i % 3 == 0,
+            "date": datetime(2026, 1, 1 + i % 28, 12, 30),
+            "risk": "high" if i % 2 else "low",
+            "merchant": {"name": f"m{i % 7}"} if i % 5 else None,
+        }
+        for i in range(n)
+    ]
+
+
+class FastExecutionTests(SimpleTestCase):
+    def run_both(self, query: str, data: list):
+        """(graphql-core result, fast result, whether the plan served a list)."""
+        document = parse(query)
+        expected = execute(schema, document, root_value={"rows": data})
+        with mock.patch.object(fast_graphql, "_serialize_rows", wraps=fast_graphql._serialize_rows) as fast:
+            actual = execute(schema, document, root_value={"rows": data},
+                             execution_context_class=FastExecutionContext)
+        return expected, actual, fast.called
+
+    def assertSameResult(self, query: str, data: list, fast_path: bool):
+        expected, actual, used = self.run_both(query, data)
+        self.assertEqual(actual.data, expected.data)
+        self.assertEqual([error.formatted for error in actual.errors or []],
+                         [error.formatted for error in expected.errors or []])
+        self.assertEqual(used, fast_path)
+        return actual
+
+    def test_default_resolvers_use_the_plan(self):
+        self.assertSameResult(f"{{ rows {{ {LEAVES} }} }}", rows(), fast_path=True)
+        self.assertSameResult(f"{{ objects {{ {LEAVES} }} }}", rows(), fast_path=True)
+        self.assertSameResult(f"{{ edges {{ cursor node {{ {LEAVES} }} }} }}", rows(), fast_path=True)
+
+    def test_aliases_fragments_and_directives(self):
+        query = """
+            query ($skip: Boolean!) {
+              rows { id: transactionId total: amount amount ...F @include(if: true) flagged @skip(if: $skip) }
+            }
+            fragment F on Row { merchant { name } merchantName: merchant { n: name } }
+        """
+        document = parse(query)
+        for skip in (True, False):
+            expected = execute(schema, document, root_value={"rows": rows()}, variable_values={"skip": skip})
+            actual = execute(schema, document, root_value={"rows": rows()}, variable_values={"skip": skip},
+                             execution_context_class=FastExecutionContext)
+            self.assertEqual(actual.data, expected.data)
+            self.assertEqual("flagged" in actual.data["rows"][0], not skip)
+
+    def test_short_lists_are_completed_normally(self):
+        self.assertSameResult(f"{{ rows {{ {LEAVES} }} }}", rows(ROWS)[:5], fast_path=False)
+
+    def test_custom_resolvers_fall_back(self):
+        self.assertSameResult("{ rows { transactionId upperId } }", rows(), fast_path=False)
+
+    def test_null_in_a_non_null_field_keeps_the_graphql_error(self):
+        data = rows()
+        data[42]["transaction_id"] = None
+        result = self.assertSameResult("{ rows { transactionId amount } }", data, fast_path=True)
+        self.assertEqual(result.errors[0].path, ["rows", 42, "transactionId"])
+        self.assertIsNone(result.data["rows"])  # non-null items: the null propagates to the list
+
+    def test_null_items_and_unserializable_values(self):
+        data = rows()
+        data[7] = None
+        self.assertSameResult("{ objects { transactionId amount } }", data, fast_path=True)
+        self.assertSameResult("{ rows { transactionId amount } }", data, fast_path=True)  # NonNull items
+        data = rows()
+        data[3]["count"] = "many"
+        data[9]["risk"] = "unknown"
+        self.assertSameResult("{ rows { transactionId count risk } }", data, fast_path=True)
+
+
+class JsonEncodeTests(SimpleTestCase):
+    def test_orjson_output_parses_to_the_json_output(self):
+        view = fast_graphql.FastGraphQLView(schema=graphene.Schema(query=Query))
+        payload = {"data": {"rows": [{"id": "t1", "amount": 1.5, "flagged": None, "name": "café"}]}}
+        request = RequestFactory().get("/graphql/")
+        encoded = view.json_encode(request, payload)
+        self.assertEqual(json.loads(encoded), json.loads(GraphQLView.json_encode(view, request, payload)))
+        self.assertEqual(view.json_encode(RequestFactory().get("/graphql/?pretty=1"), payload),
+                         GraphQLView.json_encode(view, request, payload, pretty=True))
@@ -0,0 +1,56 @@
+from api import db
+from api.tests import MongoTestCase
+
+
+def flag(transaction_id: str, risk_score: float, explanation: str = "odd") -> dict:
+    return {
+        "report_id": "r1", "user_id": "u1", "transaction_id": transaction_id, "amount": 10.0,
+        "risk_score": risk_score, "explanation": explanation, "signals": ["lof"], "decision": "review_required",
+    }
+
+
+class WriteFlagDiffTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        db.transactions_col.insert_many([
+            {"report_id": "r1", "user_id": "u1", "transaction_id": tid, **db.ROW_UNFLAGGED}
+            for tid in ("t1", "t2", "t3", "t4")
+        ])
+        db.write_flag_diff("u1", "r1", [flag("t1", 5.0), flag("t2", 6.0), flag("t3", 7.0)])
+        # the auditor reviews t1 and t2
+        db.flagged_transactions_col.update_many({"transaction_id": {"$in": ["t1", "t2"]}},
+                                                {"$set": {"decision": "confirmed_fraud"}})
+
+    def flags(self) -> dict[str, dict]:
+        return {doc["transaction_id"]: doc for doc in db.flagged_transactions_col.find({"report_id": "r1"})}
+
+    def rows(self) -> dict[str, dict]:
+        return {doc["transaction_id"]: doc for doc in db.transactions_col.find({"report_id": "r1"})}
+
+    def test_only_changes_are_written_and_decisions_survive(self):
+        ids_before = {tid: doc["_id"] for tid, doc in self.flags().items()}
+        counts = db.write_flag_diff("u1", "r1", [flag("t1", 5.0), flag("t2", 8.0, "worse"), flag("t4", 4.0)])
+        self.assertEqual(counts, {"inserted": 1, "deleted": 1, "changed": 1, "unchanged": 1})
+
+        flags = self.flags()
+        self.assertEqual(sorted(flags), ["t1", "t2", "t4"])
+        self.assertEqual({tid: flags[tid]["_id"] for tid in ("t1", "t2")},
+                         {tid: ids_before[tid] for tid in ("t1", "t2")})
+        self.assertEqual((flags["t2"]["risk_score"], flags["t2"]["explanation"]), (8.0, "worse"))
+        self.assertEqual([flags[tid]["decision"] for tid in ("t1", "t2", "t4")],
+                         ["confirmed_fraud", "confirmed_fraud", "review_required"])
+
+        rows = self.rows()
+        self.assertEqual({tid: rows[tid]["flagged"] for tid in rows},
+                         {"t1": True, "t2": True, "t3": False, "t4": True})
+        self.assertEqual((rows["t2"]["risk_score"], rows["t3"]["decision"]), (8.0, "monitor"))
+
+    def test_bucketed_reports_leave_rows_alone(self):
+        rows_before = self.rows()
+        db.write_flag_diff("u1", "r1", [], update_rows=False)
+        self.assertEqual(self.flags(), {})
+        self.assertEqual(self.rows(), rows_before)
+
+    def test_identical_flags_write_nothing(self):
+        counts = db.write_flag_diff("u1", "r1", [flag("t1", 5.0), flag("t2", 6.0), flag("t3", 7.0)])
+        self.assertEqual(counts, {"inserted": 0, "deleted": 0, "changed": 0, "unchanged": 3})
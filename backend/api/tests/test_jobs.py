@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from api import db, jobs
+from api.tests import MongoTestCase
+
+
+def queue(report_id: str, user_id: str = "u1", created_at: datetime | None = None) -> None:
+    db.enqueue_analysis_job(user_id, report_id, kind="upload", params={"profile": "fast"},
+                            payload=None, stages_total=1, max_attempts=2)
+    if created_at is not None:
+        db.analysis_jobs_col.update_one({"_id": report_id}, {"$set": {"created_at": created_at}})
+
+
+def expire_lease(report_id: str) -> None:
+    db.analysis_jobs_col.update_one(
+        {"_id": report_id}, {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}},
+    )
+
+
+class JobClaimTests(MongoTestCase):
+    def test_oldest_first_and_tenant_limit(self):
+        now = datetime.utcnow()
+        queue("a", "u1", now - timedelta(minutes=3))
+        queue("b", "u1", now - timedelta(minutes=2))
+        queue("c", "u2", now - timedelta(minutes=1))
+        self.assertEqual(db.claim_analysis_job("w1", 60, tenant_limit=1)["_id"], "a")
+        # u1 is at its limit: its older job waits behind u2's
+        self.assertEqual(db.claim_analysis_job("w2", 60, tenant_limit=1)["_id"], "c")
+        self.assertIsNone(db.claim_analysis_job("w3", 60, tenant_limit=1))
+        self.assertEqual(db.claim_analysis_job("w3", 60, tenant_limit=0)["_id"], "b")
+
+    def test_lease_is_fenced_to_its_worker(self):
+        queue("a")
+        job = db.claim_analysis_job("w1", 60, tenant_limit=0)
+        self.assertEqual(job["attempts"], 1)
+        self.assertIsNone(db.claim_analysis_job("w2", 60, tenant_limit=0))
+        self.assertFalse(db.renew_job_lease("a", "w2", 60))
+        self.assertTrue(db.renew_job_lease("a", "w1", 60))
+
+        expire_lease("a")
+        reclaimed = db.claim_analysis_job("w2", 60, tenant_limit=0)
+        self.assertEqual((reclaimed["lease_owner"], reclaimed["attempts"]), ("w2", 2))
+        self.assertFalse(db.renew_job_lease("a", "w1", 60))
+        self.assertFalse(db.release_analysis_job("a", "w1", "completed", {}))
+        self.assertTrue(db.release_analysis_job("a", "w2", "completed", {}))
+
+    def test_expired_last_attempt_is_failed(self):
+        queue("a")
+        for worker in ("w1", "w2"):
+            db.claim_analysis_job(worker, 60, tenant_limit=0)
+            expire_lease("a")
+        self.assertIsNone(db.claim_analysis_job("w3", 60, tenant_limit=0))
+        self.assertEqual([job["_id"] for job in db.fail_expired_jobs()], ["a"])
+        self.assertEqual(db.analysis_jobs_col.find_one({"_id": "a"})["status"], "failed")
+
+
+class JobRetryTests(MongoTestCase):
+    def tearDown(self):
+        if jobs._wake_timer is not None:
+            jobs._wake_timer.cancel()
+            jobs._wake_timer = None
+        super().tearDown()
+
+    def run_failing(self, worker_id: str) -> str:
+        job = db.claim_analysis_job(worker_id, 60, tenant_limit=0)
+        with mock.patch.dict(jobs.JOB_RUNNERS, upload=mock.Mock(side_effect=RuntimeError("boom"))), \
+                mock.patch.object(jobs, "update_report_status"), self.assertLogs("api.jobs", "ERROR") as logs:
+            status = jobs.run_claimed_job(job, worker_id, lease_seconds=60)
+        self.assertIn("RuntimeError: boom", logs.output[0])  # with its traceback
+        return status
+
+    def test_failed_attempt_is_retried_after_backoff(self):
+        queue("a")
+        self.assertEqual(self.run_failing("w1"), "queued")
+        job = db.analysis_jobs_col.find_one({"_id": "a"})
+        self.assertEqual(job["error"], "boom")
+        backoff = (job["available_at"] - datetime.utcnow()).total_seconds()
+        self.assertAlmostEqual(backoff, jobs.JOB_RETRY_BACKOFF_SECONDS, delta=5)
+        self.assertIsNone(db.claim_analysis_job("w2", 60, tenant_limit=0))
+
+        db.analysis_jobs_col.update_one({"_id": "a"}, {"$set": {"available_at": datetime.utcnow()}})
+        self.assertEqual(self.run_failing("w2"), "failed")  # attempts used up
+        self.assertEqual(db.analysis_jobs_col.find_one({"_id": "a"})["status"], "failed")
+
+    def test_idle_workers_wake_for_the_next_retry(self):
+        self.assertIsNone(db.next_job_wakeup())
+        queue("a")
+        queue("b")
+        self.run_failing("w1")
+        retry_at = db.analysis_jobs_col.find_one({"_id": "a"})["available_at"]
+        db.claim_analysis_job("w2", 60, tenant_limit=0)
+        self.assertEqual(db.next_job_wakeup(), retry_at)  # sooner than b's 60 s lease
+
+        jobs._schedule_wakeup()
+        self.assertAlmostEqual(jobs._wake_timer.interval, jobs.JOB_RETRY_BACKOFF_SECONDS, delta=5)
+        armed = jobs._wake_timer
+        jobs._schedule_wakeup()  # a later wake-up never replaces a sooner one
+        self.assertIs(jobs._wake_timer, armed)
+
+        with mock.patch.object(jobs, "kick") as kick:
+            jobs._wake_timer.cancel()
+            jobs._wake_timer.function()
+        kick.assert_called_once()
+
+
+class JobPayloadTests(MongoTestCase):
+    def test_payload_is_chunked_and_dropped_when_final(self):
+        payload = bytes(range(256)) * 1000
+        with mock.patch.object(db, "JOB_PAYLOAD_CHUNK_BYTES", 100_000):
+            db.enqueue_analysis_job("u1", "a", kind="upload", params={}, payload=payload,
+                                    stages_total=1, max_attempts=2)
+        self.assertEqual(db.analysis_job_payloads_col.count_documents({"job_id": "a"}), 3)
+        self.assertNotIn("payload", db.analysis_jobs_col.find_one({"_id": "a"}))
+
+        job = db.claim_analysis_job("w1", 60, tenant_limit=0)
+        self.assertEqual(db.load_job_payload(job), payload)
+        self.assertTrue(db.release_analysis_job("a", "w1", "queued", {}))
+        self.assertEqual(db.load_job_payload(job), payload)  # kept for the retry
+
+        self.assertIsNotNone(db.claim_analysis_job("w1", 60, tenant_limit=0))
+        self.assertTrue(db.release_analysis_job("a", "w1", "completed", {}))
+        self.assertEqual(db.analysis_job_payloads_col.count_documents({"job_id": "a"}), 0)
+
+    def test_cancelled_job_keeps_its_payload_for_a_rerun(self):
+        db.enqueue_analysis_job("u1", "a", kind="upload", params={"profile": "fast", "file_name": "f.csv"},
+                                payload=b"csv", stages_total=1, max_attempts=2)
+        job, changed = db.request_job_cancel("u1", "a")
+        self.assertTrue(changed)
+        self.assertEqual(job["status"], "cancelled")
+        self.assertIsNone(db.requeue_analysis_job("u2", "a", {}, 1, 2))
+
+        with mock.patch.object(jobs, "kick") as kick:
+            job = jobs.requeue_upload("u1", "a", {"profile": "standard"})
+        kick.assert_called_once()
+        self.assertEqual((job["status"], job["attempts"], job["cancel_requested"]), ("queued", 0, False))
+        self.assertEqual(job["params"], {"profile": "standard", "file_name": "f.csv"})
+        self.assertEqual(job["stages_total"], len(jobs.upload_job_stages("standard")))
+        self.assertEqual(db.load_job_payload(job), b"csv")
+        self.assertIsNone(jobs.requeue_upload("u1", "a", {"profile": "standard"}))  # already queued
+
+    def test_job_without_its_payload_is_not_requeued(self):
+        db.enqueue_analysis_job("u1", "a", kind="upload", params={}, payload=b"csv",
+                                stages_total=1, max_attempts=2)
+        db.request_job_cancel("u1", "a")
+        db.analysis_job_payloads_col.delete_many({})  # expired
+        self.assertIsNone(db.requeue_analysis_job("u1", "a", {}, 1, 2))
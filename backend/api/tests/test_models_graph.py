@@ -0,0 +1,43 @@
+import importlib.util
+import time
+from unittest import skipUnless
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from api.ml_engine import models_graph
+from api.ml_engine.synthetic import generate_ledger, to_records
+
+
+@skipUnless(models_graph.community_louvain is not None, "needs python-louvain")
+class LouvainDeadlineTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.df = pd.DataFrame(to_records(generate_ledger(3000, n_merchants=80, n_accounts=300)))
+        cls.graph = models_graph._build_graph(cls.df)
+
+    def test_levels_end_in_best_partition(self):
+        expected = models_graph.community_louvain.best_partition(self.graph, weight="weight", random_state=42)
+        partition, note = models_graph._louvain_partition(self.graph, None)
+        self.assertEqual(partition, expected)
+        self.assertIsNone(note)
+
+    def test_unexpired_deadline_changes_nothing(self):
+        plain = models_graph.run_graph_analysis(self.df)
+        timed = models_graph.run_graph_analysis(self.df, deadline=time.time() + 600)
+        self.assertTrue((plain.values == timed.values).all())
+        self.assertNotIn("degraded", timed.attrs)
+
+    def test_expired_deadline_skips_communities(self):
+        partition, note = models_graph._louvain_partition(self.graph, time.time() - 1)
+        self.assertEqual(partition, {})
+        self.assertIn("skipped", note)
+
+    def test_other_python_louvain_fails_at_import(self):
+        spec = importlib.util.spec_from_file_location("api.ml_engine._models_graph_copy", models_graph.__file__)
+        impl = models_graph._louvain_impl
+        self.addCleanup(setattr, impl, "__one_level", getattr(impl, "__one_level"))
+        delattr(impl, "__one_level")
+        with self.assertRaisesRegex(ImportError, "__one_level.*python-louvain==0.16"):
+            spec.loader.exec_module(importlib.util.module_from_spec(spec))
@@ -0,0 +1,130 @@
+from datetime import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import db, pagination
+from api.pagination import PaginationError, paginate_collection, paginate_rows
+from api.schema import bucketed_transactions_page
+from api.tests import MongoTestCase
+
+# amounts with ties, so the tiebreak decides the order inside them
+AMOUNTS = [5.0, 1.0, 3.0, 5.0, 2.0, 3.0, 5.0, 4.0, 1.0, 3.0]
+
+
+def walk(fetch, size: int, backwards: bool = False) -> list[dict]:
+    """Every row, page by page, in the order the pages present them."""
+    pages, cursor = [], None
+    while True:
+        page = fetch(last=size, before=cursor) if backwards else fetch(first=size, after=cursor)
+        pages.append(page.items)
+        more = page.has_previous if backwards else page.has_next
+        if not more:
+            break
+        cursor = page.cursors[0] if backwards else page.cursors[-1]
+    if backwards:
+        pages.reverse()
+    return [item for items in pages for item in items]
+
+
+class PageWindowTests(SimpleTestCase):
+    def test_relay_arguments(self):
+        self.assertEqual(pagination.page_window(first=5, after="c"), (5, False, "c"))
+        self.assertEqual(pagination.page_window(last=5, before="c"), (5, True, "c"))
+        self.assertEqual(pagination.page_window(first=10 ** 6)[0], pagination.MAX_PAGE_SIZE)
+        for bad in ({"first": 1, "last": 1}, {"last": 1, "after": "c"}, {"before": "c"}, {"first": -1}):
+            with self.assertRaises(PaginationError):
+                pagination.page_window(**bad)
+        with self.assertRaises(PaginationError):
+            pagination.decode_cursor("not a cursor")
+
+
+class RowPaginationTests(SimpleTestCase):
+    rows = [{"_row": i, "amount": amount} for i, amount in enumerate(AMOUNTS)]
+
+    def test_walks_both_ways_in_keyset_order(self):
+        for sort_field, descending in ((None, False), ("amount", False), ("amount", True)):
+            expected = sorted(self.rows, key=lambda row: ((row["amount"] if sort_field else 0), row["_row"]),
+                              reverse=descending)
+            fetch = lambda **page: paginate_rows(self.rows, sort_field, descending, **page)
+            for backwards in (False, True):
+                self.assertEqual(walk(fetch, 3, backwards), expected, (sort_field, descending, backwards))
+
+    def test_page_flags(self):
+        page = paginate_rows(self.rows, first=4)
+        self.assertEqual((page.has_next, page.has_previous), (True, False))
+        page = paginate_rows(self.rows, first=4, after=page.cursors[-1])
+        self.assertEqual((len(page.items), page.has_next, page.has_previous), (4, True, True))
+        self.assertEqual(paginate_rows(self.rows, last=20).items, self.rows)
+
+
+class CollectionPaginationTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        db.transactions_col.insert_many([
+            {"report_id": "r1", "user_id": "u1", "transaction_id": f"t{i}", "amount": amount, "flagged": i % 2 == 0}
+            for i, amount in enumerate(AMOUNTS)
+        ])
+        db.transactions_col.insert_one({"report_id": "r2", "user_id": "u1", "transaction_id": "x", "amount": 1.0})
+
+    def test_walks_both_ways_in_keyset_order(self):
+        query = {"report_id": "r1", "user_id": "u1"}
+        rows = list(db.transactions_col.find(query))
+        for sort_field, descending in ((None, False), ("amount", False), ("amount", True)):
+            expected = sorted(rows, key=lambda row: ((row["amount"] if sort_field else 0), row["_id"]),
+                              reverse=descending)
+            fetch = lambda **page: paginate_collection(db.transactions_col, query, sort_field, descending, **page)
+            for backwards in (False, True):
+                self.assertEqual(walk(fetch, 3, backwards), expected, (sort_field, descending, backwards))
+
+    def test_filter_and_projection(self):
+        query = {"report_id": "r1", "user_id": "u1", "flagged": True}
+        items = walk(lambda **page: paginate_collection(
+            db.transactions_col, query, "amount", projection={"transaction_id": 1}, **page,
+        ), 2)
+        self.assertEqual([item["transaction_id"] for item in items], ["t8", "t4", "t2", "t0", "t6"])
+        self.assertEqual(set(items[0]), {"_id", "transaction_id", "amount"})  # the sort field comes along
+
+    def test_rows_inserted_between_pages_do_not_shift_them(self):
+        query = {"report_id": "r1", "user_id": "u1"}
+        first = paginate_collection(db.transactions_col, query, "amount", first=4)
+        db.transactions_col.insert_one({**query, "transaction_id": "early", "amount": 0.5})
+        second = paginate_collection(db.transactions_col, query, "amount", first=4, after=first.cursors[-1])
+        self.assertEqual([item["amount"] for item in first.items + second.items],
+                         sorted(AMOUNTS)[:8])
+
+
+class BucketedPaginationTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        rows = [{"transaction_id": f"t{i}", "amount": amount, "merchant": "m"} for i, amount in enumerate(AMOUNTS)]
+        with mock.patch.object(db, "TRANSACTION_BUCKET_ROWS", 4):
+            db.save_transaction_buckets("u1", "r1", datetime.utcnow(), rows)
+        db.flagged_transactions_col.insert_one(
+            {"report_id": "r1", "user_id": "u1", "transaction_id": "t3", "risk_score": 9.0, "explanation": "odd"},
+        )
+        self.report = {"_id": "r1", "total_transactions": len(AMOUNTS)}
+
+    def fetch(self, sort_field=None, descending=False, flagged=None, fields=("transaction_id", "amount")):
+        def page(**page_args):
+            return bucketed_transactions_page("u1", self.report, list(fields), sort_field, descending, flagged,
+                                              page_args)[0]
+        return page
+
+    def test_upload_order_reads_only_the_buckets_under_the_page(self):
+        expected = [f"t{i}" for i in range(len(AMOUNTS))]
+        for backwards in (False, True):
+            items = walk(self.fetch(), 3, backwards)
+            self.assertEqual([item["transaction_id"] for item in items], expected)
+
+        with mock.patch("api.schema.load_transaction_buckets", wraps=db.load_transaction_buckets) as load:
+            first = self.fetch()(first=3)
+            self.fetch()(first=3, after=first.cursors[-1])
+        self.assertEqual([(call.kwargs["start"], call.kwargs["stop"]) for call in load.call_args_list],
+                         [(0, 4), (3, 7)])
+
+    def test_sorted_and_filtered(self):
+        items = walk(self.fetch("amount", descending=True), 4)
+        self.assertEqual([item["amount"] for item in items], sorted(AMOUNTS, reverse=True))
+        flagged = walk(self.fetch(flagged=True, fields=("transaction_id", "flagged")), 4)
+        self.assertEqual([(item["transaction_id"], item["flagged"]) for item in flagged], [("t3", True)])
@@ -0,0 +1,144 @@
+from datetime import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import db
+from api.report_analytics import RISK_HISTOGRAM_EDGES, build_report_analytics, flag_details, risk_histogram
+from api.tests import MongoTestCase
+
+ROWS = [
+    {"transaction_id": f"t{i}", "merchant": f"m{i % 3}", "account_id": f"a{i % 2}", "amount": 10.0 * (i + 1)}
+    for i in range(8)
+]
+FLAGS = [
+    {"transaction_id": "t0", "amount": 10.0, "risk_score": 0.2, "signals": ["velocity"]},
+    {"transaction_id": "t3", "amount": 40.0, "risk_score": 1.2, "signals": ["velocity", "round_amount"],
+     "decision": "confirmed_fraud"},
+    {"transaction_id": "t4", "amount": 50.0, "risk_score": 12.0, "signals": []},
+    {"transaction_id": "t6", "amount": 70.25, "risk_score": 3.0, "decision": "false_positive"},
+]
+
+
+def decision_totals(analytics: dict) -> dict:
+    """Decisions with a flag in them, amounts rounded (``$inc`` of floats)."""
+    return {
+        name: (value["count"], round(value["amount"], 2))
+        for name, value in analytics["decisions"].items()
+        if value["count"]
+    }
+
+
+class BuildReportAnalyticsTests(SimpleTestCase):
+    def test_builds_every_metric_from_the_flags(self):
+        analytics = build_report_analytics(FLAGS, flag_details(ROWS, [f["transaction_id"] for f in FLAGS]), 8)
+        self.assertEqual(analytics["total_transactions"], 8)
+        self.assertEqual(analytics["flagged_count"], 4)
+        self.assertEqual(analytics["flagged_amount"], 170.25)
+        self.assertEqual(analytics["signals"], {"velocity": 2, "round_amount": 1})
+        self.assertEqual(decision_totals(analytics), {
+            "review_required": (2, 60.0), "confirmed_fraud": (1, 40.0), "false_positive": (1, 70.25),
+        })
+        self.assertEqual(analytics["top_merchants"], [
+            {"name": "m0", "flagged_count": 3, "flagged_amount": 120.25},  # t0 + t3 + t6
+            {"name": "m1", "flagged_count": 1, "flagged_amount": 50.0},    # t4
+        ])
+        self.assertEqual([(a["name"], a["flagged_amount"]) for a in analytics["top_accounts"]],
+                         [("a0", 130.25), ("a1", 40.0)])
+
+    def test_histogram_bins(self):
+        bins = risk_histogram([-1.0, 0.0, 0.49, 0.5, 2.99, 3.0, 10.0, 99.0])
+        self.assertEqual([b["min_score"] for b in bins], RISK_HISTOGRAM_EDGES)
+        self.assertIsNone(bins[-1]["max_score"])
+        counts = {b["min_score"]: b["count"] for b in bins}
+        self.assertEqual(counts, {0.0: 3, 0.5: 1, 1.0: 0, 1.5: 0, 2.0: 1, 3.0: 1, 5.0: 0, 10.0: 2})
+
+    def test_top_lists_are_capped(self):
+        flags = [{"transaction_id": row["transaction_id"], "amount": row["amount"]} for row in ROWS]
+        with mock.patch("api.report_analytics.ANALYTICS_TOP_N", 2):
+            analytics = build_report_analytics(flags, flag_details(ROWS, [r["transaction_id"] for r in ROWS]), 8)
+        self.assertEqual([m["name"] for m in analytics["top_merchants"]], ["m1", "m0"])
+        self.assertEqual(len(analytics["top_accounts"]), 2)
+
+    def test_empty_report(self):
+        analytics = build_report_analytics([], {}, 0)
+        self.assertEqual((analytics["flagged_count"], analytics["decisions"], analytics["top_merchants"]),
+                         (0, {}, []))
+
+
+class FlagDecisionDeltaTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        db.transactions_col.insert_many([{**row, "user_id": "u1", "report_id": "r1"} for row in ROWS])
+        db.flagged_transactions_col.insert_many([{**flag, "user_id": "u1", "report_id": "r1"} for flag in FLAGS])
+        db.save_report_analytics("u1", "r1", self.rebuilt())
+
+    def rebuilt(self) -> dict:
+        flags = db.load_report_flags("u1", "r1")
+        details = db.load_flag_details("u1", "r1", [f["transaction_id"] for f in flags], bucketed=False)
+        return build_report_analytics(flags, details, len(ROWS))
+
+    def stored(self) -> dict:
+        return db.get_report_analytics("u1", "r1")
+
+    def test_decisions_move_between_counts(self):
+        steps = [
+            ("t0", "confirmed_fraud"), ("t4", "false_positive"), ("t3", "false_positive"),
+            ("t6", "review_required"), ("t0", "false_positive"), ("t3", "confirmed_fraud"),
+        ]
+        for transaction_id, decision in steps:
+            flag = db.set_flag_decision("u1", "r1", transaction_id, decision, {"reviewed_at": datetime.utcnow()})
+            self.assertEqual(flag["decision"], decision)
+            self.assertEqual(decision_totals(self.stored()), decision_totals(self.rebuilt()), transaction_id)
+        self.assertEqual(decision_totals(self.stored()), {
+            "review_required": (1, 70.25), "false_positive": (2, 60.0), "confirmed_fraud": (1, 40.0),
+        })
+
+    def test_same_decision_and_unknown_flag_leave_counts_alone(self):
+        before = decision_totals(self.stored())
+        self.assertIsNotNone(db.set_flag_decision("u1", "r1", "t3", "confirmed_fraud"))
+        self.assertIsNotNone(db.set_flag_decision("u1", "r1", "t0", "review_required"))  # unset = review_required
+        self.assertIsNone(db.set_flag_decision("u1", "r1", "missing", "confirmed_fraud"))
+        self.assertIsNone(db.set_flag_decision("u2", "r1", "t0", "confirmed_fraud"))  # another user's report
+        self.assertEqual(decision_totals(self.stored()), before)
+
+    def test_both_writes_share_one_transaction(self):
+        open_transactions = []
+
+        def in_transaction(write, session=None):
+            open_transactions.append(write)
+            try:
+                return write(session)
+            finally:
+                open_transactions.pop()
+
+        def flag_write(*_args, **_kwargs):
+            self.assertEqual(len(open_transactions), 1)
+            return {"amount": 10.0}
+
+        def analytics_write(*_args, **_kwargs):
+            self.assertEqual(len(open_transactions), 1)
+            raise ValueError("analytics down")
+
+        with mock.patch.object(db, "in_transaction", in_transaction), \
+                mock.patch.object(db.flagged_transactions_col, "find_one_and_update", side_effect=flag_write), \
+                mock.patch.object(db.report_analytics_col, "update_one", side_effect=analytics_write) as analytics:
+            # the failure reaches the transaction, which aborts the flag's update with it
+            with self.assertRaisesRegex(ValueError, "analytics down"):
+                db.set_flag_decision("u1", "r1", "t0", "confirmed_fraud")
+        analytics.assert_called_once()
+
+    def test_update_anomaly_status_stamps_the_review(self):
+        self.assertTrue(db.update_anomaly_status("u1", "r1", "t4", "confirmed_fraud"))
+        self.assertIn("reviewed_at", db.flagged_transactions_col.find_one({"transaction_id": "t4"}))
+        self.assertEqual(self.stored()["decisions"]["confirmed_fraud"]["count"], 2)
+        self.assertFalse(db.update_anomaly_status("u1", "r1", "missing", "confirmed_fraud"))
+
+    def test_flag_details_from_buckets(self):
+        with mock.patch.object(db, "TRANSACTION_BUCKET_ROWS", 3):
+            db.save_transaction_buckets("u1", "r2", datetime.utcnow(), ROWS)
+        ids = ["t1", "t7", "missing"]
+        self.assertEqual(db.load_flag_details("u1", "r2", ids, bucketed=True),
+                         flag_details(ROWS, ids))
+        self.assertEqual(db.load_flag_details("u1", "r1", ids, bucketed=False),
+                         {"t1": {"merchant": "m1", "account_id": "a1"}, "t7": {"merchant": "m1", "account_id": "a1"}})
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from api.ml_engine import models_graph, sharding
+from api.ml_engine.ensemble import SCORE_CACHE_COLS
+from api.ml_engine.profiling import PipelineProfiler
+from api.ml_engine.synthetic import generate_ledger, to_records
+
+
+def disjoint_ledger(n_parts: int, rows: int) -> pd.DataFrame:
+    """``n_parts`` ledgers with no account or merchant in common."""
+    parts = []
+    for i in range(n_parts):
+        part = pd.DataFrame(to_records(generate_ledger(rows, n_merchants=30, n_accounts=100, seed=i)))
+        for col in ("transaction_id", "merchant", "account_id"):
+            part[col] = f"p{i}-" + part[col].astype(str)
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+
+class ShardGraphSignalTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.df = disjoint_ledger(4, 800)
+        cls.shard_ids = sharding.assign_shards(cls.df, 2)
+        cls.n_nodes = cls.df["account_id"].nunique() + cls.df["merchant"].nunique()
+
+    def test_shards_keep_whole_components(self):
+        for i in range(4):
+            self.assertEqual(len(set(self.shard_ids[self.df["merchant"].str.startswith(f"p{i}-")])), 1)
+
+    def test_centralities_rescaled_to_the_report_graph(self):
+        full, _state = models_graph.graph_signals(self.df)
+        shards = pd.concat([
+            models_graph.graph_signals(self.df[self.shard_ids == k], n_nodes=self.n_nodes)[0]
+            for k in range(2)
+        ]).loc[self.df.index]
+        np.testing.assert_allclose(shards["degree"], full["degree"], atol=1e-12)
+        np.testing.assert_allclose(shards["pagerank"], full["pagerank"], atol=1e-4)
+        np.testing.assert_array_equal(shards["edge_outlier"], full["edge_outlier"])
+
+    def test_score_graph_signals_matches_run_graph_analysis(self):
+        signals, _state = models_graph.graph_signals(self.df)
+        scores, bounds = models_graph.score_graph_signals(signals, self.df["amount"].to_numpy(dtype=np.float64))
+        expected = models_graph.run_graph_analysis(self.df)
+        np.testing.assert_array_equal(scores, expected.values)
+        self.assertEqual(bounds, expected.attrs["model_state"]["bounds"])
+
+
+class ScoreShardedTests(SimpleTestCase):
+    def test_returns_score_columns_scaled_over_the_report(self):
+        df = disjoint_ledger(3, 600)
+        profiler = PipelineProfiler()
+        scored = sharding.score_sharded(
+            df, 3, keep_cols=SCORE_CACHE_COLS, n_workers=2, profiler=profiler,
+            engine_options={"lof": {"sample_rows": 1000}, "graph": {}},
+        )
+        self.assertEqual(list(scored.columns), SCORE_CACHE_COLS)
+        self.assertEqual(sorted(scored["transaction_id"]), sorted(df["transaction_id"]))
+        self.assertEqual(scored["ae_score"].abs().sum(), 0.0)  # left out of the profile
+        # one scaling over every row: the extremes are reached once, not once per shard
+        self.assertAlmostEqual(scored["graph_score"].min(), 0.0)
+        self.assertAlmostEqual(scored["graph_score"].max(), 1.0)
+        self.assertIn("shard_graph_scale", [record["stage"] for record in profiler.to_dict()["stages"]])
+        self.assertEqual(sum(scored.attrs["shard_rows"]), len(df))
+        self.assertEqual(len(scored.attrs["shard_rows"]), 3)
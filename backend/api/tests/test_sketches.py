@@ -0,0 +1,117 @@
+import json
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from api.ml_engine import ensemble
+from api.ml_engine.sketches import QuantileSketch
+from api.ml_engine.synthetic import generate_ledger, to_records
+
+
+def exact_z(values: np.ndarray) -> np.ndarray:
+    median = np.median(values)
+    return 0.6745 * (values - median) / np.median(np.abs(values - median))
+
+
+def sketch_z(values: np.ndarray, sketch: QuantileSketch) -> np.ndarray:
+    median, mad = sketch.median_and_mad()
+    return 0.6745 * (values - median) / mad
+
+
+class QuantileSketchTests(SimpleTestCase):
+    def test_exact_below_k(self):
+        values = np.random.default_rng(0).normal(5, 2, 999)
+        sketch = QuantileSketch(k=1000).add(values)
+        median, mad = sketch.median_and_mad()
+        series = pd.Series(values)
+        self.assertAlmostEqual(median, series.median(), places=12)
+        self.assertAlmostEqual(mad, (series - series.median()).abs().median(), places=12)
+        self.assertAlmostEqual(sketch.quantile(0.9), series.quantile(0.9), places=12)
+
+    def test_rank_error_with_incremental_adds(self):
+        values = np.random.default_rng(1).lognormal(0, 1, 300_000)
+        sketch = QuantileSketch()
+        for chunk in np.array_split(values, 300):
+            sketch.add(chunk)
+        ordered = np.sort(values)
+        for q in np.linspace(0.01, 0.99, 99):
+            rank = np.searchsorted(ordered, sketch.quantile(q)) / len(values)
+            self.assertLess(abs(rank - q), 0.005)
+        self.assertLess(sketch.retained, 4 * sketch.k)
+
+    def test_merged_shards_keep_the_rank_bound(self):
+        rng = np.random.default_rng(3)
+        parts = [rng.lognormal(mean, 1, size) for mean, size in ((0, 150_000), (1, 40_000), (-1, 110_000))]
+        merged = QuantileSketch()
+        for part in parts:
+            merged.merge(QuantileSketch().add(part))
+        values = np.sort(np.concatenate(parts))
+        self.assertEqual(merged.count, len(values))
+        for q in np.linspace(0.01, 0.99, 99):
+            rank = np.searchsorted(values, merged.quantile(q)) / len(values)
+            self.assertLess(abs(rank - q), 0.005)
+        self.assertLess(merged.retained, 4 * merged.k)
+
+    def test_merge_below_k_is_exact(self):
+        values = np.random.default_rng(4).normal(0, 1, 900)
+        merged = QuantileSketch().add(values[:300]).merge(QuantileSketch().add(values[300:]))
+        self.assertEqual(merged.median_and_mad(), QuantileSketch().add(values).median_and_mad())
+        with self.assertRaises(ValueError):
+            merged.merge(QuantileSketch(k=200))
+
+    def test_round_trips_through_json(self):
+        sketch = QuantileSketch(k=200, seed=7).add(np.random.default_rng(5).normal(0, 1, 50_000))
+        restored = QuantileSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+        self.assertEqual((restored.k, restored.count, restored.retained), (200, 50_000, sketch.retained))
+        self.assertEqual(restored.median_and_mad(), sketch.median_and_mad())
+        # and keeps summarising values added after the restore
+        restored.add(np.full(50_000, 10.0))
+        self.assertGreater(restored.quantile(0.75), 9.0)
+
+    def test_clustered_scores_keep_their_mad(self):
+        # Most risk indices within 0.5 % of the median – the case a
+        # relative-error bucket sketch collapses to MAD = 0.
+        rng = np.random.default_rng(2)
+        values = np.concatenate([1 + rng.normal(0, 0.002, 100_000), rng.uniform(1, 20, 1_000)])
+        exact, approx = exact_z(values), sketch_z(values, QuantileSketch().add(values))
+        bulk = np.abs(exact) < 10
+        self.assertLess(np.abs(exact - approx)[bulk].max(), 0.05)
+        flagged, flagged_sketch = exact > 3, approx > 3
+        self.assertLessEqual((flagged != flagged_sketch).sum(), 0.01 * flagged.sum())
+
+    def test_robust_statistics_match_exact_on_a_ledger(self):
+        records = to_records(generate_ledger(20_000, n_merchants=200, n_accounts=1000))
+        scored = ensemble.score_transactions(records, cache=None, profile="fast")
+        exact = ensemble.combine_scores(scored, "r", cache=None, robust_stats="exact")
+        sketch = ensemble.combine_scores(scored, "r", cache=None, robust_stats="sketch")
+        exact_ids = {row["transaction_id"] for row in exact}
+        sketch_ids = {row["transaction_id"] for row in sketch}
+        self.assertGreater(len(exact_ids & sketch_ids) / len(exact_ids | sketch_ids), 0.98)
+
+        scores = ensemble.risk_index(scored[ensemble.SCORE_CACHE_COLS], None)["total_risk_index"]
+        (median, mad), (s_median, s_mad) = (ensemble.robust_statistics(scores, method)
+                                            for method in ("exact", "sketch"))
+        self.assertLess(abs(s_median - median), 0.02 * mad)
+        self.assertLess(abs(s_mad - mad), 0.02 * mad)
+
+    def test_sharded_frames_merge_one_sketch_per_shard(self):
+        records = to_records(generate_ledger(20_000, n_merchants=200, n_accounts=1000))
+        scored = ensemble.score_transactions(records, cache=None, profile="fast")[ensemble.SCORE_CACHE_COLS]
+        # merchants whole within a shard, as score_sharded assigns them
+        scored = scored.sort_values("merchant", kind="stable").reset_index(drop=True)
+        cut = int(scored["merchant"].searchsorted(scored["merchant"].iloc[len(scored) // 3], side="left"))
+        for trusted in (None, ["Vendor 00000", "Vendor 00001"]):
+            exact = ensemble.combine_scores(scored, "r", trusted, cache=None, robust_stats="exact")
+            sharded = scored.copy()
+            sharded.attrs["shard_rows"] = [cut, len(scored) - cut]
+            with mock.patch.object(ensemble, "_combine", side_effect=AssertionError("not per shard")):
+                sketch = ensemble.combine_scores(sharded, "r", trusted, cache=None, robust_stats="sketch")
+            exact_ids = {row["transaction_id"] for row in exact}
+            sketch_ids = {row["transaction_id"] for row in sketch}
+            self.assertGreater(len(exact_ids & sketch_ids) / len(exact_ids | sketch_ids), 0.98)
+            by_id = {row["transaction_id"]: row["risk_score"] for row in exact}
+            for row in sketch:
+                if row["transaction_id"] in by_id:
+                    self.assertEqual(row["risk_score"], by_id[row["transaction_id"]])
@@ -0,0 +1,86 @@
+import os
+import tempfile
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from api.ml_engine import ensemble, stage_cache
+from api.ml_engine.profiling import PipelineProfiler
+from api.ml_engine.stage_cache import StageCache, frame_fingerprint
+from api.ml_engine.synthetic import generate_ledger, to_records
+
+
+class StageKeyTests(SimpleTestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({"amount": [1.0, 2.5, 3.0], "merchant": ["a", "b", "c"]})
+
+    def test_fingerprint_follows_content_not_index(self):
+        fp = frame_fingerprint(self.df)
+        self.assertEqual(frame_fingerprint(self.df.set_axis([7, 8, 9])), fp)
+        self.assertEqual(frame_fingerprint(self.df.assign(extra=1), ["amount", "merchant"]), fp)
+        changed = self.df.copy()
+        changed.loc[1, "amount"] = 2.6
+        for other in (changed, self.df[["merchant", "amount"]], self.df.astype({"amount": "float32"}),
+                      self.df.iloc[::-1].reset_index(drop=True)):
+            self.assertNotEqual(frame_fingerprint(other), fp)
+
+    def test_key_covers_stage_params_and_version(self):
+        key = StageCache.key("lof", "fp", {"a": 1, "b": [2, 3]})
+        self.assertEqual(StageCache.key("lof", "fp", {"b": [2, 3], "a": 1}), key)
+        self.assertEqual(StageCache.key("lof", "fp", None), StageCache.key("lof", "fp", {}))
+        for other in (StageCache.key("ae", "fp", {"a": 1, "b": [2, 3]}),
+                      StageCache.key("lof", "fp2", {"a": 1, "b": [2, 3]}),
+                      StageCache.key("lof", "fp", {"a": 2, "b": [2, 3]})):
+            self.assertNotEqual(other, key)
+        original = stage_cache.CACHE_VERSION
+        try:
+            stage_cache.CACHE_VERSION = original + 1
+            self.assertNotEqual(StageCache.key("lof", "fp", {"a": 1, "b": [2, 3]}), key)
+        finally:
+            stage_cache.CACHE_VERSION = original
+
+
+class PipelineCacheTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.records = to_records(generate_ledger(1500, n_merchants=40, n_accounts=150))
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = StageCache(tmp.name)
+
+    def run_pipeline(self, trusted=None):
+        profiler = PipelineProfiler()
+        flagged = ensemble.run_pipeline(self.records, "r1", trusted, profiler=profiler, cache=self.cache,
+                                        profile="fast")
+        # engines that ran record no cache field; only hits are marked
+        return flagged, {record["stage"]: record.get("cache") == "hit" for record in profiler.stages}
+
+    def test_unchanged_input_hits_every_stage(self):
+        first, hits = self.run_pipeline()
+        self.assertEqual({hits[name] for name in ("features", "lof", "combine", "narrate")}, {False})
+        second, hits = self.run_pipeline()
+        self.assertEqual({hits[name] for name in ("features", "lof", "combine", "narrate")}, {True})
+        self.assertEqual(second, first)
+
+    def test_trusted_vendors_only_miss_from_combine(self):
+        self.run_pipeline()
+        _flagged, hits = self.run_pipeline(trusted=["merchant_0"])
+        self.assertEqual((hits["features"], hits["lof"], hits["combine"]), (True, True, False))
+
+    def test_invalidation_follows_the_dag(self):
+        self.run_pipeline()
+        removed = ensemble.invalidate_stage_cache("lof", cache=self.cache)
+        self.assertEqual(removed, 3)  # lof, combine, narrate
+        _flagged, hits = self.run_pipeline()
+        self.assertEqual((hits["features"], hits["lof"], hits["combine"]), (True, False, False))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = StageCache(self.cache.directory, max_bytes=2500)
+        for i in range(3):
+            cache.put("lof", f"k{i}", b"x" * 1000)
+            os.utime(cache._path("lof", f"k{i}"), (i, i))
+        cache.put("lof", "k3", b"x" * 1000)
+        self.assertEqual([cache.get("lof", f"k{i}")[0] for i in range(4)], [False, False, True, True])
@@ -0,0 +1,46 @@
+from bson import ObjectId
+
+from api import db
+from api.tests import MongoTestCase
+
+
+def report(user_id: str = "u1", status: str = "processing", transactions: int = 10, flagged: int = 0) -> dict:
+    return {"user_id": user_id, "status": status, "total_transactions": transactions, "flagged_count": flagged}
+
+
+def summary(user_id: str = "u1") -> dict:
+    found = db.dashboard_summaries_col.find_one({"_id": user_id}, {"updated_at": 0})
+    return {**found, "status_counts": {k: v for k, v in found["status_counts"].items() if v}}
+
+
+class DashboardSummaryTests(MongoTestCase):
+    def test_first_write_builds_the_summary(self):
+        db.audit_reports_col.insert_one(report(status="completed", flagged=2))  # before summaries existed
+        db.insert_report(report())
+        self.assertEqual(summary(), {
+            "_id": "u1", "total_reports": 2, "total_transactions": 20, "total_flagged": 2,
+            "status_counts": {"completed": 1, "processing": 1},
+        })
+
+    def test_updates_move_counts_between_statuses(self):
+        report_id = db.insert_report(report())
+        db.insert_report(report(user_id="u2"))
+        db.update_report({"_id": ObjectId(report_id)}, {"status": "completed", "flagged_count": 3})
+        self.assertIsNone(db.update_report({"_id": ObjectId()}, {"status": "failed"}))
+        self.assertEqual(summary(), {
+            "_id": "u1", "total_reports": 1, "total_transactions": 10, "total_flagged": 3,
+            "status_counts": {"completed": 1},
+        })
+        self.assertEqual(summary("u2")["status_counts"], {"processing": 1})
+
+    def test_drifted_summary_is_rebuilt_on_read(self):
+        report_id = db.insert_report(report())
+        db.insert_report(report(status="completed"))
+        # a write that bypassed update_report
+        db.audit_reports_col.delete_one({"_id": ObjectId(report_id)})
+        db.dashboard_summaries_col.update_one({"_id": "u1"}, {"$inc": {"status_counts.processing": -2}})
+        self.assertTrue(db.summary_drifted(db.dashboard_summaries_col.find_one({"_id": "u1"})))
+
+        rebuilt = db.get_dashboard_summary("u1")
+        self.assertEqual((rebuilt["total_reports"], rebuilt["status_counts"]), (1, {"completed": 1}))
+        self.assertFalse(db.summary_drifted(rebuilt))
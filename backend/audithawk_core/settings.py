@@ -132,4 +132,16 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:5000",
     "http://127.0.0.1:5000",
 ]
-CORS_ALLOW_CREDENTIALS = True   
\ No newline at end of file
+CORS_ALLOW_CREDENTIALS = True   
+# Warnings and failures of the analysis jobs and the pipeline (the ``api``
+# loggers) go to stderr, with tracebacks
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "api": {"handlers": ["console"], "level": "INFO"},
+    },
+}
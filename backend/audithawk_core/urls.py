@@ -17,7 +17,7 @@
 from django.contrib import admin
 from django.urls import path
 from django.views.generic.base import RedirectView
-from graphene_django.views import GraphQLView
+from api.fast_graphql import FastGraphQLView
 from django.views.decorators.csrf import csrf_exempt
 
 # ============================================
@@ -25,11 +25,13 @@ from django.views.decorators.csrf import csrf_exempt
 # ============================================
 # All API interactions happen through GraphQL.
 # No REST endpoints are exposed.
+# FastGraphQLView: compiled serialization of large lists + orjson
+# (api/fast_graphql.py).
 # ============================================
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("graphql/", csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path("graphql/", csrf_exempt(FastGraphQLView.as_view(graphiql=True))),
     # Redirect root URL to GraphiQL for convenience during development
     path("", RedirectView.as_view(url='/graphql/', permanent=False)),
 ]
\ No newline at end of file
@@ -281,6 +281,7 @@ def api_upload_audit():
                     success
                     message
                     report{ id fileName uploadedAt totalTransactions flaggedCount status }
+                    job{ reportId status stage progress }
                 }
             }""",
             {
@@ -318,36 +319,78 @@ def api_reports():
         return jsonify({"success": False, "message": str(e), "reports": []}), 500
 
 
+# Page size used when walking a connection to its end
+PAGE_SIZE = 1000
+
+
+def gql_all_pages(query: str, field: str, variables: dict) -> tuple[list[dict], dict]:
+    """
+    Follow a cursor-paginated connection ``field`` to its last page.
+    ``query`` takes ``$first`` / ``$after``; returns (nodes, first page's data).
+    """
+    nodes, first_page, after = [], None, None
+    while True:
+        data = gql_auth(query, {**variables, "first": PAGE_SIZE, "after": after})
+        first_page = first_page or data
+        connection = data.get(field) or {}
+        nodes.extend(edge["node"] for edge in connection.get("edges") or [])
+        page_info = connection.get("pageInfo") or {}
+        if not page_info.get("hasNextPage"):
+            return nodes, first_page
+        after = page_info.get("endCursor")
+
+
 @app.route("/api/reports/<report_id>", methods=["GET"])
 @login_required
 def api_report_details(report_id):
+    """
+    The report's flags plus the rows behind them, and the row total –
+    not every row of the report.
+    """
     try:
-        data = gql_auth(
-            """query($reportId:ID!){
-                transactions(reportId:$reportId){
-                    id
-                    transactionId
-                    date
-                    amount
-                    merchant
-                    category
-                    accountId
+        rows, data = gql_all_pages(
+            """query($reportId:ID!,$first:Int,$after:String){
+                all: transactionsConnection(reportId:$reportId, first:0){ totalCount }
+                transactionsConnection(reportId:$reportId, flagged:true, first:$first, after:$after){
+                    pageInfo{ hasNextPage endCursor }
+                    edges{ node{
+                        id
+                        transactionId
+                        date
+                        amount
+                        merchant
+                        category
+                        accountId
+                    } }
                 }
-                flaggedTransactions(reportId:$reportId){
-                    id
-                    transactionId
-                    amount
-                    riskScore
-                    decision
-                    explanation
+            }""",
+            "transactionsConnection",
+            {"reportId": report_id},
+        )
+        frauds, _ = gql_all_pages(
+            """query($reportId:ID!,$first:Int,$after:String){
+                flaggedTransactionsConnection(
+                    reportId:$reportId, sortBy:RISK_SCORE, sortDirection:DESC, first:$first, after:$after
+                ){
+                    pageInfo{ hasNextPage endCursor }
+                    edges{ node{
+                        id
+                        transactionId
+                        amount
+                        riskScore
+                        decision
+                        explanation
+                    } }
                 }
             }""",
+            "flaggedTransactionsConnection",
             {"reportId": report_id},
         )
         return jsonify({
             "success": True,
-            "transactions": data.get("transactions") or [],
-            "frauds": data.get("flaggedTransactions") or [],
+            "totalTransactions": (data.get("all") or {}).get("totalCount") or 0,
+            "transactions": rows,
+            "frauds": frauds,
         })
     except Exception as e:
         return jsonify({"success": False, "message": str(e), "transactions": [], "frauds": []}), 500
@@ -373,6 +416,83 @@ def api_reanalyze_report(report_id):
         return jsonify({"success": False, "message": str(e), "flaggedCount": 0}), 500
 
 
+@app.route("/api/reports/<report_id>/job", methods=["GET"])
+@login_required
+def api_job_status(report_id):
+    try:
+        data = gql_auth(
+            """query($reportId:ID!){
+                jobStatus(reportId:$reportId){
+                    reportId
+                    status
+                    stage
+                    stagesDone
+                    stagesTotal
+                    progress
+                    error
+                    flaggedCount
+                    degradedSignals
+                    baselineError
+                }
+            }""",
+            {"reportId": report_id},
+        )
+        job = data.get("jobStatus")
+        if job is None:
+            return jsonify({"success": False, "message": "No analysis job for this report."}), 404
+        return jsonify({"success": True, "job": job})
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route("/api/reports/<report_id>/analytics", methods=["GET"])
+@login_required
+def api_report_analytics(report_id):
+    """The report's precomputed dashboard metrics: one small document."""
+    try:
+        data = gql_auth(
+            """query($reportId:ID!){
+                reportAnalytics(reportId:$reportId){
+                    totalTransactions
+                    flaggedCount
+                    flaggedAmount
+                    riskHistogram{ minScore maxScore count }
+                    signals{ signal count }
+                    topMerchants{ name flaggedCount flaggedAmount }
+                    topAccounts{ name flaggedCount flaggedAmount }
+                    decisions{ decision count amount }
+                }
+            }""",
+            {"reportId": report_id},
+        )
+        analytics = data.get("reportAnalytics")
+        if analytics is None:
+            return jsonify({"success": False, "message": "Report not found or not analysed yet."}), 404
+        return jsonify({"success": True, "analytics": analytics})
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
+@app.route("/api/reports/<report_id>/cancel", methods=["POST"])
+@login_required
+def api_cancel_analysis(report_id):
+    try:
+        data = gql_auth(
+            """mutation($reportId:ID!){
+                cancelAnalysis(reportId:$reportId){
+                    success
+                    message
+                    job{ reportId status stage progress }
+                }
+            }""",
+            {"reportId": report_id},
+        )
+        result = data.get("cancelAnalysis") or {}
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+
 @app.route("/api/flagged/decision", methods=["POST"])
 @login_required
 def api_update_flagged_decision():
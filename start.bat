@@ -4,7 +4,10 @@ echo Booting AuditHawk Pipeline...
 :: 1. Start the Backend in a new window
 start "AuditHawk Backend (Django)" cmd /k "cd backend && call .venv\Scripts\activate && python manage.py runserver"
 
-:: 2. Start the Frontend in a new window
+:: 2. Start an analysis worker in a new window (runs the queued upload analyses)
+start "AuditHawk Analysis Worker" cmd /k "cd backend && call .venv\Scripts\activate && python manage.py analysis_worker"
+
+:: 3. Start the Frontend in a new window
 start "AuditHawk Frontend (Flask)" cmd /k "cd frontend_flask && python app.py"
 
 echo Servers are booting up!
\ No newline at end of file